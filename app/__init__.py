@@ -1,16 +1,22 @@
-"""Application factory and package root."""
+"""Application factory and package root.
+
+Flask, the models and the routes are imported inside create_app, so importing a Flask-free
+module such as app.services.embedded does not load them.
+"""
 import os
 
-from flask import Flask
-from flask_session import Session
-from flask_bootstrap import Bootstrap5
 
-from app.extensions import db
-from app import models  # noqa: F401 - register models with SQLAlchemy
-from app.routes import register_blueprints
+def create_app(config_overrides=None):
+    from flask import Flask
+    from flask_session import Session
+    from flask_bootstrap import Bootstrap5
 
+    from app.extensions import db
+    from app import models  # noqa: F401 - register models with SQLAlchemy
+    from app.routes import register_blueprints
+    from app.commands import register_commands
+    from app.services import start_periodic_job, install_profiler
 
-def create_app(config_overrides=None):
     # Templates and static live at project root (parent of app package)
     import os as _os
     _root = _os.path.dirname(_os.path.dirname(_os.path.abspath(__file__)))
@@ -35,11 +41,58 @@ def create_app(config_overrides=None):
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
     app.config['PROJECT_ROOT'] = _root
+    app.config['COMPRESS_MIN_SIZE'] = 1024  # bytes; smaller HTML/JSON bodies are sent as-is
+    app.config['COMPRESS_LEVEL'] = 6
+    app.config['UPLOAD_STAGING_TTL'] = 6 * 3600  # seconds an unused preview upload is kept
+    app.config['UPLOAD_SWEEP_INTERVAL'] = 3600  # seconds between sweeps; 0 disables the sweeper
+    app.config['UPLOAD_WARM_AFTER_DAYS'] = 30  # re-encode images (lossless WebP) once their newest run is this old; 0 disables
+    app.config['UPLOAD_COLD_AFTER_DAYS'] = 180  # then move them into monthly zip bundles; 0 disables
+    app.config['UPLOAD_ARCHIVE_CROP_TO_ROI'] = False  # also drop rows far from the sampled points when re-encoding
+    app.config['UPLOAD_LIFECYCLE_INTERVAL'] = 24 * 3600  # seconds between lifecycle passes; 0 disables
+    app.config['RUN_WRITER_ENABLED'] = False  # store runs through one writer thread with group commit (busy multi-client setups)
+    app.config['RUN_WRITER_MAX_BATCH'] = 64  # runs per commit at most
+    app.config['RUN_WRITER_MAX_WAIT'] = 0.002  # seconds the writer waits for more runs before committing
+    app.config['RESULT_CACHE_SIZE'] = 256  # memoized analyses kept per process; 0 disables
+    app.config['RESULT_CACHE_TTL'] = 600  # seconds a re-submitted image+points reuses the saved run
+    # Bursts are held in process memory: they need a single-process server (one worker, any number of threads).
+    app.config['BURST_MAX_FRAMES'] = 16  # frames averaged per camera burst
+    app.config['BURST_TTL'] = 600  # seconds an unfinished burst is kept
+    app.config['BURST_MAX_ACTIVE'] = 8  # bursts accumulating at once (each holds ~2 float32 frames)
+    app.config['PROFILER_TOKEN'] = os.environ.get('BIOAP_PROFILER_TOKEN')  # enables per-request profiling for holders of this token
+    app.config['PROFILER_KEEP'] = 50  # newest captures kept in instance/profiles/
     if config_overrides:
         app.config.update(config_overrides)
 
     db.init_app(app)
     Bootstrap5(app)
     register_blueprints(app)
+    register_commands(app)
+    install_profiler(app)
+    if not app.testing:
+        start_periodic_job(app, 'upload-sweeper', app.config['UPLOAD_SWEEP_INTERVAL'], lambda: _sweep_uploads_job(app))
+        start_periodic_job(app, 'upload-lifecycle', app.config['UPLOAD_LIFECYCLE_INTERVAL'], lambda: _upload_lifecycle_job(app))
 
     return app
+
+
+def _sweep_uploads_job(app):
+    from app.services import sweep_uploads
+
+    report = sweep_uploads(app.config['UPLOAD_STAGING_TTL'])
+    if report['reclaimed_bytes']:
+        app.logger.info(
+            'Upload sweep removed %d staged and %d orphaned file(s), reclaimed %d bytes',
+            report['staged_files'], report['orphan_files'], report['reclaimed_bytes'],
+        )
+
+
+def _upload_lifecycle_job(app):
+    from app.services import run_configured_lifecycle
+
+    report = run_configured_lifecycle(app.config)
+    for tier in ('warm', 'cold'):
+        if report[tier]['files']:
+            app.logger.info(
+                'Upload lifecycle moved %d file(s) to %s, saved %d bytes',
+                report[tier]['files'], tier, report[tier]['saved_bytes'],
+            )
@@ -0,0 +1 @@
+"""Benchmarks and load tools run through the Flask CLI (see app/commands.py)."""
@@ -0,0 +1,111 @@
+"""FrameAnalyzer: agreement with AnalysisPipeline, and frames/s on raw camera-sized buffers.
+
+Both run on a throwaway database seeded with the default profile. Agreement: golden strips go
+through AnalysisPipeline (default mode, not stored) and through FrameAnalyzer with the same
+curves, as encoded PNG bytes and as a packed BGRA buffer; rgb sums, raw means, background,
+rounded concentrations and levels must be identical. Throughput: a synthetic width×height BGRA frame is handed over as a
+memoryview (no copy, no decode), against the pipeline on the same frame as a PIL image.
+"""
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+AGREEMENT_SCHEMES = ('5-pixel', 'box-9x9', 'disk-r5', 'trimmed-5x5')
+
+
+def _compare(label, readings, m, result):
+    """Mismatch messages between a pipeline result (readings, Measurement) and a FrameResult."""
+    got = {
+        'rgb_sum': [int(v) for v in result.rgb_sums],
+        'concentration': [round(float(c), 2) for c in result.concentrations],
+        'level': result.levels(),
+        'x': [int(v) for v in result.xs],
+        'y': [int(v) for v in result.ys],
+    }
+    messages = [f"{label}: {field} {got[field]} != {[r[field] for r in readings]}"
+                for field in got if got[field] != [r[field] for r in readings]]
+    if not np.array_equal(m.means, result.means):
+        messages.append(f"{label}: raw means differ")
+    if m.background != tuple(float(v) for v in result.background) or m.used_normalization != result.used_normalization:
+        messages.append(f"{label}: background {result.background} != {m.background}")
+    return messages
+
+
+def check_agreement(seeds=(1, 2, 3)):
+    """Mismatch messages (empty when FrameAnalyzer reproduces AnalysisPipeline); needs an app context."""
+    from app.bench.golden import golden_image
+    from app.services import AnalysisPipeline, FrameAnalyzer, compiled_curve_for, decode_image, get_active_pesticides, get_active_profile
+
+    profile = get_active_profile()
+    cases = get_active_pesticides(profile.id)
+    curves = [compiled_curve_for(p) for p in cases]
+    messages = []
+    for scheme in AGREEMENT_SCHEMES:
+        for normalize in (False, True):
+            pipeline = AnalysisPipeline(profile, 'default', scheme, normalize, cases=cases)
+            analyzer = FrameAnalyzer(curves[:len(pipeline.labels)], scheme=scheme, normalize=normalize)
+            for seed in seeds:
+                png = golden_image(seed)
+                img = decode_image(Image.open(io.BytesIO(png)))
+                expected = pipeline.analyze(img, 'bench', persist=False)
+                pixels = np.asarray(img)
+                bgra = np.concatenate([pixels[:, :, ::-1], np.full(pixels.shape[:2] + (1,), 255, np.uint8)], axis=2)
+                label = f"{scheme}{' normalized' if normalize else ''} strip {seed}"
+                messages += _compare(label + ' (png)', expected.readings, expected.measurement, analyzer.analyze(png))
+                messages += _compare(label + ' (bgra)', expected.readings, expected.measurement,
+                                     analyzer.analyze(memoryview(bgra.tobytes()), pixels.shape[1], pixels.shape[0], 'BGRA'))
+    return messages
+
+
+def benchmark_frames(width=1920, height=1080, frames=200, schemes=('5-pixel', 'box-9x9', 'disk-r5'), seed=0):
+    """
+    [{'scheme', 'embedded_ms', 'fps', 'pipeline_ms'}] per scheme: FrameAnalyzer on a packed BGRA
+    memoryview against AnalysisPipeline.analyze (not stored) on the same frame as a PIL image.
+    """
+    from app.services import AnalysisPipeline, FrameAnalyzer, compiled_curve_for, get_active_pesticides, get_active_profile
+
+    rng = np.random.default_rng(seed)
+    frame = rng.integers(40, 200, (height, width, 4), dtype=np.uint8)
+    buffer = memoryview(frame.tobytes())
+    image = Image.fromarray(np.ascontiguousarray(frame[:, :, 2::-1]))
+    profile = get_active_profile()
+    cases = get_active_pesticides(profile.id)
+    curves = [compiled_curve_for(p) for p in cases]
+    rows = []
+    for scheme in schemes:
+        analyzer = FrameAnalyzer(curves, scheme=scheme, normalize=True)
+        pipeline = AnalysisPipeline(profile, 'default', scheme, True, cases=cases)
+        start = time.perf_counter()
+        for _ in range(frames):
+            analyzer.analyze(buffer, width, height, 'BGRA')
+        embedded = (time.perf_counter() - start) / frames
+        runs = max(1, frames // 10)
+        start = time.perf_counter()
+        for _ in range(runs):
+            pipeline.analyze(image, 'bench', persist=False)
+        rows.append({'scheme': scheme, 'embedded_ms': embedded * 1000, 'fps': 1 / embedded if embedded else 0.0,
+                     'pipeline_ms': (time.perf_counter() - start) / runs * 1000})
+    return rows
+
+
+def run_embedded_bench(width=1920, height=1080, frames=200):
+    """(check_agreement() messages, benchmark_frames() rows) on a temporary database."""
+    from app import create_app
+    from app.extensions import db
+    from app.services import ensure_schema_columns, seed_defaults
+
+    with tempfile.TemporaryDirectory(prefix='bioap-embedded-') as tmp:
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'embedded.sqlite')})
+        with app.app_context():
+            db.create_all()
+            ensure_schema_columns()
+            seed_defaults()
+            mismatches = check_agreement()
+            rows = [] if mismatches else benchmark_frames(width=width, height=height, frames=frames)
+            db.session.remove()
+            db.engine.dispose()
+    return mismatches, rows
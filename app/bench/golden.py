@@ -0,0 +1,175 @@
+"""Golden-output check for the analysis paths: auto points, dragged points, plate layouts and batch.
+
+Each case posts a deterministic synthetic image through the real routes (or analyze_files)
+on a throwaway database seeded with the default profile, then reads back the stored Run
+and RunResult columns. golden_analysis.json holds those numbers as produced before the
+analysis pipeline was unified; any refactor of the pipeline must reproduce them exactly.
+Regenerate it (--update) only for an intended change in results.
+"""
+import io
+import json
+import os
+import re
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'golden_analysis.json')
+RUN_COLUMNS = ('mode', 'used_normalization', 'background_point_x', 'background_point_y', 'sampling_scheme',
+               'image_width', 'image_height', 'bg_r', 'bg_g', 'bg_b', 'layout')
+RESULT_COLUMNS = ('pesticide_key', 'well', 'pixel_x', 'pixel_y', 'rgb_sum', 'concentration', 'level',
+                  'rgb_r', 'rgb_g', 'rgb_b', 'hsv_h', 'hsv_s', 'hsv_v', 'hsl_h', 'hsl_s', 'hsl_l', 'raw_r', 'raw_g', 'raw_b')
+MODES = ('default', 'scientific')
+SCHEMES = ('5-pixel', 'box-9x9', 'trimmed-5x5')
+LAYOUT = dict(name='Golden 2x3', rows=2, columns=3, origin_x=0.2, origin_y=0.3, pitch_x=0.3, pitch_y=0.4, assign_by='column')
+
+
+def golden_image(seed, width=720, height=360):
+    """PNG bytes: a brightness ramp across the strip (readings span the seeded curves) with sensor noise and a dark corner."""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(45, 130, width)[None, :, None] + np.linspace(0, 8, height)[:, None, None]
+    arr = np.clip(ramp + rng.integers(-6, 7, (height, width, 3)), 0, 255).astype(np.uint8)
+    arr[:12, :12] = 20 + seed % 3
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def _dragged_points(width, height, layout, n):
+    """Points as an operator would leave them: nudged off the defaults, and out of x order for single rows."""
+    from app.services import auto_points, layout_grid
+
+    if layout is not None:
+        xs, ys = layout_grid(layout, width, height)
+    else:
+        xs, y = auto_points(width, height, n)
+        ys = [y] * n
+    points = [{"x": int(x) + (i % 3) - 1, "y": int(y) + (i % 2)} for i, (x, y) in enumerate(zip(xs, ys))]
+    return points if layout is not None else points[::-1]
+
+
+def _off_image_points(width, height, layout, n):
+    """Dragged points pushed past every edge of the image: free points read only their in-image pixels, layout points are clamped."""
+    points = _dragged_points(width, height, layout, n)
+    for i, p in enumerate(points):
+        if i % 4 == 0:
+            p['x'] = -25 - i
+        elif i % 4 == 1:
+            p['x'] = width + 40 + i
+        elif i % 4 == 2:
+            p['y'] = -15 - i
+        else:
+            p['y'] = height + 30 + i
+    return points
+
+
+def _stored(run):
+    from app.models import RunResult
+
+    results = RunResult.query.filter_by(run_id=run.id).order_by(RunResult.id.asc()).all()
+    return {'run': [getattr(run, c) for c in RUN_COLUMNS], 'results': [[getattr(r, c) for c in RESULT_COLUMNS] for r in results]}
+
+
+def run_cases():
+    """{case name: {'run': [...], 'results': [[...], ...]}} from the current code, on a temporary database."""
+    from app import create_app
+    from app.extensions import db
+    from app.models import PlateLayout, Run
+    from app.services import (analyze_files, ensure_schema_columns, get_active_pesticides, get_active_profile,
+                              get_result_cache, seed_defaults, set_app_setting)
+
+    previous_cwd = os.getcwd()
+    out = {}
+    with tempfile.TemporaryDirectory(prefix='bioap-golden-') as tmp:
+        os.chdir(tmp)  # uploads are relative to the working directory
+        try:
+            app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'golden.sqlite')})
+            with app.app_context():
+                db.create_all()
+                ensure_schema_columns()
+                seed_defaults()
+                profile = get_active_profile()
+                layout = PlateLayout(profile_id=profile.id, **LAYOUT)
+                db.session.add(layout)
+                db.session.commit()
+                client = app.test_client()
+                seed = 0
+                for mode in MODES:
+                    set_app_setting('mode', mode)
+                    n = 5 if mode == 'scientific' else max(1, min(10, len(get_active_pesticides(profile.id))))
+                    for scheme in SCHEMES:
+                        for normalize in (False, True):
+                            for plate in (None, layout):
+                                seed += 1
+                                form = {'sampling_scheme': scheme, 'normalize': 'on' if normalize else '',
+                                        'layout_id': str(plate.id) if plate else ''}
+                                name = f"{mode} {scheme}{' normalized' if normalize else ''}{' layout' if plate else ''}"
+                                get_result_cache(app).clear()
+                                client.post('/analysis', data=dict(form, image=(io.BytesIO(golden_image(seed)), 'strip.png')),
+                                            content_type='multipart/form-data')
+                                out['auto ' + name] = _stored(Run.query.order_by(Run.id.desc()).first())
+                                get_result_cache(app).clear()
+                                preview = client.post('/analysis/preview', data=dict(form, image=(io.BytesIO(golden_image(100 + seed)), 'strip.png')),
+                                                      content_type='multipart/form-data')
+                                image_path = re.search(r'name="image_path" value="([^"]+)"', preview.get_data(as_text=True)).group(1)
+                                points = _dragged_points(720, 360, plate, n)
+                                client.post('/analysis/compute', data=dict(form, image_path=image_path, points_json=json.dumps(points)))
+                                out['points ' + name] = _stored(Run.query.order_by(Run.id.desc()).first())
+                set_app_setting('mode', 'default')
+                n = max(1, min(10, len(get_active_pesticides(profile.id))))
+                for plate in (None, layout):
+                    form = {'sampling_scheme': 'box-9x9', 'normalize': 'on', 'layout_id': str(plate.id) if plate else ''}
+                    preview = client.post('/analysis/preview', data=dict(form, image=(io.BytesIO(golden_image(300 + (plate is not None))), 'strip.png')),
+                                          content_type='multipart/form-data')
+                    image_path = re.search(r'name="image_path" value="([^"]+)"', preview.get_data(as_text=True)).group(1)
+                    points = _off_image_points(720, 360, plate, n)
+                    client.post('/analysis/compute', data=dict(form, image_path=image_path, points_json=json.dumps(points)))
+                    out[f"points off-image{' layout' if plate else ''}"] = _stored(Run.query.order_by(Run.id.desc()).first())
+                batch_dir = os.path.join(tmp, 'batch')
+                os.makedirs(batch_dir)
+                paths = []
+                for i in range(2):
+                    paths.append(os.path.join(batch_dir, f'strip{i}.png'))
+                    with open(paths[-1], 'wb') as fh:
+                        fh.write(golden_image(200 + i))
+                for mode in MODES:
+                    for plate in (None, layout):
+                        stats = analyze_files(paths, profile, mode, scheme='box-5x5', normalize=True, layout=plate, workers=1, reprocess=True)
+                        for i, run_id in enumerate(stats['run_ids']):
+                            out[f"batch {mode}{' layout' if plate else ''} {i}"] = _stored(db.session.get(Run, run_id))
+                db.session.remove()
+                db.engine.dispose()
+        finally:
+            os.chdir(previous_cwd)
+    return out
+
+
+def check_golden(path=GOLDEN_PATH):
+    """Compare run_cases() with the recorded outputs; returns (cases checked, [(case, message), ...])."""
+    with open(path, encoding='utf-8') as fh:
+        expected = json.load(fh)
+    actual = json.loads(json.dumps(run_cases()))
+    mismatches = []
+    for name in sorted(set(expected) | set(actual)):
+        want, got = expected.get(name), actual.get(name)
+        if want is None or got is None:
+            mismatches.append((name, 'missing from the golden file' if want is None else 'no longer produced'))
+        elif want['run'] != got['run']:
+            mismatches.append((name, f"run columns differ: expected {want['run']}, got {got['run']}"))
+        elif len(want['results']) != len(got['results']):
+            mismatches.append((name, f"{len(got['results'])} results, expected {len(want['results'])}"))
+        else:
+            for i, (w, g) in enumerate(zip(want['results'], got['results'])):
+                diff = [f"{c}: {a!r} != {b!r}" for c, a, b in zip(RESULT_COLUMNS, w, g) if a != b]
+                if diff:
+                    mismatches.append((name, f"result {i}: " + ', '.join(diff)))
+    return len(expected), mismatches
+
+
+def update_golden(path=GOLDEN_PATH):
+    """Rewrite the golden file from the current code (one case per line); returns the number of cases."""
+    cases = run_cases()
+    with open(path, 'w', encoding='utf-8') as fh:
+        fh.write('{\n' + ',\n'.join(f"{json.dumps(name)}: {json.dumps(case)}" for name, case in sorted(cases.items())) + '\n}\n')
+    return len(cases)
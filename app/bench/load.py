@@ -0,0 +1,271 @@
+"""Load test: replay operator traffic at increasing concurrency and report latency per route.
+
+Each virtual operator loops over weighted scenarios built from synthetic strip images:
+
+upload    POST /analysis (auto-placed points)
+compute   POST /analysis/preview, then POST /analysis/compute with the previewed points
+browse    GET /history, then GET /history/<id>
+export    GET /history/<id>/export
+
+Without a target URL the app is started locally on a free port against a throwaway
+database and upload directory, so a run never touches real data. The report is plain
+JSON (per concurrency level: throughput, error rate and kinds, p50/p95/p99 per route)
+so results from two releases can be diffed.
+"""
+import io
+import json
+import os
+import platform
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+from PIL import Image
+
+SCENARIO_WEIGHTS = {'upload': 3, 'compute': 3, 'browse': 3, 'export': 1}
+_IMAGE_PATH_RE = re.compile(rb'name="image_path" value="([^"]+)"')
+_RUN_LINK_RE = re.compile(rb'/history/(\d+)')
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def synthetic_strip(width=1200, height=600, seed=0):
+    """PNG bytes of a strip-like test image: a colour gradient with sensor noise and a dark corner."""
+    rng = np.random.default_rng(seed)
+    arr = np.full((height, width, 3), 120, dtype=np.int16)
+    arr[:, :, 0] = np.linspace(60, 200, width, dtype=np.int16)[None, :]
+    arr[:, :, 2] = rng.integers(90, 160)
+    arr += rng.integers(-10, 10, arr.shape, dtype=np.int16)
+    arr[:12, :12] = 20
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8)).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def _multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    out = io.BytesIO()
+    for name, value in fields.items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data) in files.items():
+        out.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                  f'Content-Type: image/png\r\n\r\n'.encode())
+        out.write(data)
+        out.write(b'\r\n')
+    out.write(f'--{boundary}--\r\n'.encode())
+    return out.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+class _Recorder:
+    def __init__(self):
+        self.samples = []  # (route, seconds, error kind or None)
+        self._lock = threading.Lock()
+
+    def add(self, route, seconds, error):
+        with self._lock:
+            self.samples.append((route, seconds, error))
+
+
+class _Client:
+    def __init__(self, base_url, recorder, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.timeout = timeout
+
+    def request(self, route, path, data=None, content_type=None):
+        """Send one request; returns the body on 2xx/3xx, None on error (recorded either way)."""
+        req = urllib.request.Request(self.base_url + path, data=data, method='POST' if data is not None else 'GET')
+        if content_type:
+            req.add_header('Content-Type', content_type)
+        start = time.perf_counter()
+        error = body = None
+        try:
+            with _opener.open(req, timeout=self.timeout) as resp:
+                body = resp.read()
+        except urllib.error.HTTPError as exc:
+            if exc.code < 400:
+                body = b''  # redirect, not followed
+            else:
+                text = exc.read().decode('utf-8', 'replace')
+                error = 'database is locked' if 'database is locked' in text else f'HTTP {exc.code}'
+        except (urllib.error.URLError, OSError) as exc:
+            error = type(getattr(exc, 'reason', exc)).__name__
+        self.recorder.add(route, time.perf_counter() - start, error)
+        return body
+
+
+def _scenario(client, name, rng, images, run_ids):
+    if name == 'upload':
+        body, ctype = _multipart({'sampling_scheme': '5-pixel'}, {'image': ('strip.png', rng.choice(images))})
+        page = client.request('POST /analysis', '/analysis', body, ctype)
+        if page:
+            run_ids.extend(int(m) for m in _RUN_LINK_RE.findall(page)[:1])
+    elif name == 'compute':
+        body, ctype = _multipart({}, {'image': ('strip.png', rng.choice(images))})
+        page = client.request('POST /analysis/preview', '/analysis/preview', body, ctype)
+        match = page and _IMAGE_PATH_RE.search(page)
+        if match:
+            points = [{'x': 100 + 200 * i + rng.randint(-20, 20), 'y': 220 + rng.randint(-20, 20)} for i in range(5)]
+            form = urllib.parse.urlencode({'image_path': match.group(1).decode(), 'points_json': json.dumps(points)}).encode()
+            client.request('POST /analysis/compute', '/analysis/compute', form, 'application/x-www-form-urlencoded')
+    elif name == 'browse':
+        client.request('GET /history', '/history')
+        if run_ids:
+            client.request('GET /history/<id>', f'/history/{rng.choice(run_ids)}')
+    elif name == 'export' and run_ids:
+        client.request('GET /history/<id>/export', f'/history/{rng.choice(run_ids)}/export')
+
+
+def _percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 1), 'p95_ms': round(float(p95), 1), 'p99_ms': round(float(p99), 1),
+            'mean_ms': round(float(ms.mean()), 1), 'max_ms': round(float(ms.max()), 1)}
+
+
+def _summarize(concurrency, samples, seconds):
+    routes = {}
+    for route, latency, error in samples:
+        routes.setdefault(route, []).append((latency, error))
+    errors = [e for _r, _l, e in samples if e]
+    kinds = {}
+    for e in errors:
+        kinds[e] = kinds.get(e, 0) + 1
+    return {
+        'concurrency': concurrency,
+        'duration_s': round(seconds, 2),
+        'requests': len(samples),
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(samples), 4) if samples else 0.0,
+        'throughput_rps': round(len(samples) / seconds, 2) if seconds else 0.0,
+        'error_kinds': kinds,
+        'routes': {
+            route: dict(count=len(rows), errors=sum(1 for _l, e in rows if e), **_percentiles([l for l, _e in rows]))
+            for route, rows in sorted(routes.items())
+        },
+    }
+
+
+def _knee(levels):
+    """Lowest concurrency after which throughput gains less than 10%: where the box saturates."""
+    best = None
+    for level in levels:
+        if best is not None and level['throughput_rps'] < best['throughput_rps'] * 1.1:
+            return best['concurrency']
+        if best is None or level['throughput_rps'] > best['throughput_rps']:
+            best = level
+    return None
+
+
+def _quiet_handler():
+    from werkzeug.serving import WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass  # thousands of access-log lines would drown the report
+
+    return QuietHandler
+
+
+@contextmanager
+def local_server(config_overrides=None):
+    """Start the app on 127.0.0.1:<free port> with a temporary database and working directory; yields the base URL."""
+    from werkzeug.serving import make_server
+
+    from app import create_app
+    from app.extensions import db
+    from app.services import ensure_schema_columns, seed_defaults
+
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='bioap-load-') as tmp:
+        os.chdir(tmp)  # uploads are relative to the working directory
+        try:
+            app = create_app(dict({
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'load.sqlite'),
+            }, **(config_overrides or {})))
+            with app.app_context():
+                db.create_all()
+                ensure_schema_columns()
+                seed_defaults()
+            server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=_quiet_handler())
+            thread = threading.Thread(target=server.serve_forever, name='bioap-load-server', daemon=True)
+            thread.start()
+            try:
+                yield f'http://127.0.0.1:{server.server_port}'
+            finally:
+                server.shutdown()
+                with app.app_context():
+                    db.engine.dispose()
+        finally:
+            os.chdir(previous_cwd)
+
+
+def run_load_test(base_url=None, levels=(1, 2, 4, 8, 16), duration=10.0, images=16, seed=0, timeout=30.0, weights=None, progress=None):
+    """
+    Ramp through `levels` concurrent operators for `duration` seconds each and return the report dict.
+    Without base_url a local server is started (see local_server). progress(level_summary) is called after each level.
+    """
+    weights = weights or SCENARIO_WEIGHTS
+    if base_url is None:
+        with local_server() as url:
+            report = run_load_test(url, levels, duration, images, seed, timeout, weights, progress)
+        report['meta']['target'] = 'local'
+        return report
+    pool = [synthetic_strip(seed=seed * 1000 + i) for i in range(images)]
+    names, scenario_weights = list(weights), list(weights.values())
+    run_ids = []
+    warm = _Client(base_url, _Recorder(), timeout)
+    for i in range(3):  # give history/export something to read
+        _scenario(warm, 'upload', random.Random(seed + i), pool, run_ids)
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'target': base_url,
+            'levels': list(levels),
+            'duration_s': duration,
+            'images': images,
+            'seed': seed,
+            'weights': dict(weights),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'levels': [],
+    }
+    for concurrency in levels:
+        recorder = _Recorder()
+        deadline = time.perf_counter() + duration
+
+        def operator(worker):
+            rng = random.Random(f'{seed}-{concurrency}-{worker}')
+            client = _Client(base_url, recorder, timeout)
+            while time.perf_counter() < deadline:
+                _scenario(client, rng.choices(names, scenario_weights)[0], rng, pool, run_ids)
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=operator, args=(w,), daemon=True) for w in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        summary = _summarize(concurrency, recorder.samples, time.perf_counter() - start)
+        report['levels'].append(summary)
+        if progress:
+            progress(summary)
+    report['saturation_concurrency'] = _knee(report['levels'])
+    return report
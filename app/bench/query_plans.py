@@ -0,0 +1,97 @@
+"""Query-plan regression check: EXPLAIN QUERY PLAN for the hot queries on run, run_result and trend_bucket.
+
+Each entry mirrors a query issued by a route or service (named in `used_by`). A plan line
+that scans one of those tables without an index is a violation: as history grows, that
+query reads every row. Scanning an index in order (history list, distinct upload paths)
+is allowed; it is how those whole-table reads are meant to run.
+"""
+import os
+import re
+import tempfile
+
+_FULL_SCAN = re.compile(r'^SCAN (TABLE )?(run|run_result|trend_bucket)\b')
+
+
+def _hot_queries():
+    from sqlalchemy import func
+
+    from app.extensions import db
+    from app.models import CalibrationPoint, CalibrationProfile, Pesticide, Run, RunResult, ThresholdBand, TrendBucket
+
+    def recompute_base():
+        return (db.session.query(RunResult.id, RunResult.rgb_sum)
+                .join(Run, Run.id == RunResult.run_id)
+                .filter(Run.profile_id == 1, Run.mode != 'scientific', Run.created_at >= '2020-01-01'))
+
+    return [
+        ('history list', 'routes/history.history',
+         lambda: Run.query.order_by(Run.created_at.desc())),
+        ('run results', 'routes/history.history_detail, history_export, history_compare',
+         lambda: RunResult.query.filter_by(run_id=1).order_by(RunResult.id.asc())),
+        ('results of runs', 'services/calibration_ingest.run_template_rows, ingest_calibration_points',
+         lambda: RunResult.query.filter(RunResult.run_id.in_([1, 2, 3])).order_by(RunResult.run_id.asc(), RunResult.id.asc())),
+        ('recompute count', 'services/recompute.recompute_results',
+         lambda: recompute_base().order_by(None).with_entities(func.count())),
+        ('recompute batch', 'services/recompute.recompute_results',
+         lambda: recompute_base().filter(RunResult.id > 0).order_by(RunResult.id.asc()).limit(5000)),
+        ('upload ref count', 'services/upload_store.upload_ref_count',
+         lambda: Run.query.filter_by(image_path='static/uploads/x.png').with_entities(func.count())),
+        ('referenced uploads', 'services/upload_store.sweep_uploads',
+         lambda: db.session.query(Run.image_path).distinct()),
+        ('upload ROI band', 'services/upload_lifecycle._roi_band',
+         lambda: (db.session.query(func.min(RunResult.pixel_y), func.max(RunResult.pixel_y), func.count(Run.roi))
+                  .join(Run, Run.id == RunResult.run_id).filter(Run.image_path == 'static/uploads/x.png'))),
+        ('newest use per upload', 'services/upload_lifecycle.run_lifecycle',
+         lambda: db.session.query(Run.image_path, func.max(Run.created_at)).group_by(Run.image_path)),
+        ('trend window', 'services/trends.trend_series',
+         lambda: TrendBucket.query.filter(TrendBucket.profile_id == 1, TrendBucket.period == 'day',
+                                          TrendBucket.bucket >= '2020-01-01', TrendBucket.bucket <= '2020-01-30')),
+        ('deleted run trends', 'services/trends.forget_run_trends',
+         lambda: (db.session.query(Run.profile_id, Run.created_at, RunResult.pesticide_key, RunResult.level, RunResult.concentration)
+                  .join(Run, Run.id == RunResult.run_id).filter(Run.id.in_([1, 2]), Run.mode != 'scientific'))),
+        ('active profile', 'services/profile_service.get_active_profile',
+         lambda: CalibrationProfile.query.filter_by(is_active=True)),
+        ('active cases', 'services/profile_service.get_active_pesticides',
+         lambda: Pesticide.query.filter_by(profile_id=1, active=True).order_by(Pesticide.order_index.asc())),
+        ('profile points', 'services/profile_service.profile_version',
+         lambda: (db.session.query(CalibrationPoint.pesticide_id, CalibrationPoint.concentration)
+                  .join(Pesticide, Pesticide.id == CalibrationPoint.pesticide_id).filter(Pesticide.profile_id == 1))),
+        ('profile bands', 'services/profile_service.profile_version',
+         lambda: (db.session.query(ThresholdBand.pesticide_id, ThresholdBand.band)
+                  .join(Pesticide, Pesticide.id == ThresholdBand.pesticide_id).filter(Pesticide.profile_id == 1))),
+    ]
+
+
+def explain(query):
+    """EXPLAIN QUERY PLAN detail lines for a SQLAlchemy query on the current session's SQLite connection."""
+    from app.extensions import db
+
+    compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup or ())
+    rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params).all()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans():
+    """Plan of every hot query in the current app context: [{'name', 'used_by', 'plan', 'violations'}]."""
+    report = []
+    for name, used_by, build in _hot_queries():
+        plan = explain(build())
+        violations = [line for line in plan if _FULL_SCAN.match(line) and 'INDEX' not in line]
+        report.append({'name': name, 'used_by': used_by, 'plan': plan, 'violations': violations})
+    return report
+
+
+def check_fresh_schema():
+    """check_query_plans against a throwaway database created from the models, so the result depends only on the index set."""
+    from app import create_app
+    from app.extensions import db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'plans.sqlite')})
+        with app.app_context():
+            db.create_all()
+            report = check_query_plans()
+            db.session.remove()
+            db.engine.dispose()
+    return report
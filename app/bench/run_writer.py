@@ -0,0 +1,87 @@
+"""Run persistence throughput: direct commits versus the single-writer queue."""
+import os
+import tempfile
+import threading
+import time
+
+
+def _payload(profile_id, results_per_run):
+    run_fields = dict(
+        profile_id=profile_id, mode='default', name='bench', image_path='static/uploads/bench.png',
+        used_normalization=False, background_point_x=0, background_point_y=0, sampling_scheme='5-pixel',
+        image_width=100, image_height=100, bg_r=10.0, bg_g=10.0, bg_b=10.0,
+    )
+    results = [
+        dict(pesticide_key='acephate', pixel_x=i, pixel_y=i, rgb_sum=330, concentration=0.42, level='Medium',
+             raw_r=110.0, raw_g=110.0, raw_b=110.0)
+        for i in range(results_per_run)
+    ]
+    return run_fields, results
+
+
+def _measure(enabled, clients, runs_per_client, results_per_run):
+    from app import create_app
+    from app.extensions import db
+    from app.models import CalibrationProfile, Run
+    from app.services import get_run_writer, persist_run
+    from app.services.seed import seed_defaults
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.sqlite'),
+            'RUN_WRITER_ENABLED': enabled,
+        })
+        with app.app_context():
+            db.create_all()
+            seed_defaults()
+            profile_id = CalibrationProfile.query.filter_by(is_active=True).first().id
+            batches_before = get_run_writer(app).batches if enabled else 0
+        run_fields, results = _payload(profile_id, results_per_run)
+        errors = []
+        barrier = threading.Barrier(clients + 1)
+
+        def client():
+            with app.app_context():
+                barrier.wait()
+                for _ in range(runs_per_client):
+                    try:
+                        persist_run(run_fields, results)
+                    except Exception as exc:  # e.g. "database is locked" under contention
+                        errors.append(exc)
+                db.session.remove()
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for t in threads:
+            t.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for t in threads:
+            t.join()
+        seconds = time.perf_counter() - start
+        with app.app_context():
+            stored = Run.query.count()
+            commits = get_run_writer(app).batches - batches_before if enabled else stored
+            db.engine.dispose()
+    return {
+        'mode': 'writer' if enabled else 'direct',
+        'clients': clients,
+        'runs': stored,
+        'errors': len(errors),
+        'commits': commits,
+        'seconds': seconds,
+        'runs_per_sec': stored / seconds if seconds else 0.0,
+    }
+
+
+def benchmark_group_commit(clients=(1, 8, 32), runs_per_client=50, results_per_run=5):
+    """
+    Store runs_per_client runs from each of `clients` concurrent threads into a fresh
+    file-backed SQLite database, once with direct per-request commits and once through the
+    run writer. Returns {'mode', 'clients', 'runs', 'errors', 'commits', 'seconds', 'runs_per_sec'} rows.
+    """
+    rows = []
+    for n in clients:
+        for enabled in (False, True):
+            rows.append(_measure(enabled, n, runs_per_client, results_per_run))
+    return rows
@@ -0,0 +1,46 @@
+"""Sampling kernel cost versus window size."""
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.services import ImageSampler, parse_sampling_scheme, sample_five_pixel_total
+
+
+def _best_of(func, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_sampling(width=2000, height=1500, rois=10, sizes=(3, 5, 9, 15, 31, 51), repeats=5, seed=0):
+    """
+    Time each kernel for `rois` points on a synthetic width×height image.
+    Returns a list of {'scheme', 'window', 'seconds', 'us_per_roi'} rows; the summed-area
+    table is built once per image and reported as its own 'sat-build' row.
+    """
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    image = Image.fromarray(pixels)
+    xs = rng.integers(0, width, rois)
+    ys = rng.integers(0, height, rois)
+    rows = []
+
+    def add(scheme, window, seconds):
+        rows.append({'scheme': scheme, 'window': window, 'seconds': seconds, 'us_per_roi': seconds / rois * 1e6})
+
+    add('5-pixel (getpixel)', 1, _best_of(lambda: [sample_five_pixel_total(image, int(x), int(y)) for x, y in zip(xs, ys)], repeats))
+    add('sat-build', 0, _best_of(lambda: ImageSampler(pixels).sat, repeats))
+    sampler = ImageSampler(pixels)
+    sampler.sat  # built once per image, as in the routes
+    schemes = ['5-pixel']
+    for n in sizes:
+        schemes += [f'box-{n}x{n}', f'disk-r{n // 2}', f'median-{n}x{n}', f'trimmed-{n}x{n}']
+    for scheme in schemes:
+        kernel = parse_sampling_scheme(scheme)
+        window = 1 if kernel.kind == 'five' else (2 * kernel.size + 1 if kernel.kind == 'disk' else kernel.size)
+        add(scheme, window, _best_of(lambda: sampler.totals(xs, ys, kernel), repeats))
+    return rows
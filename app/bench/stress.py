@@ -0,0 +1,230 @@
+"""Concurrency stress suite: profile activation, calibration saves, analysis and data clears in parallel.
+
+Worker threads drive the real routes through test clients on a throwaway file-backed SQLite
+database (three profiles with disjoint case keys: a lost update needs two activations of
+different inactive profiles racing), each picking operations at random until the
+time is up, while a monitor thread keeps counting active profiles on its own connection.
+Invariants checked:
+  - exactly one profile is active at every sample and at the end
+  - every stored result belongs to a run, and its case key is one of that run's profile's cases
+    (a run scored against a profile other than its own would break this)
+  - the trend summary equals a rebuild from run_result
+  - no request failed (5xx or exception)
+Throughput is reported per operation, and the caller can require a minimum overall rate.
+"""
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+OPERATIONS = ('activate', 'calibrate', 'analyze', 'clear')
+WEIGHTS = (3, 2, 4, 1)
+STRESS_PROFILES = {'Stress A': ('a_one', 'a_two', 'a_three'), 'Stress B': ('b_one', 'b_two')}
+
+
+def _image(rng):
+    """Small PNG with random content (a distinct upload each time) on the seeded curves' brightness range."""
+    arr = np.clip(rng.integers(45, 130) + rng.integers(-6, 7, (80, 160, 3)), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(arr).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def _setup():
+    """STRESS_PROFILES next to Default, each with its own case keys; returns every profile id."""
+    from app.extensions import db
+    from app.models import CalibrationPoint, CalibrationProfile, Pesticide
+
+    ids = [CalibrationProfile.query.filter_by(name='Default').first().id]
+    for name, keys in STRESS_PROFILES.items():
+        profile = CalibrationProfile(name=name, is_active=False)
+        db.session.add(profile)
+        db.session.flush()
+        ids.append(profile.id)
+        for i, key in enumerate(keys):
+            pest = Pesticide(profile_id=profile.id, key=key, display_name=key.title(), order_index=i, active=True)
+            db.session.add(pest)
+            db.session.flush()
+            for seq, (concentration, rgb_sum) in enumerate(((0.0, 390), (0.5, 300), (1.0, 200))):
+                db.session.add(CalibrationPoint(pesticide_id=pest.id, seq_index=seq, concentration=concentration, rgb_sum=rgb_sum))
+    db.session.commit()
+    return ids
+
+
+class _Worker:
+    def __init__(self, app, profile_ids, seed, deadline, stats, lock):
+        self.app = app
+        self.client = app.test_client()
+        self.profile_ids = profile_ids
+        self.rng = random.Random(seed)
+        self.np_rng = np.random.default_rng(seed)
+        self.deadline = deadline
+        self.stats = stats
+        self.lock = lock
+
+    def activate(self):
+        return [self.client.post(f'/profiles/activate/{self.rng.choice(self.profile_ids)}')]
+
+    def calibrate(self):
+        from app.models import CalibrationPoint
+        from app.services import get_active_pesticides, get_active_profile
+
+        form = {}
+        for pest in get_active_pesticides(get_active_profile().id):
+            points = CalibrationPoint.query.filter_by(pesticide_id=pest.id).order_by(CalibrationPoint.seq_index.asc()).all()
+            shift = self.rng.randint(-3, 3)
+            for row, cp in enumerate(points):
+                form[f'concentration-{pest.id}-{row}'] = str(cp.concentration)
+                form[f'rgb-{pest.id}-{row}'] = str(cp.rgb_sum + shift)  # same shift keeps them decreasing
+        return [self.client.post('/calibration/save', data=form)]
+
+    def analyze(self):
+        preview = self.client.post('/analysis/preview', data={'image': (io.BytesIO(_image(self.np_rng)), 'stress.png')},
+                                   content_type='multipart/form-data')
+        found = re.search(r'name="image_path" value="([^"]+)"', preview.get_data(as_text=True))
+        if not found:
+            return [preview]
+        points = [{"x": 20 + 30 * i, "y": 30} for i in range(5)]
+        compute = self.client.post('/analysis/compute', data={'image_path': found.group(1), 'points_json': json.dumps(points)})
+        return [preview, compute]
+
+    def clear(self):
+        return [self.client.post('/data/clear')]
+
+    def run(self):
+        from app.extensions import db
+
+        with self.app.app_context():
+            while time.perf_counter() < self.deadline:
+                op = self.rng.choices(OPERATIONS, WEIGHTS)[0]
+                start = time.perf_counter()
+                error = None
+                try:
+                    failed = [r.status_code for r in getattr(self, op)() if r.status_code >= 500]
+                    if failed:
+                        error = f"{op}: HTTP {failed[0]}"
+                except Exception as exc:  # TESTING propagates route exceptions
+                    error = f"{op}: {type(exc).__name__}: {exc}"
+                    db.session.rollback()
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    entry = self.stats[op]
+                    entry['latencies'].append(elapsed)
+                    if error:
+                        entry['errors'] += 1
+                        if len(self.stats['messages']) < 10:
+                            self.stats['messages'].append(error)
+                db.session.remove()
+
+
+def _monitor(engine, stop, samples):
+    """Count active profiles on a separate connection until stop is set."""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        while not stop.is_set():
+            samples.append(conn.execute(text('SELECT count(*) FROM calibration_profile WHERE is_active')).scalar())
+            conn.rollback()
+            time.sleep(0.002)
+
+
+def _check_invariants(samples):
+    from sqlalchemy import text
+
+    from app.extensions import db
+    from app.models import TrendBucket
+    from app.services import rebuild_trends
+
+    violations = []
+    bad = [n for n in samples if n != 1]
+    if bad:
+        violations.append(f"{len(bad)} of {len(samples)} samples saw {sorted(set(bad))} active profiles")
+    active = db.session.execute(text('SELECT count(*) FROM calibration_profile WHERE is_active')).scalar()
+    if active != 1:
+        violations.append(f"{active} active profiles at the end")
+    orphans = db.session.execute(text(
+        'SELECT count(*) FROM run_result WHERE run_id NOT IN (SELECT id FROM run)')).scalar()
+    if orphans:
+        violations.append(f"{orphans} result(s) without a run")
+    foreign = db.session.execute(text(
+        'SELECT count(*) FROM run_result rr JOIN run r ON r.id = rr.run_id '
+        'WHERE r.mode != \'scientific\' AND rr.pesticide_key NOT IN '
+        '(SELECT p.key FROM pesticide p WHERE p.profile_id = r.profile_id)')).scalar()
+    if foreign:
+        violations.append(f"{foreign} result(s) scored against a case of another profile")
+
+    def snapshot():
+        return sorted((b.profile_id, b.period, b.bucket, b.pesticide_key, b.n, round(b.concentration_sum, 6),
+                       b.n_low, b.n_medium, b.n_high, b.n_out_of_range) for b in TrendBucket.query.all())
+
+    incremental = snapshot()
+    rebuild_trends()
+    if snapshot() != incremental:
+        violations.append("trend summary differs from a rebuild")
+    return violations
+
+
+def run_stress(threads=8, seconds=10.0, seed=0):
+    """
+    Run the suite; returns {'threads', 'seconds', 'ops': {op: {'count', 'errors', 'per_sec',
+    'p50_ms', 'p95_ms'}}, 'total', 'per_sec', 'samples', 'violations', 'messages'}.
+    """
+    from app import create_app
+    from app.extensions import db
+    from app.services import ensure_schema_columns, seed_defaults
+
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='bioap-stress-') as tmp:
+        os.chdir(tmp)  # uploads are relative to the working directory
+        try:
+            app = create_app({'TESTING': True, 'RESULT_CACHE_SIZE': 0,
+                              'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'stress.sqlite')})
+            with app.app_context():
+                db.create_all()
+                ensure_schema_columns()
+                seed_defaults()
+                profile_ids = _setup()
+                engine = db.engine
+            stats = {op: {'latencies': [], 'errors': 0} for op in OPERATIONS}
+            stats['messages'] = []
+            lock = threading.Lock()
+            samples = []
+            stop = threading.Event()
+            monitor = threading.Thread(target=_monitor, args=(engine, stop, samples), daemon=True)
+            monitor.start()
+            start = time.perf_counter()
+            workers = [_Worker(app, profile_ids, seed * 1000 + i, start + seconds, stats, lock) for i in range(threads)]
+            pool = [threading.Thread(target=w.run) for w in workers]
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.perf_counter() - start
+            stop.set()
+            monitor.join()
+            with app.app_context():
+                violations = _check_invariants(samples)
+                db.session.remove()
+                db.engine.dispose()
+        finally:
+            os.chdir(previous_cwd)
+    ops = {}
+    for op in OPERATIONS:
+        latencies = sorted(stats[op]['latencies'])
+        ops[op] = {
+            'count': len(latencies),
+            'errors': stats[op]['errors'],
+            'per_sec': len(latencies) / elapsed if elapsed else 0.0,
+            'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        }
+    total = sum(o['count'] for o in ops.values())
+    return {'threads': threads, 'seconds': elapsed, 'ops': ops, 'total': total, 'per_sec': total / elapsed if elapsed else 0.0,
+            'samples': len(samples), 'violations': violations, 'messages': stats['messages']}
@@ -0,0 +1,272 @@
+"""Flask CLI commands (run with `flask --app main <command>`)."""
+import click
+
+from app.models import CalibrationProfile, PlateLayout
+from app.services import (
+    build_assets,
+    sweep_uploads,
+    run_configured_lifecycle,
+    parse_calibration_csv,
+    ingest_calibration_points,
+    recompute_results,
+    rebuild_trends,
+    analyze_files,
+    find_images,
+    get_active_profile,
+    get_app_mode,
+    parse_sampling_scheme,
+    DEFAULT_SAMPLING_SCHEME,
+)
+
+
+def register_commands(app):
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Fingerprint static/public assets into static/dist with gzip variants."""
+        manifest = build_assets(app.config['PROJECT_ROOT'])
+        for logical, hashed in sorted(manifest.items()):
+            click.echo(f"{logical} -> {hashed}")
+        click.echo(f"Built {len(manifest)} asset(s).")
+
+    @app.cli.command('sweep-uploads')
+    @click.option('--ttl', type=int, default=None, help='Staging TTL in seconds (default: UPLOAD_STAGING_TTL).')
+    def sweep_uploads_command(ttl):
+        """Delete expired staged uploads and uploads no run references."""
+        report = sweep_uploads(app.config['UPLOAD_STAGING_TTL'] if ttl is None else ttl)
+        click.echo(f"Staged:   {report['staged_files']} file(s), {report['staged_bytes']} bytes")
+        click.echo(f"Orphaned: {report['orphan_files']} file(s), {report['orphan_bytes']} bytes")
+        click.echo(f"Reclaimed {report['reclaimed_bytes']} bytes.")
+
+    @app.cli.command('archive-uploads')
+    def archive_uploads_command():
+        """Move old upload images to the warm (re-encoded) and cold (monthly bundle) tiers."""
+        report = run_configured_lifecycle(app.config)
+        for tier in ('warm', 'cold'):
+            t = report[tier]
+            click.echo(f"{tier:<5} {t['files']} file(s), {t['before_bytes']} -> {t['after_bytes']} bytes, saved {t['saved_bytes']}")
+        if report['errors']:
+            click.echo(f"{report['errors']} file(s) could not be moved.", err=True)
+
+    @app.cli.command('bench-sampling')
+    @click.option('--width', type=int, default=2000)
+    @click.option('--height', type=int, default=1500)
+    @click.option('--rois', type=int, default=10, help='Sample points per image.')
+    def bench_sampling_command(width, height, rois):
+        """Compare sampling kernel cost against window size."""
+        from app.bench.sampling import benchmark_sampling
+        rows = benchmark_sampling(width=width, height=height, rois=rois)
+        click.echo(f"{'scheme':<22}{'window':>8}{'ms/image':>12}{'us/ROI':>12}")
+        for row in rows:
+            click.echo(f"{row['scheme']:<22}{row['window']:>8}{row['seconds'] * 1000:>12.3f}{row['us_per_roi']:>12.1f}")
+
+    @app.cli.command('bench-embedded')
+    @click.option('--width', type=int, default=1920)
+    @click.option('--height', type=int, default=1080)
+    @click.option('--frames', type=int, default=200, help='Frames per scheme.')
+    def bench_embedded_command(width, height, frames):
+        """Check FrameAnalyzer against the analysis pipeline, then time it on raw frames."""
+        from app.bench.embedded import run_embedded_bench
+        mismatches, rows = run_embedded_bench(width=width, height=height, frames=frames)
+        for message in mismatches:
+            click.echo(f"FAIL {message}", err=True)
+        if mismatches:
+            raise click.ClickException(f"{len(mismatches)} difference(s) between FrameAnalyzer and the analysis pipeline.")
+        click.echo("FrameAnalyzer matches the analysis pipeline.")
+        click.echo(f"{'scheme':<14}{'ms/frame':>10}{'frames/s':>10}{'pipeline ms':>13}")
+        for row in rows:
+            click.echo(f"{row['scheme']:<14}{row['embedded_ms']:>10.3f}{row['fps']:>10.1f}{row['pipeline_ms']:>13.2f}")
+
+    @app.cli.command('bench-run-writer')
+    @click.option('--clients', default='1,8,32', help='Comma-separated concurrent client counts.')
+    @click.option('--runs', type=int, default=50, help='Runs stored per client.')
+    @click.option('--results', type=int, default=5, help='Results per run.')
+    def bench_run_writer_command(clients, runs, results):
+        """Compare run commits/sec with and without the single-writer queue."""
+        from app.bench.run_writer import benchmark_group_commit
+        counts = tuple(int(c) for c in clients.split(',') if c.strip())
+        rows = benchmark_group_commit(clients=counts, runs_per_client=runs, results_per_run=results)
+        click.echo(f"{'mode':<8}{'clients':>8}{'runs':>8}{'errors':>8}{'commits':>9}{'runs/s':>10}")
+        for row in rows:
+            click.echo(f"{row['mode']:<8}{row['clients']:>8}{row['runs']:>8}{row['errors']:>8}{row['commits']:>9}{row['runs_per_sec']:>10.1f}")
+
+    @app.cli.command('stress-test')
+    @click.option('--threads', type=int, default=8, show_default=True, help='Concurrent worker threads.')
+    @click.option('--seconds', type=float, default=10.0, show_default=True, help='How long the workers run.')
+    @click.option('--seed', type=int, default=0, show_default=True)
+    @click.option('--min-throughput', type=float, default=1.0, show_default=True, help='Fail below this many operations/s overall.')
+    def stress_test_command(threads, seconds, seed, min_throughput):
+        """Hammer activation, calibration saves, analysis and data clears in parallel; fail on broken invariants."""
+        from app.bench.stress import run_stress
+        report = run_stress(threads=threads, seconds=seconds, seed=seed)
+        click.echo(f"{'operation':<12}{'count':>8}{'errors':>8}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}")
+        for op, row in report['ops'].items():
+            click.echo(f"{op:<12}{row['count']:>8}{row['errors']:>8}{row['per_sec']:>9.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}")
+        click.echo(f"{report['total']} operations in {report['seconds']:.1f} s with {report['threads']} threads "
+                   f"({report['per_sec']:.1f}/s); {report['samples']} active-profile samples.")
+        for message in report['messages']:
+            click.echo(f"error: {message}", err=True)
+        problems = list(report['violations'])
+        errors = sum(row['errors'] for row in report['ops'].values())
+        if errors:
+            problems.append(f"{errors} failed request(s)")
+        if report['per_sec'] < min_throughput:
+            problems.append(f"throughput {report['per_sec']:.1f}/s is below {min_throughput:g}/s")
+        for problem in problems:
+            click.echo(f"FAIL {problem}", err=True)
+        if problems:
+            raise click.ClickException(f"{len(problems)} stress check(s) failed.")
+        click.echo("All invariants held.")
+
+    @app.cli.command('load-test')
+    @click.option('--url', default=None, help='Base URL of a running instance; default starts a throwaway local one.')
+    @click.option('--levels', default='1,2,4,8,16', help='Comma-separated concurrent operator counts.')
+    @click.option('--duration', type=float, default=10.0, show_default=True, help='Seconds per level.')
+    @click.option('--images', type=int, default=16, show_default=True, help='Distinct synthetic strip images.')
+    @click.option('--seed', type=int, default=0, show_default=True)
+    @click.option('--output', type=click.Path(dir_okay=False, writable=True), default=None, help='Write the JSON report here.')
+    def load_test_command(url, levels, duration, images, seed, output):
+        """Replay mixed operator traffic at increasing concurrency; report latency percentiles per route."""
+        import json
+
+        from app.bench.load import run_load_test
+
+        def progress(level):
+            click.echo(f"\n{level['concurrency']} operator(s): {level['requests']} requests, "
+                       f"{level['throughput_rps']:.1f} req/s, {level['error_rate']:.1%} errors {level['error_kinds'] or ''}")
+            click.echo(f"  {'route':<28}{'count':>7}{'errors':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+            for route, r in level['routes'].items():
+                click.echo(f"  {route:<28}{r['count']:>7}{r['errors']:>7}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+
+        counts = tuple(int(c) for c in levels.split(',') if c.strip())
+        report = run_load_test(url, levels=counts, duration=duration, images=images, seed=seed, progress=progress)
+        knee = report['saturation_concurrency']
+        click.echo(f"\nThroughput stops scaling after {knee} operator(s)." if knee else "\nThroughput still scaling at the highest level.")
+        if output:
+            with open(output, 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, indent=2)
+            click.echo(f"Report written to {output}.")
+
+    @app.cli.command('check-query-plans')
+    @click.option('--current', is_flag=True, help="Check the configured database instead of a fresh schema built from the models.")
+    @click.option('--verbose', is_flag=True, help='Print every plan, not only violations.')
+    def check_query_plans_command(current, verbose):
+        """Fail if a hot query's plan scans run or run_result without an index."""
+        from app.bench.query_plans import check_fresh_schema, check_query_plans
+        report = check_query_plans() if current else check_fresh_schema()
+        failed = [q for q in report if q['violations']]
+        for q in report:
+            if verbose or q['violations']:
+                click.echo(f"{'FAIL' if q['violations'] else 'ok  '} {q['name']} ({q['used_by']})")
+                for line in q['plan']:
+                    click.echo(f"       {line}")
+        if failed:
+            hint = ' Start the app once (python main.py) to create missing indexes.' if current else ''
+            raise click.ClickException(f"{len(failed)} of {len(report)} hot queries scan run/run_result without an index.{hint}")
+        click.echo(f"All {len(report)} hot queries use an index on run/run_result.")
+
+    @app.cli.command('check-golden')
+    @click.option('--update', is_flag=True, help='Rewrite the golden file from the current code (only for an intended change in results).')
+    def check_golden_command(update):
+        """Fail if any analysis path (auto, dragged points, layouts, batch) stores different numbers than recorded."""
+        from app.bench.golden import GOLDEN_PATH, check_golden, update_golden
+        if update:
+            click.echo(f"Recorded {update_golden()} case(s) in {GOLDEN_PATH}.")
+            return
+        checked, mismatches = check_golden()
+        for name, message in mismatches:
+            click.echo(f"FAIL {name}: {message}", err=True)
+        if mismatches:
+            raise click.ClickException(f"{len(mismatches)} mismatch(es) against {checked} golden case(s).")
+        click.echo(f"All {checked} golden case(s) match.")
+
+    @app.cli.command('ingest-calibration')
+    @click.argument('csv_file', type=click.File('r', encoding='utf-8'))
+    @click.option('--profile', 'profile_name', required=True, help='Target profile name.')
+    @click.option('--replace', is_flag=True, help="Replace the existing points of every case in the file.")
+    def ingest_calibration_command(csv_file, profile_name, replace):
+        """Bulk-add calibration points from CSV (pesticide, concentration, rgb_sum or run_id/result_key)."""
+        profile = CalibrationProfile.query.filter_by(name=profile_name).first()
+        if not profile:
+            raise click.ClickException(f"No profile named {profile_name!r}.")
+        rows, errors = parse_calibration_csv(csv_file.read())
+        if not errors:
+            added, errors = ingest_calibration_points(profile.id, rows, replace=replace)
+        if errors:
+            for msg in errors:
+                click.echo(msg, err=True)
+            raise click.ClickException('Nothing was imported.')
+        click.echo(f"Imported {added} calibration point(s) into {profile.name}.")
+
+    @app.cli.command('recompute-results')
+    @click.option('--profile', 'profile_name', required=True, help='Profile whose runs are re-evaluated.')
+    @click.option('--since', type=click.DateTime(['%Y-%m-%d']), default=None, help='Only runs created on/after this date.')
+    @click.option('--until', type=click.DateTime(['%Y-%m-%d']), default=None, help='Only runs created before this date.')
+    @click.option('--normalization', type=click.Choice(['keep', 'on', 'off']), default='keep', show_default=True,
+                  help='Keep stored RGB totals, or re-derive them from raw means with/without background normalization.')
+    @click.option('--batch-size', type=int, default=5000, show_default=True)
+    @click.option('--restart', is_flag=True, help='Start over instead of resuming an interrupted job.')
+    def recompute_results_command(profile_name, since, until, normalization, batch_size, restart):
+        """Re-evaluate stored results against the profile's current curves and bands."""
+        profile = CalibrationProfile.query.filter_by(name=profile_name).first()
+        if not profile:
+            raise click.ClickException(f"No profile named {profile_name!r}.")
+
+        def progress(job):
+            click.echo(f"\r{job['processed']}/{job['total']} checked, {job['updated']} updated", nl=False)
+
+        normalize = {'on': True, 'off': False}.get(normalization)
+        job = recompute_results(profile.id, since=since, until=until, normalize=normalize, batch_size=batch_size,
+                                resume=not restart, progress=progress)
+        click.echo(f"\nDone: {job['processed']} result(s) checked, {job['updated']} updated.")
+
+    @app.cli.command('rebuild-trends')
+    def rebuild_trends_command():
+        """Recompute the daily/weekly trend summary from every stored result (backfill after upgrading)."""
+        results, buckets = rebuild_trends()
+        click.echo(f"Summarized {results} result(s) into {buckets} trend bucket(s).")
+
+    @app.cli.command('analyze-batch')
+    @click.argument('sources', nargs=-1, required=True)
+    @click.option('--profile', 'profile_name', default=None, help='Profile to read against (default: the active one).')
+    @click.option('--mode', type=click.Choice(['default', 'customize', 'scientific']), default=None,
+                  help='Analysis mode (default: the mode set in Settings).')
+    @click.option('--scheme', default=DEFAULT_SAMPLING_SCHEME, show_default=True, help='Sampling kernel, as on the analysis form.')
+    @click.option('--normalize', is_flag=True, help='Subtract the background patch (not in scientific mode).')
+    @click.option('--layout', 'layout_name', default=None, help="Plate layout of the profile to sample instead of auto-placed points.")
+    @click.option('--workers', type=int, default=None, help='Worker processes (default: CPU count).')
+    @click.option('--commit-every', type=int, default=100, show_default=True, help='Runs stored per commit.')
+    @click.option('--recursive', is_flag=True, help='Descend into subdirectories.')
+    @click.option('--reprocess', is_flag=True, help='Analyze files even if their content already has a run for the profile.')
+    def analyze_batch_command(sources, profile_name, mode, scheme, normalize, layout_name, workers, commit_every, recursive, reprocess):
+        """Analyze image files from directories or glob patterns, storing one run per new image."""
+        profile = CalibrationProfile.query.filter_by(name=profile_name).first() if profile_name else get_active_profile()
+        if not profile:
+            raise click.ClickException(f"No profile named {profile_name!r}." if profile_name else "No active profile.")
+        layout = None
+        if layout_name:
+            layout = PlateLayout.query.filter_by(profile_id=profile.id, name=layout_name).first()
+            if not layout:
+                raise click.ClickException(f"Profile {profile.name!r} has no layout named {layout_name!r}.")
+        try:
+            parse_sampling_scheme(scheme)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+        paths = find_images(sources, recursive=recursive)
+        if not paths:
+            raise click.ClickException('No .jpg/.jpeg/.png files matched.')
+
+        def progress(stats):
+            click.echo(f"\r{stats['analyzed']} analyzed, {len(stats['failed'])} failed, {stats['images_per_sec']:.1f} images/s", nl=False)
+
+        try:
+            stats = analyze_files(paths, profile, mode or get_app_mode(), scheme=scheme, normalize=normalize, layout=layout,
+                                  workers=workers, commit_every=commit_every, reprocess=reprocess, progress=progress)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+        click.echo(f"\n{stats['files']} file(s): {stats['analyzed']} analyzed, {stats['skipped']} already processed, "
+                   f"{stats['duplicates']} duplicate(s), {len(stats['failed'])} failed.")
+        click.echo(f"{stats['seconds']:.1f} s total ({stats['hash_seconds']:.1f} s hashing), {stats['images_per_sec']:.1f} images/s.")
+        if stats['stage_seconds']:
+            click.echo('Stage totals: ' + ', '.join(f"{stage} {seconds:.2f} s" for stage, seconds in stats['stage_seconds'].items()))
+        for path, error in stats['failed']:
+            click.echo(f"failed: {path}: {error}", err=True)
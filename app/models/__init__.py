@@ -1,14 +1,19 @@
 """Models package: import all so they are registered with SQLAlchemy."""
-from app.models.profile import CalibrationProfile, Pesticide, CalibrationPoint, ThresholdBand
+from app.models.profile import CalibrationProfile, Pesticide, CalibrationPoint, ThresholdBand, PlateLayout
 from app.models.run import Run, RunResult
 from app.models.setting import AppSetting
+from app.models.upload_archive import ArchivedUpload
+from app.models.trend import TrendBucket
 
 __all__ = [
     'CalibrationProfile',
     'Pesticide',
     'CalibrationPoint',
     'ThresholdBand',
+    'PlateLayout',
     'Run',
     'RunResult',
     'AppSetting',
+    'ArchivedUpload',
+    'TrendBucket',
 ]
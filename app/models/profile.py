@@ -1,4 +1,4 @@
-"""Calibration profile, pesticide, calibration point, and threshold band models."""
+"""Calibration profile, pesticide, calibration point, threshold band, and plate layout models."""
 from datetime import datetime
 
 from app.extensions import db
@@ -6,6 +6,9 @@ from app.extensions import db
 
 class CalibrationProfile(db.Model):
     __tablename__ = 'calibration_profile'
+    __table_args__ = (
+        db.Index('ix_calibration_profile_is_active', 'is_active'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -14,17 +17,24 @@ class CalibrationProfile(db.Model):
 
 class Pesticide(db.Model):
     __tablename__ = 'pesticide'
+    __table_args__ = (
+        db.Index('ix_pesticide_profile_order', 'profile_id', 'order_index'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     profile_id = db.Column(db.Integer, db.ForeignKey('calibration_profile.id'), nullable=False)
     key = db.Column(db.String(50), nullable=False)
     display_name = db.Column(db.String(100), nullable=False)
     order_index = db.Column(db.Integer, default=0, nullable=False)
     active = db.Column(db.Boolean, default=True, nullable=False)
+    curve_model = db.Column(db.String(20), default='linear', nullable=False)  # 'linear' | 'monotone' | 'polynomial' | 'log-logistic'
     profile = db.relationship('CalibrationProfile', backref=db.backref('pesticides', lazy=True, cascade="all, delete-orphan"))
 
 
 class CalibrationPoint(db.Model):
     __tablename__ = 'calibration_point'
+    __table_args__ = (
+        db.Index('ix_calibration_point_pesticide', 'pesticide_id', 'seq_index'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     pesticide_id = db.Column(db.Integer, db.ForeignKey('pesticide.id'), nullable=False)
     seq_index = db.Column(db.Integer, default=0, nullable=False)
@@ -35,9 +45,32 @@ class CalibrationPoint(db.Model):
 
 class ThresholdBand(db.Model):
     __tablename__ = 'threshold_band'
+    __table_args__ = (
+        db.Index('ix_threshold_band_pesticide', 'pesticide_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     pesticide_id = db.Column(db.Integer, db.ForeignKey('pesticide.id'), nullable=False)
     band = db.Column(db.String(20), nullable=False)  # 'low' | 'medium' | 'high'
     min_value = db.Column(db.Float, nullable=False)
     max_value = db.Column(db.Float, nullable=False)
     pesticide = db.relationship('Pesticide', backref=db.backref('threshold_bands', lazy=True, cascade="all, delete-orphan"))
+
+
+class PlateLayout(db.Model):
+    """A rows x columns grid of sampling points (well plate or multi-row strip holder) for a profile."""
+    __tablename__ = 'plate_layout'
+    __table_args__ = (
+        db.Index('ix_plate_layout_profile', 'profile_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    profile_id = db.Column(db.Integer, db.ForeignKey('calibration_profile.id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    rows = db.Column(db.Integer, nullable=False)
+    columns = db.Column(db.Integer, nullable=False)
+    # Centre of well A1 and the distance between neighbouring wells, as fractions of image width/height
+    origin_x = db.Column(db.Float, nullable=False)
+    origin_y = db.Column(db.Float, nullable=False)
+    pitch_x = db.Column(db.Float, nullable=False)
+    pitch_y = db.Column(db.Float, nullable=False)
+    assign_by = db.Column(db.String(10), default='column', nullable=False)  # 'column' | 'row': which index picks the case
+    profile = db.relationship('CalibrationProfile', backref=db.backref('layouts', lazy=True, cascade="all, delete-orphan"))
@@ -6,6 +6,11 @@ from app.extensions import db
 
 class Run(db.Model):
     __tablename__ = 'run'
+    __table_args__ = (
+        db.Index('ix_run_created_at', 'created_at'),  # history list, newest first
+        db.Index('ix_run_profile_created', 'profile_id', 'created_at'),  # recompute by profile and date range
+        db.Index('ix_run_image_path', 'image_path', 'created_at'),  # upload ref counts, ROI band, newest use per upload
+    )
     id = db.Column(db.Integer, primary_key=True)
     profile_id = db.Column(db.Integer, db.ForeignKey('calibration_profile.id'), nullable=False)
     mode = db.Column(db.String(20), nullable=False)  # 'default' | 'customize' | 'scientific'
@@ -16,11 +21,23 @@ class Run(db.Model):
     background_point_x = db.Column(db.Integer, default=0, nullable=False)
     background_point_y = db.Column(db.Integer, default=0, nullable=False)
     sampling_scheme = db.Column(db.String(50), default='5-pixel', nullable=False)
+    image_width = db.Column(db.Integer, nullable=True)
+    image_height = db.Column(db.Integer, nullable=True)
+    # Raw mean of the background patch, recorded whether or not normalization was used (NULL for older runs)
+    bg_r = db.Column(db.Float, nullable=True)
+    bg_g = db.Column(db.Float, nullable=True)
+    bg_b = db.Column(db.Float, nullable=True)
+    layout = db.Column(db.String(100), nullable=True)  # plate layout name; NULL for single-row runs
+    revision = db.Column(db.Integer, default=0, nullable=False)  # bumped on rename and when recompute changes its results (ETags)
+    roi = db.Column(db.Text, nullable=True)  # client crop geometry (JSON, app.services.roi) when the upload is not the full frame
     profile = db.relationship('CalibrationProfile')
 
 
 class RunResult(db.Model):
     __tablename__ = 'run_result'
+    __table_args__ = (
+        db.Index('ix_run_result_run_id', 'run_id'),  # results of a run (the rowid suffix keeps them in id order)
+    )
     id = db.Column(db.Integer, primary_key=True)
     run_id = db.Column(db.Integer, db.ForeignKey('run.id'), nullable=False)
     pesticide_key = db.Column(db.String(50), nullable=False)
@@ -29,5 +46,20 @@ class RunResult(db.Model):
     rgb_sum = db.Column(db.Integer, nullable=False)
     concentration = db.Column(db.Float, nullable=False)
     level = db.Column(db.String(20), nullable=False)  # 'Low' | 'Medium' | 'High' | 'Out of range'
-    scientific_data = db.Column(db.Text, nullable=True)  # JSON: {rgb, hex, hsv, hsl} for scientific mode
+    scientific_data = db.Column(db.Text, nullable=True)  # legacy JSON {rgb, hex, hsv, hsl}; now kept in the columns below
+    # Scientific-mode color: RGB 0-255, hue in degrees, saturation/value/lightness in percent
+    rgb_r = db.Column(db.Integer, nullable=True)
+    rgb_g = db.Column(db.Integer, nullable=True)
+    rgb_b = db.Column(db.Integer, nullable=True)
+    hsv_h = db.Column(db.Float, nullable=True)
+    hsv_s = db.Column(db.Float, nullable=True)
+    hsv_v = db.Column(db.Float, nullable=True)
+    hsl_h = db.Column(db.Float, nullable=True)
+    hsl_s = db.Column(db.Float, nullable=True)
+    hsl_l = db.Column(db.Float, nullable=True)
+    # Raw (not background-subtracted) per-channel means from the sampling kernel (NULL for older runs)
+    raw_r = db.Column(db.Float, nullable=True)
+    raw_g = db.Column(db.Float, nullable=True)
+    raw_b = db.Column(db.Float, nullable=True)
+    well = db.Column(db.String(8), nullable=True)  # 'A1', 'B12', ... for plate layout runs
     run = db.relationship('Run', backref=db.backref('results', lazy=True, cascade="all, delete-orphan"))
@@ -0,0 +1,21 @@
+"""Trend summary model (per-pesticide daily and weekly totals)."""
+from app.extensions import db
+
+
+class TrendBucket(db.Model):
+    """
+    Running totals of one case's non-scientific results in one day or week, kept in step with
+    run_result by app.services.trends (runs stored, deleted and recomputed).
+    """
+    __tablename__ = 'trend_bucket'
+    # Primary key order serves the trends read: one profile, one period, a range of buckets.
+    profile_id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(5), primary_key=True)  # 'day' | 'week'
+    bucket = db.Column(db.Date, primary_key=True)  # the day, or the Monday starting the week (UTC, as Run.created_at)
+    pesticide_key = db.Column(db.String(50), primary_key=True)
+    n = db.Column(db.Integer, default=0, nullable=False)
+    concentration_sum = db.Column(db.Float, default=0.0, nullable=False)
+    n_low = db.Column(db.Integer, default=0, nullable=False)
+    n_medium = db.Column(db.Integer, default=0, nullable=False)
+    n_high = db.Column(db.Integer, default=0, nullable=False)
+    n_out_of_range = db.Column(db.Integer, default=0, nullable=False)
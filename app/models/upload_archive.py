@@ -0,0 +1,23 @@
+"""Archived upload model (storage lifecycle tiers)."""
+from datetime import datetime
+
+from app.extensions import db
+
+
+class ArchivedUpload(db.Model):
+    """Where an upload lives once it has left the hot tier; Run.image_path keeps the original path."""
+    __tablename__ = 'archived_upload'
+    id = db.Column(db.Integer, primary_key=True)
+    image_path = db.Column(db.String(500), unique=True, nullable=False)  # original path, as in Run.image_path
+    tier = db.Column(db.String(10), nullable=False)  # 'warm' (transcoded file) | 'cold' (member of a monthly bundle)
+    stored_path = db.Column(db.String(500), nullable=False)  # warm file, or bundle .zip for cold
+    member = db.Column(db.String(200), nullable=True)  # name inside the bundle (cold only)
+    media_type = db.Column(db.String(50), nullable=False)  # of the stored bytes, e.g. 'image/webp'
+    width = db.Column(db.Integer, nullable=False)  # original image size
+    height = db.Column(db.Integer, nullable=False)
+    crop_top = db.Column(db.Integer, default=0, nullable=False)  # ROI band offset; 0/height = full image
+    crop_bottom = db.Column(db.Integer, nullable=False)
+    original_bytes = db.Column(db.Integer, nullable=False)
+    warm_bytes = db.Column(db.Integer, nullable=False)  # size after transcoding
+    stored_bytes = db.Column(db.Integer, nullable=False)  # size in the current tier
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
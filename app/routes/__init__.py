@@ -5,6 +5,8 @@ from app.routes.profiles import bp as profiles_bp
 from app.routes.settings_routes import bp as settings_bp
 from app.routes.analysis_routes import bp as analysis_bp
 from app.routes.calibration_routes import bp as calibration_bp
+from app.routes.assets import bp as assets_bp
+from app.routes.images import bp as images_bp
 
 
 def register_blueprints(app):
@@ -14,3 +16,5 @@ def register_blueprints(app):
     app.register_blueprint(settings_bp)
     app.register_blueprint(analysis_bp)
     app.register_blueprint(calibration_bp)
+    app.register_blueprint(assets_bp)
+    app.register_blueprint(images_bp)
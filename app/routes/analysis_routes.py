@@ -1,35 +1,116 @@
 """Analysis page, camera, upload/preview/compute."""
 import base64
+import io
 import json
 import os
-import uuid
-from datetime import datetime
 
-from flask import Blueprint, request, redirect, url_for, flash, render_template
+from flask import Blueprint, request, redirect, url_for, flash, render_template, current_app, jsonify, make_response
 from PIL import Image
 
-from app.extensions import db
-from app.models import Run, RunResult
 from app.services import (
     get_active_profile,
     get_app_mode,
     get_active_pesticides,
-    ensure_upload_dir,
-    compute_background_offsets,
-    sample_five_pixel_total,
-    sample_five_pixel_mean_rgb,
-    scientific_color_data,
-    interpolate_concentration,
-    classify_concentration,
+    stage_upload,
+    promote_upload,
+    discard_staged,
+    is_staged_path,
+    is_upload_path,
+    auto_points,
+    parse_roi,
+    AnalysisPipeline,
+    SCIENTIFIC_POINTS,
+    MAX_AUTO_POINTS,
+    server_timing,
+    parse_sampling_scheme,
+    SAMPLING_SCHEMES,
+    DEFAULT_SAMPLING_SCHEME,
+    digest_from_path,
+    get_result_cache,
+    result_key,
+    cached_result,
+    layout_grid,
+    layout_wells,
+    compare_profiles,
+    FrameAccumulator,
+    BurstError,
+    BURST_MODES,
+    get_burst_store,
+    RunWriterBusy,
 )
+from app.models import CalibrationProfile, PlateLayout
 
 bp = Blueprint('analysis', __name__)
 
 
+@bp.context_processor
+def _sampling_choices():
+    return {"sampling_schemes": SAMPLING_SCHEMES}
+
+
+def _plate_layouts():
+    """The active profile's layouts for the upload form's Layout select (only the form views query them)."""
+    profile = get_active_profile()
+    return PlateLayout.query.filter_by(profile_id=profile.id).order_by(PlateLayout.id.asc()).all() if profile else []
+
+
+def _selected_layout(request, profile):
+    """The profile's PlateLayout chosen on the form, or None for the single row of points."""
+    layout_id = request.form.get('layout_id', type=int)
+    if not layout_id:
+        return None
+    return PlateLayout.query.filter_by(id=layout_id, profile_id=profile.id).first()
+
+
+def _sampling_kernel(request):
+    """Kernel selected on the form; unknown values fall back to the 5-pixel scheme."""
+    try:
+        return parse_sampling_scheme(request.form.get('sampling_scheme') or DEFAULT_SAMPLING_SCHEME)
+    except ValueError:
+        return parse_sampling_scheme(DEFAULT_SAMPLING_SCHEME)
+
+
+def _roi_geometry(request, size):
+    """(RoiGeometry or None, error message) for the form's crop geometry, checked against the uploaded image size."""
+    raw = request.form.get('roi', '').strip()
+    if not raw or request.form.get('burst_id', '').strip():
+        return None, None  # bursts always average full frames
+    try:
+        return parse_roi(raw, size), None
+    except ValueError as exc:
+        return None, f"Invalid crop geometry: {exc}."
+
+
+def _cached_analysis(key):
+    """Render a memoized result (same image, points, settings and calibration) instead of recomputing; None on a miss."""
+    entry = cached_result(get_result_cache(current_app), key)
+    if entry is None:
+        return None
+    flash(f"Same image and points as run #{entry['run_id']}; showing its saved results.", 'info')
+    return render_template('analysis.html', title="Analysis", **entry)
+
+
+def _remember_analysis(key, **entry):
+    if key is not None:
+        get_result_cache(current_app).put(key, entry)
+
+
+def _render_analysis(pipeline, result, memo_key, named_points=False):
+    """Remember and render a stored result; the pipeline's stage timings go out as a Server-Timing header."""
+    entry = dict(image_path=result.image_path, results=result.readings, width=result.width, height=result.height,
+                 points=result.points(named=named_points), scientific_mode=pipeline.scientific, run_id=result.run_id,
+                 sampling_scheme=result.sampling_scheme, layout_name=result.layout_name)
+    _remember_analysis(memo_key, **entry)
+    response = make_response(render_template('analysis.html', title="Analysis", **entry))
+    response.headers['Server-Timing'] = server_timing(pipeline.timings)
+    return response
+
+
 @bp.route('/analysis')
 def analysis():
     """Renders the analysis page."""
-    return render_template('analysis.html', title="Analysis", scientific_mode=(get_app_mode() == 'scientific'))
+    return render_template('analysis.html', title="Analysis", scientific_mode=(get_app_mode() == 'scientific'),
+                           plate_layouts=_plate_layouts())
 
 
 @bp.route('/camera')
@@ -38,33 +119,53 @@ def camera():
     return render_template('camera.html', title="Camera")
 
 
+def _finish_burst(burst_id):
+    """Stage the averaged frame of a finished burst and flash its report; returns the staged path or None."""
+    acc = get_burst_store(current_app).pop(burst_id)
+    if acc is None or not acc.count:
+        return None
+    buf = io.BytesIO()
+    Image.fromarray(acc.result()).save(buf, 'PNG', compress_level=1)
+    buf.seek(0)
+    image_path, _digest = stage_upload(buf, fallback_ext='.png')
+    report = acc.report()
+    msg = f"Averaged {report['frames']} frame(s) ({report['mode']}, {report['mean_ingest_ms']:.0f} ms per frame to ingest)."
+    reductions = [p['reduction'] for p in report['points'] if p['reduction']]
+    if reductions:
+        frame_noise = sum(p['frame_noise'] for p in report['points']) / len(report['points'])
+        averaged_noise = sum(p['averaged_noise'] for p in report['points']) / len(report['points'])
+        msg += f" Pixel noise at the sample points: {frame_noise:.1f} → {averaged_noise:.1f} ({sorted(reductions)[len(reductions) // 2]:.1f}× lower)."
+    flash(msg, 'info')
+    return image_path
+
+
 def _save_uploaded_image(request):
-    """Save file or captured_data from request; return (full_path, image_path_for_db, subdir, filename, error_msg)."""
+    """Stage file, captured_data or a finished burst from request; return (full_path, image_path_for_db, subdir, filename, error_msg)."""
     file = request.files.get('image')
     captured_data = request.form.get('captured_data', '').strip()
+    burst_id = request.form.get('burst_id', '').strip()
+    if burst_id:
+        image_path = _finish_burst(burst_id)
+        if image_path is None:
+            return None, None, None, None, 'The burst expired or has no frames. Please capture again.'
+        subdir, filename = os.path.split(os.path.relpath(image_path, os.path.join('static', 'uploads')))
+        return image_path, image_path, subdir, filename, None
     if not file and not captured_data:
         return None, None, None, None, None
-    upload_dir, subdir = ensure_upload_dir()
     if file:
         ext = os.path.splitext(file.filename or '')[1].lower()
         if ext not in ('.jpg', '.jpeg', '.png'):
             ext = '.jpg'
-        filename = f"{uuid.uuid4().hex}{ext}"
-        full_path = os.path.join(upload_dir, filename)
-        file.save(full_path)
-        image_path = os.path.join('static', 'uploads', subdir, filename)
-        return full_path, image_path, subdir, filename, None
-    try:
-        header, b64 = captured_data.split(',', 1)
-        binary = base64.b64decode(b64)
-        filename = f"{uuid.uuid4().hex}.png"
-        full_path = os.path.join(upload_dir, filename)
-        with open(full_path, 'wb') as f:
-            f.write(binary)
-    except Exception:
-        return None, None, None, None, 'Failed to read captured image.'
-    image_path = os.path.join('static', 'uploads', subdir, filename)
-    return full_path, image_path, subdir, filename, None
+        image_path, _digest = stage_upload(file.stream, fallback_ext=ext)
+    else:
+        try:
+            header, b64 = captured_data.split(',', 1)
+            binary = base64.b64decode(b64)
+        except Exception:
+            return None, None, None, None, 'Failed to read captured image.'
+        image_path, _digest = stage_upload(io.BytesIO(binary), fallback_ext='.png')
+    subdir, filename = os.path.split(os.path.relpath(image_path, os.path.join('static', 'uploads')))
+    return image_path, image_path, subdir, filename, None
 
 
 @bp.route('/analysis', methods=['POST'])
@@ -79,110 +180,51 @@ def analysis_run():
         flash(err or 'Please select or capture an image.', 'danger' if err else 'warning')
         return redirect(url_for('analysis.analysis'))
     try:
-        img = Image.open(full_path).convert('RGB')
+        with Image.open(full_path) as probe:
+            width, height = probe.size
     except Exception:
+        discard_staged(full_path)
         flash('Failed to read image.', 'danger')
         return redirect(url_for('analysis.analysis'))
-    width, height = img.size
+    roi, err = _roi_geometry(request, (width, height))
+    if err:
+        discard_staged(full_path)
+        flash(err, 'danger')
+        return redirect(url_for('analysis.analysis'))
     mode = get_app_mode()
-    if mode == 'scientific':
-        n = 5
-        y = height // 2.65  # preset points 1.5 from top (tuned up from center)
-        xs = [int(round((i+1) * (width / (n + 1)))) for i in range(n)]
-        results = []
-        points = []
-        for i in range(n):
-            x = xs[i]
-            r, g, b = sample_five_pixel_mean_rgb(img, x, y)
-            total = r + g + b
-            data = scientific_color_data(r, g, b)
-            points.append({"x": x, "y": y, "name": f"Point {i+1}"})
-            results.append({
-                "pesticide_key": f"point_{i+1}",
-                "pesticide_name": f"Point {i+1}",
-                "x": x, "y": y,
-                "rgb_sum": total,
-                "concentration": 0,
-                "level": "—",
-                "scientific_data": data
-            })
-        run = Run(
-            profile_id=profile.id,
-            mode='scientific',
-            name=f"Run {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}",
-            image_path=image_path,
-            used_normalization=False,
-            background_point_x=0,
-            background_point_y=0,
-            sampling_scheme='5-pixel'
-        )
-        db.session.add(run)
-        db.session.flush()
-        for r in results:
-            db.session.add(RunResult(
-                run_id=run.id,
-                pesticide_key=r["pesticide_key"],
-                pixel_x=r["x"], pixel_y=r["y"],
-                rgb_sum=r["rgb_sum"],
-                concentration=0.0,
-                level="—",
-                scientific_data=json.dumps(r["scientific_data"])
-            ))
-        db.session.commit()
-        return render_template('analysis.html', title="Analysis", image_path=run.image_path, results=results, width=width, height=height, points=points, scientific_mode=True, run_id=run.id)
-    pests = get_active_pesticides(profile.id)
-    n = max(1, min(10, len(pests)))
-    y = height // 2.65  # preset points 1/4 from top (tuned up from center)
-    xs = [int(round((i+1) * (width / (n + 1)))) for i in range(n)]
-    use_norm = (request.form.get('normalize') == 'on')
-    bg_offsets = None
-    norm_used_flag = False
-    bg_point = (0, 0)
-    if use_norm:
-        bg_offsets, norm_used_flag = compute_background_offsets(img)
-        if not norm_used_flag:
-            bg_offsets = None
-    results = []
-    points = []
-    for i, pest in enumerate(pests[:n]):
-        x = xs[i]
-        total = sample_five_pixel_total(img, x, y, bg_offsets)
-        curve = [{"concentration": cp.concentration, "rgb_sum": cp.rgb_sum} for cp in sorted(pest.calibration_points, key=lambda c: c.seq_index)]
-        conc = interpolate_concentration(curve, total)
-        bands = {b.band: {"min": b.min_value, "max": b.max_value} for b in pest.threshold_bands}
-        level = classify_concentration(bands, conc)
-        points.append({"x": x, "y": y, "name": pest.display_name})
-        results.append({
-            "pesticide_key": pest.key,
-            "pesticide_name": pest.display_name,
-            "x": x, "y": y,
-            "rgb_sum": total,
-            "concentration": round(conc, 2),
-            "level": level
-        })
-    run = Run(
-        profile_id=profile.id,
-        mode=mode,
-        name=f"Run {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}",
-        image_path=image_path,
-        used_normalization=bool(norm_used_flag),
-        background_point_x=bg_point[0],
-        background_point_y=bg_point[1],
-        sampling_scheme='5-pixel'
-    )
-    db.session.add(run)
-    db.session.flush()
-    for r in results:
-        db.session.add(RunResult(
-            run_id=run.id,
-            pesticide_key=r["pesticide_key"],
-            pixel_x=r["x"], pixel_y=r["y"],
-            rgb_sum=r["rgb_sum"],
-            concentration=float(r["concentration"]),
-            level=r["level"]
-        ))
-    db.session.commit()
-    return render_template('analysis.html', title="Analysis", image_path=run.image_path, results=results, width=width, height=height, points=points, run_id=run.id)
+    layout = _selected_layout(request, profile)
+    try:
+        pipeline = AnalysisPipeline(profile, mode, _sampling_kernel(request), normalize=request.form.get('normalize') == 'on', layout=layout)
+    except ValueError:
+        discard_staged(full_path)
+        flash('The active profile has no cases to read the wells against.', 'danger')
+        return redirect(url_for('analysis.analysis'))
+    try:
+        xs, ys = pipeline.plan.place(width, height, roi=roi)
+    except ValueError as exc:
+        discard_staged(full_path)
+        flash(str(exc), 'danger')
+        return redirect(url_for('analysis.analysis'))
+    wells = [well for well, _pest in pipeline.wells] if layout else [None] * len(xs)
+    memo_points = [{"x": x, "y": y, "well": well} for x, y, well in zip(xs, ys, wells)]
+    memo_key = result_key(digest_from_path(full_path), profile.id, mode, pipeline.sampling_scheme, pipeline.plan.normalize, memo_points,
+                          request.form.get('roi', '').strip() if roi else '', cache=get_result_cache(current_app))
+    cached = _cached_analysis(memo_key)
+    if cached is not None:
+        discard_staged(full_path)
+        return cached
+    img = pipeline.decode(full_path)
+    if img is None:
+        discard_staged(full_path)
+        flash('Failed to read image.', 'danger')
+        return redirect(url_for('analysis.analysis'))
+    image_path = promote_upload(full_path)
+    try:
+        result = pipeline.analyze(img, image_path, roi=roi)
+    except RunWriterBusy as exc:
+        flash(str(exc), 'warning')
+        return redirect(url_for('analysis.analysis'))
+    return _render_analysis(pipeline, result, memo_key, named_points=layout is None)
 
 
 @bp.route('/analysis/preview', methods=['POST'])
@@ -199,21 +241,39 @@ def analysis_preview():
     try:
         img = Image.open(full_path).convert('RGB')
     except Exception:
+        discard_staged(full_path)
         flash('Failed to read image.', 'danger')
         return redirect(url_for('analysis.analysis'))
     width, height = img.size
+    roi, err = _roi_geometry(request, (width, height))
+    if err:
+        discard_staged(full_path)
+        flash(err, 'danger')
+        return redirect(url_for('analysis.analysis'))
+    # Points are placed on the original frame; a cropped upload shows them where they landed in the crop.
+    frame_width, frame_height = roi.frame if roi else (width, height)
     scientific_mode = (get_app_mode() == 'scientific')
-    if scientific_mode:
-        n = 5
-        y = height // 2.65  # preset points 1/4 from top (tuned up from center)
-        xs = [int(round((i+1) * (width / (n + 1)))) for i in range(n)]
-        points = [{"x": xs[i], "y": y, "name": f"Point {i+1}"} for i in range(n)]
+    layout = _selected_layout(request, profile)
+    if layout:
+        xs, ys = layout_grid(layout, frame_width, frame_height)
+        wells = layout_wells(layout, [] if scientific_mode else get_active_pesticides(profile.id))
+        points = [{"x": int(x), "y": int(y), "name": f"{well} {pest.display_name}" if pest else well}
+                  for x, y, (well, pest) in zip(xs, ys, wells)]
+    elif scientific_mode:
+        xs, y = auto_points(frame_width, frame_height, SCIENTIFIC_POINTS)
+        points = [{"x": x, "y": y, "name": f"Point {i+1}"} for i, x in enumerate(xs)]
     else:
         pests = get_active_pesticides(profile.id)
-        n = max(1, min(10, len(pests)))
-        y = height // 2.65  # preset points 1/4 from top (tuned up from center)
-        xs = [int(round((i+1) * (width / (n + 1)))) for i in range(n)]
-        points = [{"x": xs[i], "y": y, "name": pests[i].display_name} for i in range(n)]
+        xs, y = auto_points(frame_width, frame_height, max(1, min(MAX_AUTO_POINTS, len(pests))))
+        points = [{"x": x, "y": y, "name": pest.display_name} for x, pest in zip(xs, pests)]
+    if roi:
+        for p in points:
+            mapped = roi.to_upload(int(p["x"]), int(p["y"]))
+            if mapped is None:
+                discard_staged(full_path)
+                flash(f"Sample point ({int(p['x'])}, {int(p['y'])}) is outside the cropped regions.", 'danger')
+                return redirect(url_for('analysis.analysis'))
+            p["x"], p["y"] = mapped
     return render_template(
         'analysis.html',
         title="Analysis",
@@ -222,7 +282,13 @@ def analysis_preview():
         height=height,
         points=points,
         results=None,
-        scientific_mode=scientific_mode
+        scientific_mode=scientific_mode,
+        sampling_scheme=_sampling_kernel(request).scheme,
+        layout_id=layout.id if layout else None,
+        layout_name=layout.name if layout else None,
+        roi_json=request.form.get('roi', '').strip() if roi else '',
+        compare_choices=CalibrationProfile.query.order_by(CalibrationProfile.created_at.asc()).all(),
+        active_profile_id=profile.id
     )
 
 
@@ -243,110 +309,137 @@ def analysis_compute():
     except Exception:
         flash('Invalid points data.', 'danger')
         return redirect(url_for('analysis.analysis'))
-    full_path = image_path
-    if not os.path.exists(full_path):
-        full_path = os.path.join('.', image_path)
-    if not os.path.exists(full_path):
-        flash('Image file not found.', 'danger')
+    mode = get_app_mode()
+    layout = _selected_layout(request, profile)
+    try:
+        pipeline = AnalysisPipeline(profile, mode, _sampling_kernel(request), normalize=request.form.get('normalize') == 'on', layout=layout)
+    except ValueError:
+        pipeline = None
+    if pipeline is None or (layout and len(points) != len(pipeline.wells)):
+        # Layout points arrive in well order (row-major), one per well; they are not re-paired by x.
+        flash('The points do not match the selected layout.', 'danger')
         return redirect(url_for('analysis.analysis'))
-    img = Image.open(full_path).convert('RGB')
-    width, height = img.size
-    scientific_mode = (get_app_mode() == 'scientific')
-    if scientific_mode:
-        pts_sorted = sorted(points[:5], key=lambda p: p.get('x', 0))
-        n = len(pts_sorted)
-        if n == 0:
-            flash('At least one point is required.', 'danger')
+    if pipeline.scientific and not layout and not points:
+        flash('At least one point is required.', 'danger')
+        return redirect(url_for('analysis.analysis'))
+    wells = [well for well, _pest in pipeline.wells] if layout else [None] * len(points)
+    memo_points = [{"x": p.get('x', 0), "y": p.get('y', 0), "well": well} for p, well in zip(points[:pipeline.plan.max_points], wells)]
+    roi_field = request.form.get('roi', '').strip()
+    memo_key = result_key(digest_from_path(image_path), profile.id, mode, pipeline.sampling_scheme, pipeline.plan.normalize, memo_points,
+                          roi_field, cache=get_result_cache(current_app))
+    cached = _cached_analysis(memo_key)
+    if cached is not None:
+        if is_staged_path(image_path):
+            discard_staged(image_path)
+        return cached
+    if is_staged_path(image_path):
+        image_path = promote_upload(image_path)
+        if image_path is None:
+            flash('The uploaded image has expired. Please upload it again.', 'warning')
             return redirect(url_for('analysis.analysis'))
-        results = []
-        for i in range(n):
-            x = int(pts_sorted[i].get('x', 0))
-            y = int(pts_sorted[i].get('y', 0))
-            r, g, b = sample_five_pixel_mean_rgb(img, x, y)
-            total = r + g + b
-            data = scientific_color_data(r, g, b)
-            results.append({
-                "pesticide_key": f"point_{i+1}",
-                "pesticide_name": f"Point {i+1}",
-                "x": x, "y": y,
-                "rgb_sum": total,
-                "concentration": 0,
-                "level": "—",
-                "scientific_data": data
-            })
-        run = Run(
-            profile_id=profile.id,
-            mode='scientific',
-            name=f"Run {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}",
-            image_path=image_path,
-            used_normalization=False,
-            background_point_x=0,
-            background_point_y=0,
-            sampling_scheme='5-pixel'
-        )
-        db.session.add(run)
-        db.session.flush()
-        for r in results:
-            db.session.add(RunResult(
-                run_id=run.id,
-                pesticide_key=r["pesticide_key"],
-                pixel_x=r["x"], pixel_y=r["y"],
-                rgb_sum=r["rgb_sum"],
-                concentration=0.0,
-                level="—",
-                scientific_data=json.dumps(r["scientific_data"])
-            ))
-        db.session.commit()
-        return render_template('analysis.html', title="Analysis", image_path=image_path, results=results, width=width, height=height, points=[{"x": r["x"], "y": r["y"]} for r in results], scientific_mode=True, run_id=run.id)
-    use_norm = (request.form.get('normalize') == 'on')
-    bg_offsets = None
-    norm_used_flag = False
-    bg_point = (0, 0)
-    if use_norm:
-        bg_offsets, norm_used_flag = compute_background_offsets(img)
-        if not norm_used_flag:
-            bg_offsets = None
-    pests = get_active_pesticides(profile.id)
-    n = min(len(points), len(pests))
-    pts_sorted = sorted(points[:n], key=lambda p: p.get('x', 0))
-    results = []
-    for i in range(n):
-        pest = pests[i]
-        x = int(pts_sorted[i].get('x', 0))
-        y = int(pts_sorted[i].get('y', 0))
-        total = sample_five_pixel_total(img, x, y, bg_offsets)
-        curve = [{"concentration": cp.concentration, "rgb_sum": cp.rgb_sum} for cp in sorted(pest.calibration_points, key=lambda c: c.seq_index)]
-        conc = interpolate_concentration(curve, total)
-        bands = {b.band: {"min": b.min_value, "max": b.max_value} for b in pest.threshold_bands}
-        level = classify_concentration(bands, conc)
-        results.append({
-            "pesticide_key": pest.key,
-            "pesticide_name": pest.display_name,
-            "x": x, "y": y,
-            "rgb_sum": total,
-            "concentration": round(conc, 2),
-            "level": level
-        })
-    run = Run(
-        profile_id=profile.id,
-        mode=get_app_mode(),
-        name=f"Run {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}",
-        image_path=image_path,
-        used_normalization=bool(norm_used_flag),
-        background_point_x=bg_point[0],
-        background_point_y=bg_point[1],
-        sampling_scheme='5-pixel'
-    )
-    db.session.add(run)
-    db.session.flush()
-    for r in results:
-        db.session.add(RunResult(
-            run_id=run.id,
-            pesticide_key=r["pesticide_key"],
-            pixel_x=r["x"], pixel_y=r["y"],
-            rgb_sum=r["rgb_sum"],
-            concentration=float(r["concentration"]),
-            level=r["level"]
-        ))
-    db.session.commit()
-    return render_template('analysis.html', title="Analysis", image_path=image_path, results=results, width=width, height=height, points=[{"x": r["x"], "y": r["y"]} for r in results])
+    img = pipeline.decode(image_path) if is_upload_path(image_path) else None
+    if img is None:
+        flash('Image file not found.', 'danger')
+        return redirect(url_for('analysis.analysis'))
+    roi, err = _roi_geometry(request, img.size)
+    if err:
+        flash(err, 'danger')
+        return redirect(url_for('analysis.analysis'))
+    try:
+        result = pipeline.analyze(img, image_path, points, roi=roi)
+    except ValueError as exc:
+        flash(str(exc), 'danger')
+        return redirect(url_for('analysis.analysis'))
+    except RunWriterBusy as exc:
+        flash(str(exc), 'warning')
+        return redirect(url_for('analysis.analysis'))
+    return _render_analysis(pipeline, result, memo_key)
+
+
+@bp.route('/analysis/compare', methods=['POST'])
+def analysis_compare():
+    """Sample the previewed image once and evaluate it against several profiles side by side (nothing is saved)."""
+    profile = get_active_profile()
+    if not profile:
+        flash('No active profile found.', 'danger')
+        return redirect(url_for('analysis.analysis'))
+    profile_ids = request.form.getlist('profile_ids', type=int)
+    image_path = request.form.get('image_path', '').strip().lstrip('/')
+    try:
+        points = json.loads(request.form.get('points_json', '').strip())
+    except Exception:
+        points = None
+    if not profile_ids:
+        flash('Select at least one profile to compare.', 'warning')
+        return redirect(url_for('analysis.analysis'))
+    if not image_path or not points:
+        flash('Missing image or points.', 'danger')
+        return redirect(url_for('analysis.analysis'))
+    layout = _selected_layout(request, profile)
+    try:
+        pipeline = AnalysisPipeline(profile, 'default', _sampling_kernel(request), normalize=request.form.get('normalize') == 'on', layout=layout)
+    except ValueError:
+        pipeline = None
+    img = pipeline.decode(image_path) if pipeline and is_upload_path(image_path) else None
+    if pipeline is None or (layout and len(points) != len(pipeline.wells)):
+        flash('The points do not match the selected layout.', 'danger')
+        return redirect(url_for('analysis.analysis'))
+    if img is None:
+        flash('The uploaded image has expired. Please upload it again.', 'warning')
+        return redirect(url_for('analysis.analysis'))
+    roi, err = _roi_geometry(request, img.size)
+    if err:
+        flash(err, 'danger')
+        return redirect(url_for('analysis.analysis'))
+    try:
+        m = pipeline.measure(img, points, roi)
+    except ValueError as exc:
+        flash(str(exc), 'danger')
+        return redirect(url_for('analysis.analysis'))
+    readings = [{"pesticide_key": key, "name": name, "rgb_sum": int(total)} for (key, name, _well, _pest), total in zip(pipeline.labels, m.totals)]
+    profiles, rows = compare_profiles(readings, profile_ids)
+    return render_template('profile_compare.html', title="Compare profiles", image_path=image_path, profiles=profiles, rows=rows,
+                           source=f"{len(readings)} point(s) sampled once with the {pipeline.sampling_scheme} kernel; nothing was saved.")
+
+
+@bp.route('/analysis/burst', methods=['POST'])
+def analysis_burst_start():
+    """
+    Open a burst; frames are then POSTed one by one and folded into a running mean or median.
+    Bursts live in this process's memory, so a multi-process server (wsgi.multiprocess) refuses them
+    rather than routing frames to workers that have never heard of the burst.
+    """
+    if request.environ.get('wsgi.multiprocess'):
+        return jsonify({"error": "Burst capture needs a single-process server (e.g. one worker with threads); "
+                                 "capture one frame at a time instead."}), 503
+    profile = get_active_profile()
+    mode = request.form.get('mode', 'mean')
+    if mode not in BURST_MODES:
+        return jsonify({"error": f"Unknown burst mode: {mode}"}), 400
+    n = SCIENTIFIC_POINTS if get_app_mode() == 'scientific' or not profile else max(1, min(MAX_AUTO_POINTS, len(get_active_pesticides(profile.id))))
+
+    def probe_points(width, height):
+        # Noise is measured where analysis places its points by default.
+        xs, y = auto_points(width, height, n)
+        return [(x, y) for x in xs]
+
+    max_frames = current_app.config['BURST_MAX_FRAMES']
+    try:
+        burst_id = get_burst_store(current_app).open(FrameAccumulator(mode, max_frames, probe_points))
+    except BurstError as exc:
+        return jsonify({"error": str(exc)}), 503
+    return jsonify({"burst_id": burst_id, "max_frames": max_frames, "mode": mode})
+
+
+@bp.route('/analysis/burst/<burst_id>/frame', methods=['POST'])
+def analysis_burst_frame(burst_id):
+    """Fold one frame (the raw image bytes as the request body, or an 'image' file) into the burst."""
+    acc = get_burst_store(current_app).get(burst_id)
+    if acc is None:
+        return jsonify({"error": "Unknown or expired burst."}), 404
+    file = request.files.get('image')
+    try:
+        acc.add(file.read() if file else request.get_data())
+    except BurstError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"frames": acc.count, "ingest_ms": round(acc.ingest_seconds[-1] * 1000, 1)})
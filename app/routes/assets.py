@@ -0,0 +1,82 @@
+"""Fingerprinted static assets and gzip compression of dynamic responses."""
+import gzip
+import mimetypes
+import os
+
+from flask import Blueprint, current_app, request, send_from_directory, url_for, abort
+
+from app.services import load_manifest
+from app.services.static_assets import DIST_DIR
+
+bp = Blueprint('assets', __name__)
+
+ONE_YEAR = 365 * 24 * 3600
+COMPRESSIBLE_MIMETYPES = ('text/html', 'application/json', 'text/css', 'application/javascript', 'text/plain')
+
+
+def _manifest():
+    manifest = current_app.extensions.get('asset_manifest')
+    if manifest is None or current_app.debug:
+        manifest = load_manifest(current_app.config['PROJECT_ROOT'])
+        current_app.extensions['asset_manifest'] = manifest
+    return manifest
+
+
+def _accepts_gzip():
+    return request.accept_encodings.quality('gzip') > 0
+
+
+@bp.app_template_global()
+def asset_url(logical_name: str):
+    """URL for 'static/...' or 'public/...'; fingerprinted when `flask build-assets` has run."""
+    hashed = _manifest().get(logical_name)
+    if hashed:
+        return url_for('assets.fingerprinted', filename=hashed)
+    folder, _, rest = logical_name.partition('/')
+    if folder == 'public':
+        return url_for('pages.public_files', filename=rest)
+    return url_for('static', filename=rest)
+
+
+@bp.route('/assets/<path:filename>')
+def fingerprinted(filename: str):
+    """Serve a content-hashed asset (gzip variant when accepted) with immutable caching."""
+    dist_root = os.path.join(current_app.config['PROJECT_ROOT'], DIST_DIR)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    gz_name = filename + '.gz'
+    if _accepts_gzip() and os.path.isfile(os.path.join(dist_root, gz_name)):
+        response = send_from_directory(dist_root, gz_name, mimetype=mimetype, max_age=ONE_YEAR)
+        response.headers['Content-Encoding'] = 'gzip'
+    elif os.path.isfile(os.path.join(dist_root, filename)):
+        response = send_from_directory(dist_root, filename, mimetype=mimetype, max_age=ONE_YEAR)
+    else:
+        abort(404)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@bp.after_app_request
+def compress_response(response):
+    """Gzip large HTML/JSON bodies on the fly when the client accepts it."""
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or not (200 <= response.status_code < 300)
+        or 'Content-Encoding' in response.headers
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+    ):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not _accepts_gzip():
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+    response.set_data(gzip.compress(data, compresslevel=current_app.config.get('COMPRESS_LEVEL', 6)))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + '-gzip', weak)
+    return response
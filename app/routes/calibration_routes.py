@@ -1,9 +1,23 @@
-"""Calibration page and save."""
-from flask import Blueprint, redirect, url_for, flash, render_template, request
+"""Calibration page, save, bulk import, and recomputing stored results."""
+from datetime import datetime, timedelta
+
+from flask import Blueprint, redirect, url_for, flash, render_template, request, jsonify, current_app
 
 from app.extensions import db
 from app.models import CalibrationProfile, Pesticide, CalibrationPoint, ThresholdBand
-from app.services import get_active_profile, get_app_mode, validate_calibration_points
+from app.services import (
+    get_active_profile,
+    get_app_mode,
+    validate_calibration_points,
+    parse_calibration_csv,
+    run_template_rows,
+    format_calibration_csv,
+    ingest_calibration_points,
+    recompute_results,
+    get_recompute_job,
+    start_background_job,
+    is_job_running,
+)
 
 bp = Blueprint('calibration', __name__)
 
@@ -24,11 +38,12 @@ def calibration():
                 "id": p.id,
                 "key": p.key,
                 "display_name": p.display_name,
+                "curve_model": p.curve_model,
                 "points": [{"concentration": cp.concentration, "rgb_sum": cp.rgb_sum, "seq_index": cp.seq_index, "id": cp.id} for cp in pts],
                 "thresholds": bands
             })
     is_customize = (get_app_mode() == 'customize')
-    return render_template('calibration.html', title="Calibration", profile=profile, pesticides=pesticides, is_customize=is_customize, all_profiles=all_profiles, profile_case_counts=profile_case_counts)
+    return render_template('calibration.html', title="Calibration", profile=profile, pesticides=pesticides, is_customize=is_customize, all_profiles=all_profiles, profile_case_counts=profile_case_counts, recompute_job=_recompute_status())
 
 
 @bp.route('/calibration/save', methods=['POST'])
@@ -89,3 +104,84 @@ def calibration_save():
     db.session.commit()
     flash("Calibration saved.", "success")
     return redirect(url_for('calibration.calibration'))
+
+
+@bp.route('/calibration/ingest', methods=['GET', 'POST'])
+def calibration_ingest():
+    """Bulk-add calibration points from CSV, or from the results of several runs (?run_ids=...)."""
+    all_profiles = CalibrationProfile.query.order_by(CalibrationProfile.created_at.asc()).all()
+    active = get_active_profile()
+    if request.method == 'GET':
+        run_ids = request.args.getlist('run_ids', type=int)
+        csv_text = format_calibration_csv(run_template_rows(run_ids)) if run_ids else ''
+        return render_template('calibration_ingest.html', title="Bulk calibration import", all_profiles=all_profiles,
+                               profile_id=active.id if active else None, csv_text=csv_text, replace=False)
+    profile_id = request.form.get('profile_id', type=int)
+    replace = bool(request.form.get('replace'))
+    upload = request.files.get('file')
+    if upload and upload.filename:
+        csv_text = upload.read().decode('utf-8', errors='replace')
+    else:
+        csv_text = request.form.get('csv_text', '')
+
+    def again():
+        return render_template('calibration_ingest.html', title="Bulk calibration import", all_profiles=all_profiles,
+                               profile_id=profile_id, csv_text=csv_text, replace=replace)
+
+    if not profile_id or not any(p.id == profile_id for p in all_profiles):
+        flash('Please select a valid profile.', 'danger')
+        return again()
+    rows, errors = parse_calibration_csv(csv_text)
+    if not errors and not rows:
+        errors = ['No rows with a concentration to import.']
+    if not errors:
+        added, errors = ingest_calibration_points(profile_id, rows, replace=replace)
+    if errors:
+        for msg in errors[:10]:
+            flash(msg, 'danger')
+        if len(errors) > 10:
+            flash(f'... and {len(errors) - 10} more error(s). Nothing was imported.', 'danger')
+        return again()
+    flash(f'Imported {added} calibration point(s).', 'success')
+    return redirect(url_for('calibration.calibration'))
+
+
+def _recompute_status():
+    job = get_recompute_job()
+    if job and job.get('status') == 'running' and not is_job_running(current_app, 'recompute'):
+        job['status'] = 'interrupted'
+    return job
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
+@bp.route('/calibration/recompute', methods=['POST'])
+def calibration_recompute():
+    """Re-evaluate stored results of the active profile against its current curves (in the background)."""
+    profile = get_active_profile()
+    if not profile:
+        flash("No active profile found.", "danger")
+        return redirect(url_for('calibration.calibration'))
+    since = _parse_day(request.form.get('since'))
+    until = _parse_day(request.form.get('until'))
+    if until:
+        until += timedelta(days=1)  # the end date is inclusive
+    normalize = {'on': True, 'off': False}.get(request.form.get('normalization'))
+    profile_id = profile.id
+    started = start_background_job(current_app._get_current_object(), 'recompute',
+                                   lambda: recompute_results(profile_id, since=since, until=until, normalize=normalize))
+    if started:
+        flash("Recomputing stored results; progress is shown below.", "info")
+    else:
+        flash("A recompute is already running.", "warning")
+    return redirect(url_for('calibration.calibration'))
+
+
+@bp.route('/calibration/recompute/status')
+def calibration_recompute_status():
+    return jsonify(_recompute_status() or {})
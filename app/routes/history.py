@@ -1,12 +1,11 @@
-"""History list, detail, rename, delete, export, import-to-calibration."""
+"""History list, detail, rename, delete, export, import-to-calibration, trends."""
 import json
-import os
 
 from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify
-from PIL import Image
 
 from app.extensions import db
-from app.models import Run, Pesticide, CalibrationProfile, CalibrationPoint
+from app.models import Run, RunResult, Pesticide, CalibrationProfile
+from app.services import RoiGeometry, TREND_PERIODS, trend_series, get_active_profile, forget_run_trends, release_upload, ingest_calibration_points, color_data_from_result, plate_grid, compare_profiles, etag_for, not_modified, render_epoch, with_etag
 
 bp = Blueprint('history', __name__, url_prefix='/history')
 
@@ -32,39 +31,92 @@ def history():
     return render_template('history.html', title="History", history=items, q=q)
 
 
+def _run_etag(run, *extra):
+    """Runs change only by rename or recompute, both of which bump run.revision."""
+    return etag_for('run', run.id, run.revision, run.name, run.profile.name if run.profile else None, *extra)
+
+
+def _trend_request():
+    """(profile, period, buckets) from the query string; the active profile and daily buckets by default."""
+    profile_id = request.args.get('profile_id', type=int)
+    profile = db.session.get(CalibrationProfile, profile_id) if profile_id else get_active_profile()
+    return profile, request.args.get('period', 'day'), request.args.get('buckets', type=int)
+
+
+@bp.route('/trends')
+def history_trends():
+    """Daily/weekly mean concentration and level counts per case, read from the trend summary."""
+    profile, period, buckets = _trend_request()
+    if period not in TREND_PERIODS:
+        period = 'day'
+    trends = trend_series(profile.id, period, buckets) if profile else None
+    return render_template('history_trends.html', title="Trends", profile=profile, trends=trends, period=period,
+                           periods=TREND_PERIODS, all_profiles=CalibrationProfile.query.order_by(CalibrationProfile.created_at.asc()).all())
+
+
+@bp.route('/trends.json')
+def history_trends_json():
+    profile, period, buckets = _trend_request()
+    if not profile:
+        return jsonify({"error": "Unknown profile."}), 404
+    try:
+        trends = trend_series(profile.id, period, buckets)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(dict(trends, profile={"id": profile.id, "name": profile.name}))
+
+
 @bp.route('/<int:run_id>')
 def history_detail(run_id: int):
     """Show run detail."""
     run = Run.query.get_or_404(run_id)
+    all_profiles = CalibrationProfile.query.order_by(CalibrationProfile.created_at.asc()).all()
+    tag = _run_etag(run, 'detail', render_epoch(), [(p.id, p.name) for p in all_profiles])
+    cached = not_modified(tag)
+    if cached:
+        return cached
+    scientific_mode = (run.mode == 'scientific')
+    roi = RoiGeometry.from_json(run.roi) if run.roi else None
     results = []
-    for rr in run.results:
+    for rr in RunResult.query.filter_by(run_id=run.id).order_by(RunResult.id.asc()):
         item = {
             "pesticide_key": rr.pesticide_key,
+            "well": rr.well,
             "x": rr.pixel_x,
             "y": rr.pixel_y,
             "rgb_sum": rr.rgb_sum,
             "concentration": round(rr.concentration, 2),
             "level": rr.level
         }
-        if rr.scientific_data:
-            try:
-                item["scientific_data"] = json.loads(rr.scientific_data)
-            except Exception:
-                item["scientific_data"] = None
-        else:
-            item["scientific_data"] = None
+        item["scientific_data"] = color_data_from_result(rr) if scientific_mode else None
+        if roi:
+            # Stored in frame space; the markers are drawn over the uploaded crop.
+            item["x"], item["y"] = roi.to_upload(rr.pixel_x, rr.pixel_y) or (rr.pixel_x, rr.pixel_y)
         results.append(item)
-    scientific_mode = (run.mode == 'scientific')
-    img_width = img_height = None
-    if scientific_mode and results and run.image_path:
-        try:
-            path = run.image_path if os.path.isabs(run.image_path) else os.path.join('.', run.image_path)
-            if os.path.exists(path):
-                with Image.open(path) as im:
-                    img_width, img_height = im.size
-        except Exception:
-            pass
-    return render_template('history_detail.html', title=run.name, run=run, results=results, scientific_mode=scientific_mode, img_width=img_width, img_height=img_height)
+    plate_columns, plate_rows = plate_grid(results) if run.layout else (0, [])
+    img_width, img_height = roi.upload if roi else (run.image_width, run.image_height)
+    return with_etag(render_template('history_detail.html', title=run.name, run=run, results=results, scientific_mode=scientific_mode, img_width=img_width, img_height=img_height,
+                                     plate_columns=plate_columns, plate_rows=plate_rows, all_profiles=all_profiles), tag)
+
+
+@bp.route('/<int:run_id>/compare')
+def history_compare(run_id: int):
+    """Evaluate a run's stored RGB totals against several profiles side by side (the image is not re-read)."""
+    run = Run.query.get_or_404(run_id)
+    profile_ids = request.args.getlist('profile_ids', type=int)
+    if not profile_ids:
+        flash('Select at least one profile to compare.', 'warning')
+        return redirect(url_for('history.history_detail', run_id=run_id))
+    names = {p.key: p.display_name for p in Pesticide.query.filter_by(profile_id=run.profile_id).all()}
+    readings = [
+        {"pesticide_key": rr.pesticide_key,
+         "name": f"{rr.well} · {names.get(rr.pesticide_key, rr.pesticide_key)}" if rr.well else names.get(rr.pesticide_key, rr.pesticide_key),
+         "rgb_sum": rr.rgb_sum}
+        for rr in RunResult.query.filter_by(run_id=run.id).order_by(RunResult.id.asc())
+    ]
+    profiles, rows = compare_profiles(readings, profile_ids)
+    return render_template('profile_compare.html', title="Compare profiles", image_path=run.image_path, profiles=profiles, rows=rows, run=run,
+                           source=f"Stored RGB totals of {run.name}.")
 
 
 @bp.route('/<int:run_id>/rename', methods=['POST'])
@@ -75,6 +127,7 @@ def history_rename(run_id: int):
         return redirect(url_for('history.history_detail', run_id=run_id))
     run = Run.query.get_or_404(run_id)
     run.name = new_name
+    run.revision = (run.revision or 0) + 1
     db.session.commit()
     flash('Run renamed.', 'success')
     return redirect(url_for('history.history_detail', run_id=run_id))
@@ -83,13 +136,11 @@ def history_rename(run_id: int):
 @bp.route('/<int:run_id>/delete', methods=['POST'])
 def history_delete(run_id: int):
     run = Run.query.get_or_404(run_id)
-    try:
-        if run.image_path and os.path.exists(run.image_path):
-            os.remove(run.image_path)
-    except Exception:
-        pass
+    image_path = run.image_path
+    forget_run_trends([run.id])
     db.session.delete(run)
     db.session.commit()
+    release_upload(image_path)
     flash('Run deleted.', 'success')
     return redirect(url_for('history.history'))
 
@@ -97,6 +148,10 @@ def history_delete(run_id: int):
 @bp.route('/<int:run_id>/export')
 def history_export(run_id: int):
     run = Run.query.get_or_404(run_id)
+    tag = _run_etag(run, 'export')
+    cached = not_modified(tag)
+    if cached:
+        return cached
     export_results = []
     for rr in run.results:
         r = {
@@ -106,11 +161,13 @@ def history_export(run_id: int):
             "concentration": float(rr.concentration),
             "level": rr.level
         }
-        if rr.scientific_data:
-            try:
-                r["scientific_data"] = json.loads(rr.scientific_data)
-            except Exception:
-                pass
+        if rr.well:
+            r["well"] = rr.well
+        if rr.raw_r is not None:
+            r["raw_mean_rgb"] = [rr.raw_r, rr.raw_g, rr.raw_b]
+        color_data = color_data_from_result(rr)
+        if color_data:
+            r["scientific_data"] = color_data
         export_results.append(r)
     payload = {
         "version": 1,
@@ -121,15 +178,19 @@ def history_export(run_id: int):
             "mode": run.mode,
             "profile": run.profile.name if run.profile else None,
             "image_path": run.image_path,
+            "image_size": {"width": run.image_width, "height": run.image_height},
             "normalization": {
                 "used": run.used_normalization,
-                "background_point": {"x": run.background_point_x, "y": run.background_point_y}
+                "background_point": {"x": run.background_point_x, "y": run.background_point_y},
+                "background_mean_rgb": [run.bg_r, run.bg_g, run.bg_b] if run.bg_r is not None else None
             },
             "sampling_scheme": run.sampling_scheme,
+            "layout": run.layout,
+            "roi": json.loads(run.roi) if run.roi else None,
             "results": export_results
         }
     }
-    return jsonify(payload)
+    return with_etag(jsonify(payload), tag)
 
 
 @bp.route('/<int:run_id>/import-to-calibration', methods=['GET', 'POST'])
@@ -173,28 +234,18 @@ def import_to_calibration(run_id: int):
         if not profile_id or not any(p.id == profile_id for p in all_profiles):
             flash('Please select a valid profile.', 'danger')
             return render_template('import_to_calibration.html', title="Import to calibration", run=run, results=results, all_profiles=all_profiles, profile_pesticides=profile_pesticides)
-        added = 0
+        rows = []
         for res in results:
             idx = res["index"]
             target_pesticide_id = request.form.get(f'target_pesticide_id-{idx}', type=int)
             concentration = request.form.get(f'concentration-{idx}', type=float)
             if target_pesticide_id is None or concentration is None:
                 continue
-            pest = Pesticide.query.filter_by(id=target_pesticide_id, profile_id=profile_id).first()
-            if not pest:
-                continue
-            rgb_sum = res["rgb_sum"]
-            max_seq = db.session.query(db.func.max(CalibrationPoint.seq_index)).filter_by(pesticide_id=pest.id).scalar()
-            next_seq = (max_seq or 0) + 1
-            db.session.add(CalibrationPoint(
-                pesticide_id=pest.id,
-                seq_index=next_seq,
-                concentration=float(concentration),
-                rgb_sum=int(rgb_sum),
-            ))
-            added += 1
+            rows.append({"pesticide_id": target_pesticide_id, "concentration": concentration, "rgb_sum": res["rgb_sum"]})
+        # Points are reviewed on the Calibration page, so they are not validated here.
+        rows = [r for r in rows if r["pesticide_id"] in {p["id"] for p in profile_pesticides.get(profile_id, [])}]
+        added, _errors = ingest_calibration_points(profile_id, rows, validate=False)
         if added:
-            db.session.commit()
             flash(f'Imported {added} point(s) into calibration. Review and save on the Calibration page.', 'success')
         else:
             flash('No valid entries to import. Select a profile and target case with concentration for each row.', 'warning')
@@ -0,0 +1,59 @@
+"""Serve uploaded images from whichever storage tier holds them, plus hot thumbnails.
+
+Content-addressed uploads carry their sha256 in the path, which makes a strong ETag
+without reading the file; a matching If-None-Match gets a 304 before any tier is touched.
+Archived tiers hold different bytes (WebP, cropped bands), so their tag names the tier.
+"""
+import io
+import os
+
+from flask import Blueprint, abort, send_file
+
+from app.services import is_upload_path, read_upload, ensure_thumbnail, digest_from_path, not_modified
+
+bp = Blueprint('images', __name__, url_prefix='/images')
+
+IMAGE_MAX_AGE = 24 * 3600  # content-addressed paths never change content
+
+
+def _not_modified(tag):
+    cached = not_modified(tag) if tag else None
+    if cached:
+        cached.cache_control.no_cache = None
+        cached.cache_control.public = True
+        cached.cache_control.max_age = IMAGE_MAX_AGE
+    return cached
+
+
+@bp.route('/<path:image_path>')
+def image(image_path):
+    if not is_upload_path(image_path):
+        abort(404)
+    digest = digest_from_path(image_path)
+    hot = os.path.exists(image_path)
+    tag = (digest if hot else f"{digest}-archived") if digest else None
+    cached = _not_modified(tag)
+    if cached:
+        return cached
+    if hot:
+        return send_file(os.path.abspath(image_path), max_age=IMAGE_MAX_AGE, etag=tag or True)
+    found = read_upload(image_path)
+    if found is None:
+        abort(404)
+    data, media_type = found
+    return send_file(io.BytesIO(data), mimetype=media_type, max_age=IMAGE_MAX_AGE, etag=tag or False)
+
+
+@bp.route('/thumb/<path:image_path>')
+def thumbnail(image_path):
+    if not is_upload_path(image_path):
+        abort(404)
+    digest = digest_from_path(image_path)
+    tag = f"{digest}-thumb" if digest else None
+    cached = _not_modified(tag)
+    if cached:
+        return cached
+    path = ensure_thumbnail(image_path)
+    if path is None:
+        abort(404)
+    return send_file(os.path.abspath(path), mimetype='image/webp', max_age=IMAGE_MAX_AGE, etag=tag or True)
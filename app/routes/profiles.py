@@ -1,12 +1,27 @@
-"""Profile CRUD, activate, clone, setup, case edit, export, import."""
+"""Profile CRUD, activate, clone, setup, case edit, plate layouts, export, import."""
 import json
 from datetime import datetime
 
-from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify
+from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify, abort
 
 from app.extensions import db
-from app.models import CalibrationProfile, Pesticide, CalibrationPoint, ThresholdBand
-from app.services import get_active_profile, validate_calibration_points
+from app.models import CalibrationProfile, Pesticide, CalibrationPoint, ThresholdBand, PlateLayout
+from app.services import (
+    get_active_profile,
+    activate_profile,
+    validate_calibration_points,
+    CURVE_MODELS,
+    LAYOUT_PRESETS,
+    LAYOUT_ASSIGN_BY,
+    MAX_WELLS,
+    default_geometry,
+    validate_layout,
+    profile_version,
+    clear_trends,
+    etag_for,
+    not_modified,
+    with_etag,
+)
 
 bp = Blueprint('profiles', __name__, url_prefix='/profiles')
 
@@ -30,9 +45,8 @@ def profiles_create():
 @bp.route('/activate/<int:profile_id>', methods=['POST'])
 def profiles_activate(profile_id: int):
     prof = CalibrationProfile.query.get_or_404(profile_id)
-    for p in CalibrationProfile.query.all():
-        p.is_active = (p.id == prof.id)
-    db.session.commit()
+    if not activate_profile(prof.id):
+        abort(404)  # deleted since it was loaded
     flash(f'Activated profile: {prof.name}', 'success')
     return redirect(url_for('calibration.calibration'))
 
@@ -48,13 +62,15 @@ def profiles_clone(profile_id: int):
     db.session.add(dst)
     db.session.flush()
     for pest in Pesticide.query.filter_by(profile_id=src.id).all():
-        new_p = Pesticide(profile_id=dst.id, key=pest.key, display_name=pest.display_name, order_index=pest.order_index, active=pest.active)
+        new_p = Pesticide(profile_id=dst.id, key=pest.key, display_name=pest.display_name, order_index=pest.order_index, active=pest.active, curve_model=pest.curve_model)
         db.session.add(new_p)
         db.session.flush()
         for cp in pest.calibration_points:
             db.session.add(CalibrationPoint(pesticide_id=new_p.id, seq_index=cp.seq_index, concentration=cp.concentration, rgb_sum=cp.rgb_sum))
         for tb in pest.threshold_bands:
             db.session.add(ThresholdBand(pesticide_id=new_p.id, band=tb.band, min_value=tb.min_value, max_value=tb.max_value))
+    for lay in PlateLayout.query.filter_by(profile_id=src.id).all():
+        db.session.add(PlateLayout(profile_id=dst.id, **_layout_columns(lay)))
     db.session.commit()
     flash(f'Cloned profile to: {new_name}', 'success')
     return redirect(url_for('calibration.calibration'))
@@ -69,6 +85,7 @@ def profiles_delete(profile_id: int):
     if prof.is_active:
         flash('Deactivate profile before deleting.', 'danger')
         return redirect(url_for('calibration.calibration'))
+    clear_trends(prof.id)
     db.session.delete(prof)
     db.session.commit()
     flash('Profile deleted.', 'success')
@@ -137,6 +154,7 @@ def calibration_case_edit(profile_id: int, pesticide_id: int):
             title="Edit case",
             profile=prof,
             case=pest,
+            curve_models=CURVE_MODELS,
             points=[{"concentration": cp.concentration, "rgb_sum": cp.rgb_sum, "id": cp.id} for cp in pts],
         )
     display_name = request.form.get('display_name', '').strip() or pest.display_name
@@ -148,6 +166,9 @@ def calibration_case_edit(profile_id: int, pesticide_id: int):
         return redirect(url_for('profiles.calibration_case_edit', profile_id=prof.id, pesticide_id=pest.id))
     pest.display_name = display_name
     pest.key = key
+    curve_model = request.form.get('curve_model', pest.curve_model)
+    if curve_model in CURVE_MODELS:
+        pest.curve_model = curve_model
     grouped = {}
     for k, v in request.form.items():
         if k.startswith('concentration-'):
@@ -180,9 +201,82 @@ def calibration_case_edit(profile_id: int, pesticide_id: int):
     return redirect(url_for('calibration.calibration'))
 
 
+def _layout_columns(layout):
+    return {col: getattr(layout, col) for col in ('name', 'rows', 'columns', 'origin_x', 'origin_y', 'pitch_x', 'pitch_y', 'assign_by')}
+
+
+def _layout_fields(data):
+    """Layout columns from a form or import dict; geometry defaults to an even spread. None if unparsable."""
+    try:
+        rows, columns = int(data.get('rows')), int(data.get('columns'))
+        geometry = default_geometry(rows, columns)
+        for key in geometry:
+            if data.get(key) not in (None, ''):
+                geometry[key] = float(data.get(key))
+    except (TypeError, ValueError):
+        return None
+    name = (data.get('name') or '').strip() or f'{rows}x{columns}'
+    return dict(geometry, name=name[:100], rows=rows, columns=columns, assign_by=data.get('assign_by') or 'column')
+
+
+@bp.route('/<int:profile_id>/layouts', methods=['GET', 'POST'])
+def profile_layouts(profile_id: int):
+    """List a profile's plate layouts and add one (from a preset or rows x columns)."""
+    prof = CalibrationProfile.query.get_or_404(profile_id)
+    if request.method == 'POST':
+        form = request.form.to_dict()
+        preset = form.get('preset')
+        if preset in LAYOUT_PRESETS:
+            form['rows'], form['columns'] = LAYOUT_PRESETS[preset]
+            form['name'] = form.get('name') or preset
+        fields = _layout_fields(form)
+        ok, msg = validate_layout(fields) if fields else (False, "Rows and columns must be numbers.")
+        if not ok:
+            flash(msg, 'danger')
+        else:
+            db.session.add(PlateLayout(profile_id=prof.id, **fields))
+            db.session.commit()
+            flash(f"Added layout {fields['name']} ({fields['rows'] * fields['columns']} wells).", 'success')
+        return redirect(url_for('profiles.profile_layouts', profile_id=prof.id))
+    layouts = PlateLayout.query.filter_by(profile_id=prof.id).order_by(PlateLayout.id.asc()).all()
+    return render_template('profile_layouts.html', title="Plate layouts", profile=prof, layouts=layouts,
+                           presets=LAYOUT_PRESETS, assign_choices=LAYOUT_ASSIGN_BY, max_wells=MAX_WELLS)
+
+
+@bp.route('/<int:profile_id>/layouts/<int:layout_id>', methods=['POST'])
+def profile_layout_edit(profile_id: int, layout_id: int):
+    """Update a layout's grid, geometry or case assignment."""
+    layout = PlateLayout.query.filter_by(id=layout_id, profile_id=profile_id).first_or_404()
+    fields = _layout_fields(request.form)
+    ok, msg = validate_layout(fields) if fields else (False, "Rows and columns must be numbers.")
+    if not ok:
+        flash(msg, 'danger')
+    else:
+        for key, value in fields.items():
+            setattr(layout, key, value)
+        db.session.commit()
+        flash('Layout saved.', 'success')
+    return redirect(url_for('profiles.profile_layouts', profile_id=profile_id))
+
+
+@bp.route('/<int:profile_id>/layouts/<int:layout_id>/delete', methods=['POST'])
+def profile_layout_delete(profile_id: int, layout_id: int):
+    layout = PlateLayout.query.filter_by(id=layout_id, profile_id=profile_id).first_or_404()
+    db.session.delete(layout)
+    db.session.commit()
+    flash('Layout deleted.', 'success')
+    return redirect(url_for('profiles.profile_layouts', profile_id=profile_id))
+
+
 @bp.route('/<int:profile_id>/export')
 def profiles_export(profile_id: int):
     prof = CalibrationProfile.query.get_or_404(profile_id)
+    layouts = PlateLayout.query.filter_by(profile_id=prof.id).order_by(PlateLayout.id.asc()).all()
+    # profile_version fingerprints cases, points, bands and layouts with four flat queries; no payload is built for a 304.
+    tag = etag_for('profile-export', prof.id, prof.name, profile_version(prof.id), [_layout_columns(lay) for lay in layouts])
+    cached = not_modified(tag)
+    if cached:
+        return cached
     payload = {
         "version": 1,
         "profile": {
@@ -196,10 +290,13 @@ def profiles_export(profile_id: int):
             "display_name": p.display_name,
             "order_index": p.order_index,
             "active": p.active,
+            "curve_model": p.curve_model,
             "points": [{"concentration": cp.concentration, "rgb_sum": cp.rgb_sum} for cp in sorted(p.calibration_points, key=lambda c: c.seq_index)],
             "thresholds": {tb.band: {"min": tb.min_value, "max": tb.max_value} for tb in p.threshold_bands}
         })
-    return jsonify(payload)
+    if layouts:
+        payload["profile"]["layouts"] = [_layout_columns(lay) for lay in layouts]
+    return with_etag(jsonify(payload), tag)
 
 
 @bp.route('/import', methods=['POST'])
@@ -218,7 +315,7 @@ def profiles_import():
         db.session.add(prof)
         db.session.flush()
         for pest in data.get('profile', {}).get('pesticides', []):
-            new_p = Pesticide(profile_id=prof.id, key=pest.get('key'), display_name=pest.get('display_name', pest.get('key')), order_index=int(pest.get('order_index', 0)), active=bool(pest.get('active', True)))
+            new_p = Pesticide(profile_id=prof.id, key=pest.get('key'), display_name=pest.get('display_name', pest.get('key')), order_index=int(pest.get('order_index', 0)), active=bool(pest.get('active', True)), curve_model=pest.get('curve_model') if pest.get('curve_model') in CURVE_MODELS else 'linear')
             db.session.add(new_p)
             db.session.flush()
             pts = pest.get('points', [])
@@ -228,6 +325,10 @@ def profiles_import():
             for band in ['low', 'medium', 'high']:
                 if band in thr:
                     db.session.add(ThresholdBand(pesticide_id=new_p.id, band=band, min_value=float(thr[band]['min']), max_value=float(thr[band]['max'])))
+        for lay in data.get('profile', {}).get('layouts', []):
+            fields = _layout_fields(lay)
+            if fields and validate_layout(fields)[0]:
+                db.session.add(PlateLayout(profile_id=prof.id, **fields))
         db.session.commit()
         flash(f'Imported profile: {prof_name}', 'success')
     except Exception:
@@ -1,11 +1,26 @@
-"""Settings page and data clear."""
+"""Settings page, data clear, storage housekeeping, and request profiler captures."""
 import os
 
-from flask import Blueprint, request, redirect, url_for, flash, render_template
+from flask import Blueprint, request, redirect, url_for, flash, render_template, current_app, abort, send_from_directory, session
+from sqlalchemy import delete
 
 from app.extensions import db
-from app.models import Run
-from app.services import get_app_mode, get_app_setting, set_app_setting
+from app.models import Run, RunResult
+from app.services import (
+    get_app_mode,
+    get_app_setting,
+    set_app_setting,
+    release_upload,
+    sweep_uploads,
+    run_configured_lifecycle,
+    lifecycle_summary,
+    get_result_cache,
+    list_profiles,
+    clear_trends,
+)
+from app.services.profiler import PROFILE_ARG
+
+PROFILER_SESSION_KEY = 'profiler_token'
 
 bp = Blueprint('settings', __name__)
 
@@ -17,7 +32,8 @@ def settings():
         'mode': get_app_mode(),
         'theme': get_app_setting('ui_theme', 'light')
     }
-    return render_template('settings.html', title="Settings", settings=app_settings)
+    return render_template('settings.html', title="Settings", settings=app_settings, storage_tiers=lifecycle_summary(),
+                           result_cache=get_result_cache(current_app).stats())
 
 
 @bp.route('/settings', methods=['POST'])
@@ -37,16 +53,76 @@ def settings_save():
 @bp.route('/data/clear', methods=['POST'])
 def data_clear():
     """Clear analysis runs (and images)."""
-    runs = Run.query.all()
-    deleted = 0
-    for r in runs:
-        try:
-            if r.image_path and os.path.exists(r.image_path):
-                os.remove(r.image_path)
-        except Exception:
-            pass
-        db.session.delete(r)
-        deleted += 1
+    # Set-based deletes in one transaction: the first takes SQLite's write lock, so a run stored
+    # concurrently commits either before the clear (and is removed) or after it (and keeps its trends).
+    db.session.execute(delete(RunResult))
+    paths = db.session.scalars(delete(Run).returning(Run.image_path)).all()
+    clear_trends()
     db.session.commit()
+    deleted = len(paths)
+    image_paths = {path for path in paths if path}
+    for path in image_paths:
+        release_upload(path)
+    get_result_cache(current_app).clear()
     flash(f'Cleared {deleted} runs.', 'success')
     return redirect(url_for('settings.settings'))
+
+
+@bp.route('/data/sweep-uploads', methods=['POST'])
+def data_sweep_uploads():
+    """Delete expired staged uploads and images no run references."""
+    report = sweep_uploads(current_app.config['UPLOAD_STAGING_TTL'])
+    flash(
+        f"Removed {report['staged_files']} expired upload(s) and {report['orphan_files']} unreferenced image(s); "
+        f"reclaimed {report['reclaimed_bytes'] / (1024 * 1024):.1f} MB.",
+        'success',
+    )
+    return redirect(url_for('settings.settings'))
+
+
+@bp.route('/data/archive-uploads', methods=['POST'])
+def data_archive_uploads():
+    """Run the upload lifecycle now (normally a daily background job)."""
+    report = run_configured_lifecycle(current_app.config)
+    saved = report['warm']['saved_bytes'] + report['cold']['saved_bytes']
+    flash(
+        f"Re-encoded {report['warm']['files']} image(s) and bundled {report['cold']['files']}; "
+        f"saved {saved / (1024 * 1024):.1f} MB.",
+        'warning' if report['errors'] else 'success',
+    )
+    return redirect(url_for('settings.settings'))
+
+
+def _profiler_or_404():
+    """
+    The request profiler, if enabled and the caller presents its token (X-Profile header or
+    ?_profile=, then kept in the session so links need not carry it); else 404.
+    """
+    profiler = current_app.extensions.get('request_profiler')
+    if profiler is None:
+        abort(404)
+    supplied = profiler.supplied_token(request.environ)
+    if profiler.authorized(supplied):
+        session[PROFILER_SESSION_KEY] = supplied
+    elif not profiler.authorized(session.get(PROFILER_SESSION_KEY)):
+        abort(404)
+    return profiler
+
+
+@bp.route('/settings/profiler')
+def profiler_captures():
+    """List saved per-request profiles."""
+    profiler = _profiler_or_404()
+    if PROFILE_ARG in request.args:  # now in the session: drop it from the address bar and history
+        return redirect(url_for('settings.profiler_captures'))
+    return render_template('profiler.html', title="Request profiles", captures=list_profiles(profiler.out_dir),
+                           keep=profiler.keep)
+
+
+@bp.route('/settings/profiler/<name>.pstats')
+def profiler_download(name: str):
+    """Download one capture's pstats file."""
+    profiler = _profiler_or_404()
+    if not os.path.isfile(os.path.join(profiler.out_dir, name + '.pstats')):
+        abort(404)
+    return send_from_directory(profiler.out_dir, name + '.pstats', as_attachment=True, mimetype='application/octet-stream')
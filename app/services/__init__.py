@@ -1,28 +1,139 @@
-"""Services package."""
-from app.services.settings_service import get_app_setting, set_app_setting, get_app_mode
-from app.services.profile_service import get_active_profile, validate_calibration_points, get_active_pesticides
-from app.services.image_utils import ensure_upload_dir, compute_background_offsets, sample_five_pixel_total, sample_five_pixel_mean_rgb
-from app.services.color_utils import rgb_to_hex, rgb_to_hsv_str, rgb_to_hsl_str, scientific_color_data
-from app.services.analysis_engine import interpolate_concentration, classify_concentration
-from app.services.seed import seed_defaults, ensure_scientific_data_column
+"""Services package.
+
+The names below are imported from their modules on first use (PEP 562), so importing one
+Flask-free module such as app.services.embedded does not load Flask, the database or the
+other services.
+"""
+import importlib
+
+# module -> names it provides ('NAME as ALIAS' exports NAME under ALIAS)
+_EXPORTS = {
+    'settings_service': ('get_app_setting', 'set_app_setting', 'get_app_mode'),
+    'profile_service': (
+        'get_active_profile',
+        'activate_profile',
+        'validate_calibration_points',
+        'get_active_pesticides',
+        'compiled_curve_for',
+        'profile_version',
+    ),
+    'image_utils': (
+        'ensure_upload_dir',
+        'auto_points',
+        'compute_background_offsets',
+        'background_patch_mean',
+        'sample_five_pixel_total',
+        'sample_five_pixel_mean_rgb',
+    ),
+    'color_utils': (
+        'rgb_to_hex',
+        'rgb_to_hsv_str',
+        'rgb_to_hsl_str',
+        'scientific_color_data',
+        'scientific_color_columns',
+        'color_data_from_result',
+    ),
+    'analysis_engine': ('interpolate_concentration', 'classify_concentration'),
+    'seed': (
+        'seed_defaults',
+        'ensure_scientific_data_column',
+        'ensure_schema_columns',
+        'ensure_indexes',
+        'backfill_typed_columns',
+    ),
+    'curves': ('CompiledCurve', 'compile_curve', 'CURVE_MODELS', 'LEVELS'),
+    'calibration_ingest': (
+        'parse_calibration_csv',
+        'run_template_rows',
+        'format_calibration_csv',
+        'ingest_calibration_points',
+    ),
+    'static_assets': ('build_assets', 'load_manifest'),
+    'upload_store': (
+        'store_upload',
+        'release_upload',
+        'digest_from_path',
+        'stage_upload',
+        'promote_upload',
+        'discard_staged',
+        'sweep_uploads',
+        'is_staged_path',
+        'is_upload_path',
+    ),
+    'upload_lifecycle': (
+        'run_lifecycle',
+        'run_configured_lifecycle',
+        'lifecycle_summary',
+        'read_upload',
+        'open_upload_image',
+        'ensure_thumbnail',
+    ),
+    'background': ('start_periodic_job', 'start_background_job', 'is_job_running'),
+    'recompute': ('recompute_results', 'get_recompute_job'),
+    'run_writer': ('persist_run', 'persist_runs', 'get_run_writer', 'RunWriterBusy'),
+    'trends': (
+        'PERIODS as TREND_PERIODS',
+        'DEFAULT_BUCKETS as TREND_DEFAULT_BUCKETS',
+        'trend_series',
+        'forget_run_trends',
+        'clear_trends',
+        'rebuild_trends',
+    ),
+    'pipeline': (
+        'AnalysisPipeline',
+        'AnalysisResult',
+        'Measurement',
+        'SamplingPlan',
+        'decode_image',
+        'server_timing',
+        'STAGES as ANALYSIS_STAGES',
+        'SCIENTIFIC_POINTS',
+        'MAX_AUTO_POINTS',
+    ),
+    'roi': ('RoiGeometry', 'parse_roi'),
+    'embedded': ('FrameAnalyzer', 'FrameResult', 'frame_pixels', 'load_profile_curves', 'CHANNEL_ORDERS'),
+    'batch_analysis': ('analyze_files', 'find_images'),
+    'layouts': (
+        'LAYOUT_PRESETS',
+        'ASSIGN_BY as LAYOUT_ASSIGN_BY',
+        'MAX_WELLS',
+        'default_geometry',
+        'validate_layout',
+        'layout_grid',
+        'layout_wells',
+        'plate_grid',
+    ),
+    'profile_compare': ('compare_profiles',),
+    'burst': ('FrameAccumulator', 'BurstError', 'BURST_MODES', 'get_burst_store'),
+    'http_cache': ('etag_for', 'not_modified', 'render_epoch', 'with_etag'),
+    'profiler': ('install_profiler', 'list_profiles'),
+    'result_cache': ('ResultCache', 'get_result_cache', 'result_key', 'cached_result'),
+    'sampling': (
+        'ImageSampler',
+        'SamplingKernel',
+        'parse_sampling_scheme',
+        'SAMPLING_SCHEMES',
+        'DEFAULT_SCHEME as DEFAULT_SAMPLING_SCHEME',
+    ),
+}
+_SOURCES = {}
+for _module, _names in _EXPORTS.items():
+    for _entry in _names:
+        _attr, _, _alias = _entry.partition(' as ')
+        _SOURCES[_alias or _attr] = ('app.services.' + _module, _attr)
+del _module, _names, _entry, _attr, _alias
+__all__ = list(_SOURCES)
+
+
+def __getattr__(name):
+    try:
+        module, attr = _SOURCES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = globals()[name] = getattr(importlib.import_module(module), attr)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
 
-__all__ = [
-    'get_app_setting',
-    'set_app_setting',
-    'get_app_mode',
-    'get_active_profile',
-    'validate_calibration_points',
-    'get_active_pesticides',
-    'ensure_upload_dir',
-    'compute_background_offsets',
-    'sample_five_pixel_total',
-    'sample_five_pixel_mean_rgb',
-    'rgb_to_hex',
-    'rgb_to_hsv_str',
-    'rgb_to_hsl_str',
-    'scientific_color_data',
-    'interpolate_concentration',
-    'classify_concentration',
-    'seed_defaults',
-    'ensure_scientific_data_column',
-]
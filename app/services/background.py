@@ -0,0 +1,52 @@
+"""Periodic and one-shot background jobs on daemon threads (each run happens inside an app context)."""
+import threading
+
+_jobs_lock = threading.Lock()  # makes "is it running?" and "start it" one step for concurrent requests
+
+
+def start_periodic_job(app, name, interval_seconds, func):
+    """Call func() every interval_seconds; a job name is only started once per app. Returns the stop Event."""
+    if not interval_seconds or interval_seconds <= 0:
+        return app.extensions.get('background_jobs', {}).get(name)
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval_seconds):
+            with app.app_context():
+                try:
+                    func()
+                except Exception:
+                    app.logger.exception('Background job %s failed', name)
+
+    with _jobs_lock:
+        jobs = app.extensions.setdefault('background_jobs', {})
+        if name in jobs:
+            return jobs[name]
+        threading.Thread(target=loop, name=f'bioap-{name}', daemon=True).start()
+        jobs[name] = stop
+    return stop
+
+
+def start_background_job(app, name, func):
+    """Run func() once on a daemon thread. Returns False if a job with this name is still running."""
+    def run():
+        with app.app_context():
+            try:
+                func()
+            except Exception:
+                app.logger.exception('Background job %s failed', name)
+
+    with _jobs_lock:
+        jobs = app.extensions.setdefault('background_jobs', {})
+        current = jobs.get(name)
+        if isinstance(current, threading.Thread) and current.is_alive():
+            return False
+        thread = threading.Thread(target=run, name=f'bioap-{name}', daemon=True)
+        jobs[name] = thread
+        thread.start()
+    return True
+
+
+def is_job_running(app, name):
+    job = app.extensions.get('background_jobs', {}).get(name)
+    return isinstance(job, threading.Thread) and job.is_alive()
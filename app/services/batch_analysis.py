@@ -0,0 +1,142 @@
+"""Offline batch analysis of image files, without the HTTP server.
+
+Same AnalysisPipeline as the auto analysis form (analysis_run): auto-placed points, or every
+well of a plate layout, the chosen sampling kernel and optional background normalization.
+The pixel work (hash, copy into the upload store, decode, the pipeline's SamplingPlan) runs
+in a process pool; the parent evaluates with the pipeline's curves, which are resolved once
+per batch, and stores runs with bulk INSERTs, committing every `commit_every` runs.
+
+Files are identified by content: a file whose bytes already have a run for the profile
+(same content-addressed image_path) is skipped, as are repeated copies within the batch.
+"""
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.extensions import db
+from app.models import Run
+from app.services.pipeline import AnalysisPipeline, decode_image, timed_stage
+from app.services.run_writer import persist_runs
+from app.services.sampling import parse_sampling_scheme
+from app.services.upload_store import CHUNK_SIZE, cas_path, sniff_image_ext, store_upload
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+_IN_CHUNK = 500  # image paths per IN (...) lookup, under SQLite's variable limit
+
+
+def find_images(sources, recursive=False):
+    """Image files (by extension) from directories, glob patterns or file paths, sorted and de-duplicated."""
+    found = set()
+    for source in sources:
+        if os.path.isdir(source):
+            pattern = os.path.join(source, '**', '*') if recursive else os.path.join(source, '*')
+            candidates = glob.glob(pattern, recursive=recursive)
+        else:
+            candidates = glob.glob(source, recursive=recursive)
+        found.update(os.path.abspath(p) for p in candidates
+                     if os.path.isfile(p) and os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+    return sorted(found)
+
+
+def _fingerprint(path):
+    """(path, store image_path) from the file's sha256 and signature; (path, None) if unreadable."""
+    h = hashlib.sha256()
+    head = b''
+    try:
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+                if not head:
+                    head = chunk[:16]
+                h.update(chunk)
+    except OSError:
+        return path, None
+    fallback = os.path.splitext(path)[1].lower().replace('.jpeg', '.jpg')
+    return path, cas_path(h.hexdigest(), sniff_image_ext(head, fallback))
+
+
+def _measure(task):
+    """Worker: copy one file into the store, decode and measure it. Returns a dict with the Measurement, or {'error'}."""
+    path, plan = task
+    timings = {}
+    try:
+        with open(path, 'rb') as fh:
+            image_path, _digest, created = store_upload(fh, fallback_ext=os.path.splitext(path)[1].lower())
+    except OSError as exc:
+        return {'source': path, 'error': str(exc)}
+    with timed_stage(timings, 'decode'):
+        img = decode_image(path)
+    if img is None:
+        if created:
+            os.remove(image_path)  # not an image: keep it out of the store
+        return {'source': path, 'error': 'not a readable image'}
+    return {'source': path, 'image_path': image_path, 'measurement': plan.measure(img, timings=timings), 'timings': timings}
+
+
+def _already_processed(profile_id, image_paths):
+    done = set()
+    paths = list(image_paths)
+    for start in range(0, len(paths), _IN_CHUNK):
+        chunk = paths[start:start + _IN_CHUNK]
+        done.update(p for (p,) in db.session.query(Run.image_path).filter(Run.profile_id == profile_id, Run.image_path.in_(chunk)).distinct())
+    return done
+
+
+def analyze_files(paths, profile, mode, scheme='5-pixel', normalize=False, layout=None, workers=None,
+                  commit_every=100, reprocess=False, progress=None):
+    """
+    Analyze image files against profile (call inside an app context). progress(stats) is called
+    after each commit. Returns stats: files, duplicates, skipped, analyzed, failed (list of
+    (path, error)), run_ids, seconds, images_per_sec and stage_seconds (pipeline stage totals,
+    summed over workers).
+    """
+    workers = workers or os.cpu_count() or 1
+    pipeline = AnalysisPipeline(profile, mode, parse_sampling_scheme(scheme), normalize=normalize, layout=layout)
+    stats = {'files': len(paths), 'duplicates': 0, 'skipped': 0, 'analyzed': 0, 'failed': [], 'run_ids': [],
+             'hash_seconds': 0.0, 'seconds': 0.0, 'images_per_sec': 0.0, 'stage_seconds': pipeline.timings}
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(paths) > 1 else None
+    try:
+        mapper = pool.map if pool else map
+        by_image = {}
+        for path, image_path in mapper(_fingerprint, paths, **({'chunksize': 16} if pool else {})):
+            if image_path is None:
+                stats['failed'].append((path, 'unreadable'))
+            elif image_path in by_image:
+                stats['duplicates'] += 1
+            else:
+                by_image[image_path] = path
+        done = set() if reprocess else _already_processed(profile.id, by_image)
+        stats['skipped'] = len(done)
+        todo = [path for image_path, path in by_image.items() if image_path not in done]
+        stats['hash_seconds'] = round(time.perf_counter() - start, 3)
+
+        tasks = [(path, pipeline.plan) for path in todo]
+        payloads = []
+
+        def flush():
+            with timed_stage(pipeline.timings, 'persist'):
+                stats['run_ids'].extend(persist_runs(payloads))
+            stats['analyzed'] += len(payloads)
+            payloads.clear()
+            stats['seconds'] = round(time.perf_counter() - start, 3)
+            stats['images_per_sec'] = round(stats['analyzed'] / stats['seconds'], 2) if stats['seconds'] else 0.0
+            if progress:
+                progress(dict(stats))
+
+        for m in mapper(_measure, tasks):
+            if 'error' in m:
+                stats['failed'].append((m['source'], m['error']))
+                continue
+            for stage, seconds in m['timings'].items():
+                pipeline.timings[stage] = pipeline.timings.get(stage, 0.0) + seconds
+            result = pipeline.result(m['image_path'], m['measurement'])
+            payloads.append((pipeline.run_fields(result, os.path.basename(m['source'])), result.rows))
+            if len(payloads) >= commit_every:
+                flush()
+        flush()
+    finally:
+        if pool:
+            pool.shutdown()
+    return stats
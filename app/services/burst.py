@@ -0,0 +1,185 @@
+"""Burst capture: fold K camera frames into one averaged frame as they arrive.
+
+Each frame is decoded, folded into a per-pixel accumulator and dropped, so memory stays
+at a couple of float32 frames however long the burst is:
+
+mean    running sum / k.
+median  streaming (Robbins-Monro) estimate m += 3·d/k·sign(x - m), with d the running
+        mean absolute deviation; approximate, but robust to a frame with a passing shadow
+        or glare without keeping all K frames.
+
+To report the noise reduction actually achieved, a small window around each probe point
+is kept from every frame. Single-frame noise is the temporal standard deviation in those
+windows; the averaged frame's noise is estimated split-half (even vs. odd frames reduced
+the same way), which needs no ground truth.
+
+Bursts live in this process's memory (get_burst_store), so frames of one burst must reach
+the same process: run a single worker with threads (e.g. gunicorn -w 1 --threads 8). The
+burst start route refuses with 503 on a multi-process server.
+"""
+import io
+import threading
+import time
+import uuid
+
+import numpy as np
+from PIL import Image
+
+BURST_MODES = ('mean', 'median')
+PROBE_HALF = 4  # probe windows are 9x9 pixels
+
+
+class BurstError(ValueError):
+    """A frame that cannot be added (unreadable, wrong size, burst full)."""
+
+
+def _fold_median(state, dev, x, k):
+    """One streaming-median step for the k-th frame x (k >= 2); updates state and dev in place."""
+    diff = x - state
+    dev += (np.abs(diff) - dev) / k
+    state += (3.0 / k) * np.maximum(dev, 0.5) * np.sign(diff)
+
+
+def _reduce(stack, mode):
+    """Combine stacked frames the same way the accumulator does."""
+    if mode == 'mean':
+        return stack.mean(axis=0)
+    state, dev = stack[0].copy(), np.zeros_like(stack[0])
+    for k, x in enumerate(stack[1:], start=2):
+        _fold_median(state, dev, x, k)
+    return state
+
+
+class FrameAccumulator:
+    """Per-pixel running mean or approximate median of same-sized RGB frames."""
+
+    def __init__(self, mode='mean', max_frames=16, probe_points=None):
+        if mode not in BURST_MODES:
+            raise BurstError(f"Unknown burst mode: {mode!r}")
+        self.mode = mode
+        self.max_frames = max_frames
+        self.probe_points = probe_points  # callable(width, height) -> [(x, y), ...], evaluated on the first frame
+        self.count = 0
+        self.shape = None
+        self.ingest_seconds = []
+        self._state = None
+        self._dev = None
+        self._probes = []
+        self._windows = []  # per frame: (P, 9, 9, 3) float32 probe windows
+        self._lock = threading.Lock()
+
+    def add(self, frame):
+        """Fold one frame (encoded bytes, PIL image or HxWx3 uint8 array) into the accumulator."""
+        with self._lock:
+            self._add(frame)
+
+    def _add(self, frame):
+        start = time.perf_counter()
+        if self.count >= self.max_frames:
+            raise BurstError(f"A burst holds at most {self.max_frames} frames.")
+        if isinstance(frame, (bytes, bytearray)):
+            try:
+                with Image.open(io.BytesIO(frame)) as im:
+                    frame = im.convert('RGB')
+            except OSError as exc:
+                raise BurstError("Frame is not a readable image.") from exc
+        if isinstance(frame, Image.Image):
+            frame = np.asarray(frame.convert('RGB'))
+        x = frame.astype(np.float32)
+        if self.shape is None:
+            self.shape = x.shape
+            self._state = x.copy()
+            self._dev = np.zeros_like(x) if self.mode == 'median' else None
+            if self.probe_points:
+                h, w = x.shape[:2]
+                self._probes = [(min(max(int(px), PROBE_HALF), w - PROBE_HALF - 1), min(max(int(py), PROBE_HALF), h - PROBE_HALF - 1))
+                                for px, py in self.probe_points(w, h)]
+        elif x.shape != self.shape:
+            raise BurstError("All frames of a burst must have the same size.")
+        else:
+            k = self.count + 1
+            if self.mode == 'mean':
+                self._state += x
+            else:
+                _fold_median(self._state, self._dev, x, k)
+        self.count += 1
+        if self._probes:
+            self._windows.append(np.stack([
+                x[py - PROBE_HALF:py + PROBE_HALF + 1, px - PROBE_HALF:px + PROBE_HALF + 1] for px, py in self._probes
+            ]))
+        self.ingest_seconds.append(time.perf_counter() - start)
+
+    def result(self):
+        """The averaged frame as a uint8 HxWx3 array."""
+        if not self.count:
+            raise BurstError("The burst has no frames.")
+        averaged = self._state / self.count if self.mode == 'mean' else self._state
+        return np.clip(np.rint(averaged), 0, 255).astype(np.uint8)
+
+    def report(self):
+        """Frames, per-frame ingest times (ms) and, with probe points and at least 4 frames, noise per point."""
+        report = {
+            'frames': self.count,
+            'mode': self.mode,
+            'ingest_ms': [round(s * 1000, 1) for s in self.ingest_seconds],
+            'mean_ingest_ms': round(1000 * sum(self.ingest_seconds) / len(self.ingest_seconds), 1) if self.ingest_seconds else 0.0,
+            'points': [],
+        }
+        if len(self._windows) < 4:
+            return report
+        stack = np.stack(self._windows)  # (K, P, 9, 9, 3)
+        even, odd = _reduce(stack[0::2], self.mode), _reduce(stack[1::2], self.mode)
+        for i, (px, py) in enumerate(self._probes):
+            frame_noise = float(np.sqrt(np.mean(stack[:, i].var(axis=0))))
+            averaged_noise = float(np.sqrt(np.mean((even[i] - odd[i]) ** 2)) / 2)
+            report['points'].append({
+                'x': px, 'y': py,
+                'frame_noise': round(frame_noise, 2),
+                'averaged_noise': round(averaged_noise, 2),
+                'reduction': round(frame_noise / averaged_noise, 2) if averaged_noise > 0 else None,
+            })
+        return report
+
+
+class BurstStore:
+    """In-process bursts by id; abandoned ones expire after ttl seconds, and at most max_active exist at once."""
+
+    def __init__(self, ttl=600, max_active=8):
+        self.ttl = ttl
+        self.max_active = max_active
+        self._bursts = {}
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        for key in [k for k, (touched, _acc) in self._bursts.items() if now - touched > self.ttl]:
+            del self._bursts[key]
+
+    def open(self, accumulator):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if len(self._bursts) >= self.max_active:
+                raise BurstError("Too many bursts in progress; try again shortly.")
+            burst_id = uuid.uuid4().hex
+            self._bursts[burst_id] = (now, accumulator)
+            return burst_id
+
+    def get(self, burst_id):
+        with self._lock:
+            entry = self._bursts.get(burst_id)
+            if entry is None:
+                return None
+            self._bursts[burst_id] = (time.monotonic(), entry[1])
+            return entry[1]
+
+    def pop(self, burst_id):
+        with self._lock:
+            entry = self._bursts.pop(burst_id, None)
+            return entry[1] if entry else None
+
+
+def get_burst_store(app):
+    store = app.extensions.get('burst_store')
+    if store is None:
+        store = app.extensions.setdefault('burst_store', BurstStore(app.config['BURST_TTL'], app.config['BURST_MAX_ACTIVE']))
+    return store
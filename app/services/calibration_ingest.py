@@ -0,0 +1,145 @@
+"""Bulk calibration-point ingest from CSV rows or stored runs.
+
+Every lookup is batched: one query for the target cases, one for the run
+results referenced, one for the existing points (which also yields the next
+seq_index per case). Merged point sets are validated before anything is
+written, and all points are added in a single commit.
+"""
+import csv
+import io
+
+from app.extensions import db
+from app.models import Pesticide, CalibrationPoint, RunResult
+from app.services.profile_service import validate_calibration_points
+
+CSV_COLUMNS = ('pesticide', 'concentration', 'rgb_sum', 'run_id', 'result_key')
+
+
+def parse_calibration_csv(text):
+    """
+    Parse CSV with a header row. Columns: pesticide (case key), concentration, and either
+    rgb_sum or run_id (+ optional result_key, the run result's key; defaults to pesticide).
+    Returns (rows, errors); rows with a blank concentration are skipped.
+    """
+    rows, errors = [], []
+    reader = csv.DictReader(io.StringIO(text.lstrip('﻿')))
+    fields = {(f or '').strip().lower() for f in (reader.fieldnames or [])}
+    if 'pesticide' not in fields or 'concentration' not in fields or not ({'rgb_sum', 'run_id'} & fields):
+        return [], ["CSV header must include pesticide, concentration and rgb_sum or run_id."]
+    for line_no, raw in enumerate(reader, start=2):
+        rec = {(k or '').strip().lower(): (v or '').strip() for k, v in raw.items() if k}
+        if not any(rec.values()) or not rec.get('concentration'):
+            continue
+        try:
+            row = {
+                'line': line_no,
+                'pesticide': rec['pesticide'].lower().replace(' ', '_'),
+                'concentration': float(rec['concentration']),
+            }
+            if rec.get('rgb_sum'):
+                row['rgb_sum'] = int(float(rec['rgb_sum']))
+            elif rec.get('run_id'):
+                row['run_id'] = int(rec['run_id'])
+                row['result_key'] = rec.get('result_key') or row['pesticide']
+            else:
+                raise ValueError('rgb_sum or run_id is required')
+        except (KeyError, ValueError) as e:
+            errors.append(f"Line {line_no}: {e}")
+            continue
+        if not row['pesticide']:
+            errors.append(f"Line {line_no}: pesticide is required")
+            continue
+        rows.append(row)
+    return rows, errors
+
+
+def run_template_rows(run_ids):
+    """One CSV row per stored result of the given runs, concentration left blank to fill in."""
+    results = (
+        RunResult.query.filter(RunResult.run_id.in_(run_ids))
+        .order_by(RunResult.run_id.asc(), RunResult.id.asc()).all()
+    )
+    return [
+        {'pesticide': rr.pesticide_key, 'concentration': '', 'rgb_sum': '', 'run_id': rr.run_id, 'result_key': rr.pesticide_key}
+        for rr in results
+    ]
+
+
+def format_calibration_csv(rows):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_COLUMNS, extrasaction='ignore', lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+def ingest_calibration_points(profile_id, rows, replace=False, validate=True):
+    """
+    Add rows ({'pesticide' key or 'pesticide_id', 'concentration', 'rgb_sum' or 'run_id' + 'result_key'})
+    as calibration points of the given profile. With replace, each touched case's existing points are
+    dropped first. Nothing is written if any row fails to resolve or any merged set fails
+    validate_calibration_points. Returns (added, errors).
+    """
+    errors = []
+    keys = {r['pesticide'] for r in rows if 'pesticide_id' not in r}
+    ids = {r['pesticide_id'] for r in rows if 'pesticide_id' in r}
+    pests = Pesticide.query.filter_by(profile_id=profile_id).filter(
+        db.or_(Pesticide.key.in_(keys), Pesticide.id.in_(ids))
+    ).all() if rows else []
+    by_key = {p.key: p for p in pests}
+    by_id = {p.id: p for p in pests}
+
+    run_ids = {r['run_id'] for r in rows if 'rgb_sum' not in r and 'run_id' in r}
+    run_sums = {}
+    if run_ids:
+        q = db.session.query(RunResult.run_id, RunResult.pesticide_key, RunResult.rgb_sum).filter(RunResult.run_id.in_(run_ids))
+        for run_id, key, rgb_sum in q:
+            run_sums.setdefault((run_id, key), rgb_sum)
+
+    new_points = {}
+    for r in rows:
+        label = f"Line {r['line']}" if 'line' in r else f"Case {r.get('pesticide') or r.get('pesticide_id')}"
+        pest = by_id.get(r['pesticide_id']) if 'pesticide_id' in r else by_key.get(r['pesticide'])
+        if not pest:
+            errors.append(f"{label}: no case {r.get('pesticide', r.get('pesticide_id'))!r} in this profile")
+            continue
+        rgb_sum = r.get('rgb_sum')
+        if rgb_sum is None:
+            rgb_sum = run_sums.get((r.get('run_id'), r.get('result_key')))
+            if rgb_sum is None:
+                errors.append(f"{label}: run {r.get('run_id')} has no result {r.get('result_key')!r}")
+                continue
+        new_points.setdefault(pest.id, []).append({'concentration': float(r['concentration']), 'rgb_sum': int(rgb_sum)})
+    if errors:
+        return 0, errors
+
+    existing = {}
+    next_seq = {}
+    if new_points:
+        q = db.session.query(CalibrationPoint.pesticide_id, CalibrationPoint.seq_index,
+                             CalibrationPoint.concentration, CalibrationPoint.rgb_sum)
+        for pid, seq, conc, rgb_sum in q.filter(CalibrationPoint.pesticide_id.in_(new_points.keys())):
+            existing.setdefault(pid, []).append({'concentration': conc, 'rgb_sum': rgb_sum})
+            next_seq[pid] = max(next_seq.get(pid, 0), seq + 1)
+
+    if validate:
+        for pid, pts in new_points.items():
+            merged = pts if replace else existing.get(pid, []) + pts
+            ok, msg = validate_calibration_points(merged)
+            if not ok:
+                errors.append(f"{by_id[pid].display_name}: {msg}")
+        if errors:
+            return 0, errors
+
+    if replace and new_points:
+        CalibrationPoint.query.filter(CalibrationPoint.pesticide_id.in_(new_points.keys())).delete(synchronize_session=False)
+    added = 0
+    for pid, pts in new_points.items():
+        seq = 0 if replace else next_seq.get(pid, 0)
+        db.session.add_all([
+            CalibrationPoint(pesticide_id=pid, seq_index=seq + i, concentration=p['concentration'], rgb_sum=p['rgb_sum'])
+            for i, p in enumerate(pts)
+        ])
+        added += len(pts)
+    db.session.commit()
+    return added, []
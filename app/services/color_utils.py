@@ -10,16 +10,28 @@ def rgb_to_hex(r, g, b):
     )
 
 
+def rgb_to_hsv_values(r, g, b):
+    """(hue degrees, saturation %, value %)."""
+    h, s, v = colorsys.rgb_to_hsv(r/255.0, g/255.0, b/255.0)
+    return h * 360, s * 100, v * 100
+
+
+def rgb_to_hsl_values(r, g, b):
+    """(hue degrees, saturation %, lightness %)."""
+    h, l, s = colorsys.rgb_to_hls(r/255.0, g/255.0, b/255.0)
+    return h * 360, s * 100, l * 100
+
+
+def format_hue_triplet(h, s, x):
+    return "{:.0f}°, {:.0f}%, {:.0f}%".format(h, s, x)
+
+
 def rgb_to_hsv_str(r, g, b):
-    r, g, b = r/255.0, g/255.0, b/255.0
-    h, s, v = colorsys.rgb_to_hsv(r, g, b)
-    return "{:.0f}°, {:.0f}%, {:.0f}%".format(h * 360, s * 100, v * 100)
+    return format_hue_triplet(*rgb_to_hsv_values(r, g, b))
 
 
 def rgb_to_hsl_str(r, g, b):
-    r, g, b = r/255.0, g/255.0, b/255.0
-    h, l, s = colorsys.rgb_to_hls(r, g, b)
-    return "{:.0f}°, {:.0f}%, {:.0f}%".format(h * 360, s * 100, l * 100)
+    return format_hue_triplet(*rgb_to_hsl_values(r, g, b))
 
 
 def scientific_color_data(r, g, b):
@@ -30,3 +42,26 @@ def scientific_color_data(r, g, b):
         "hsv": rgb_to_hsv_str(r, g, b),
         "hsl": rgb_to_hsl_str(r, g, b),
     }
+
+
+def scientific_color_columns(r, g, b):
+    """RunResult column values for a scientific-mode color (numbers only; strings are made at render)."""
+    hsv = rgb_to_hsv_values(r, g, b)
+    hsl = rgb_to_hsl_values(r, g, b)
+    return {
+        "rgb_r": int(r), "rgb_g": int(g), "rgb_b": int(b),
+        "hsv_h": hsv[0], "hsv_s": hsv[1], "hsv_v": hsv[2],
+        "hsl_h": hsl[0], "hsl_s": hsl[1], "hsl_l": hsl[2],
+    }
+
+
+def color_data_from_result(rr):
+    """Display dict (as scientific_color_data) from a RunResult's color columns, or None if it has none."""
+    if rr.rgb_r is None:
+        return None
+    return {
+        "rgb": [rr.rgb_r, rr.rgb_g, rr.rgb_b],
+        "hex": rgb_to_hex(rr.rgb_r, rr.rgb_g, rr.rgb_b),
+        "hsv": format_hue_triplet(rr.hsv_h, rr.hsv_s, rr.hsv_v),
+        "hsl": format_hue_triplet(rr.hsl_h, rr.hsl_s, rr.hsl_l),
+    }
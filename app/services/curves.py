@@ -0,0 +1,191 @@
+"""Calibration curve models compiled into dense rgb_sum lookup tables (no Flask/db).
+
+A curve maps an integer rgb_sum (0-765) to a concentration and a band level.
+compile_curve() fits the selected model once and tabulates both for every
+possible rgb_sum, so evaluating a reading is a single array index.
+All models clamp to the calibrated rgb_sum range (no extrapolation), as
+interpolate_concentration() always has.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from app.services.analysis_engine import interpolate_concentration, classify_concentration
+
+RGB_SUM_MAX = 765
+CURVE_MODELS = ('linear', 'monotone', 'polynomial', 'log-logistic')
+DEFAULT_CURVE_MODEL = 'linear'
+LEVELS = ('Low', 'Medium', 'High', 'Out of range')
+_RGB_GRID = np.arange(RGB_SUM_MAX + 1, dtype=np.float64)
+
+
+class CompiledCurve:
+    """Lookup tables for one pesticide: concentration and level index per integer rgb_sum."""
+
+    __slots__ = ('model', 'fitted_model', 'concentrations', 'level_codes')
+
+    def __init__(self, model, fitted_model, concentrations, level_codes):
+        self.model = model
+        self.fitted_model = fitted_model  # differs from model when the fit fell back to 'linear'
+        self.concentrations = concentrations
+        self.level_codes = level_codes
+        self.concentrations.flags.writeable = False
+        self.level_codes.flags.writeable = False
+
+    @staticmethod
+    def _index(rgb_sums):
+        return np.clip(np.rint(np.asarray(rgb_sums, dtype=np.float64)), 0, RGB_SUM_MAX).astype(np.intp)
+
+    def evaluate(self, rgb_sum):
+        """Return (concentration, level) for one reading."""
+        i = int(self._index(rgb_sum))
+        return float(self.concentrations[i]), LEVELS[self.level_codes[i]]
+
+    def evaluate_many(self, rgb_sums):
+        """Vectorized: return (concentrations float64 array, level codes uint8 array); see LEVELS."""
+        idx = self._index(rgb_sums)
+        return self.concentrations[idx], self.level_codes[idx]
+
+    @staticmethod
+    def level_names(codes):
+        return [LEVELS[c] for c in np.asarray(codes).ravel()]
+
+
+def _linear_table(points):
+    return np.array([interpolate_concentration(points, v) for v in range(RGB_SUM_MAX + 1)], dtype=np.float64)
+
+
+def _calibrated(points):
+    """Points as ascending-rgb arrays (x = rgb_sum, y = concentration)."""
+    pts = sorted(points, key=lambda p: p['rgb_sum'])
+    x = np.array([float(p['rgb_sum']) for p in pts])
+    y = np.array([float(p['concentration']) for p in pts])
+    if len(x) < 2 or np.any(np.diff(x) <= 0):
+        raise ValueError('curve needs at least 2 points with distinct rgb_sum values')
+    return x, y
+
+
+def _monotone_table(points):
+    """Fritsch-Carlson monotone cubic (PCHIP) through the points."""
+    x, y = _calibrated(points)
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    m = np.zeros_like(y)
+    m[0], m[-1] = delta[0], delta[-1]
+    for k in range(1, len(x) - 1):
+        if delta[k - 1] * delta[k] > 0:
+            w1 = 2 * h[k] + h[k - 1]
+            w2 = h[k] + 2 * h[k - 1]
+            m[k] = (w1 + w2) / (w1 / delta[k - 1] + w2 / delta[k])
+    xs = np.clip(_RGB_GRID, x[0], x[-1])
+    seg = np.clip(np.searchsorted(x, xs, side='right') - 1, 0, len(x) - 2)
+    t = (xs - x[seg]) / h[seg]
+    h00 = (1 + 2 * t) * (1 - t) ** 2
+    h10 = t * (1 - t) ** 2
+    h01 = t * t * (3 - 2 * t)
+    h11 = t * t * (t - 1)
+    table = h00 * y[seg] + h10 * h[seg] * m[seg] + h01 * y[seg + 1] + h11 * h[seg] * m[seg + 1]
+    return np.clip(table, y.min(), y.max())
+
+
+def _polynomial_table(points, degree=2):
+    """Least-squares polynomial concentration(rgb_sum), degree capped by the number of points."""
+    x, y = _calibrated(points)
+    poly = np.polynomial.Polynomial.fit(x, y, deg=min(degree, len(x) - 1))
+    return np.clip(poly(np.clip(_RGB_GRID, x[0], x[-1])), y.min(), y.max())
+
+
+def _four_pl(c, a, d, log_c50, log_b):
+    return d + (a - d) / (1.0 + (c / np.exp(log_c50)) ** np.exp(log_b))
+
+
+def _log_logistic_table(points, iterations=200):
+    """
+    Four-parameter log-logistic fit rgb = d + (a - d) / (1 + (conc / c50)^b), by Levenberg-Marquardt,
+    then inverted for concentration. Needs at least 4 points.
+    """
+    x, y = _calibrated(points)
+    if len(x) < 4:
+        raise ValueError('log-logistic fit needs at least 4 points')
+    conc, rgb = y, x
+    positive = conc[conc > 0]
+    params = np.array([rgb.max(), rgb.min(), np.log(np.median(positive) if len(positive) else 1.0), 0.0])
+    lam = 1e-2
+
+    def residuals(p):
+        return _four_pl(conc, *p) - rgb
+
+    r = residuals(params)
+    cost = float(r @ r)
+    for _ in range(iterations):
+        jac = np.empty((len(conc), 4))
+        for j in range(4):
+            step = np.zeros(4)
+            step[j] = 1e-6 * max(1.0, abs(params[j]))
+            jac[:, j] = (residuals(params + step) - r) / step[j]
+        jtj = jac.T @ jac
+        try:
+            delta = np.linalg.solve(jtj + lam * np.diag(np.diag(jtj) + 1e-12), -jac.T @ r)
+        except np.linalg.LinAlgError:
+            break
+        trial = params + delta
+        r_trial = residuals(trial)
+        trial_cost = float(r_trial @ r_trial)
+        if np.isfinite(trial_cost) and trial_cost < cost:
+            params, r, lam = trial, r_trial, lam / 3
+            improvement, cost = cost - trial_cost, trial_cost
+            if improvement < 1e-12 * max(cost, 1.0):
+                break
+        else:
+            lam *= 4
+    a, d, log_c50, log_b = params
+    if not (np.all(np.isfinite(params)) and a > d):
+        raise ValueError('log-logistic fit did not converge to a decreasing curve')
+    lo, hi = max(x[0], d + 1e-9), min(x[-1], a - 1e-9)
+    rgb_grid = np.clip(_RGB_GRID, lo, hi)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        table = np.exp(log_c50) * np.maximum((a - d) / (rgb_grid - d) - 1.0, 0.0) ** (1.0 / np.exp(log_b))
+    table = np.clip(np.nan_to_num(table, nan=y.min(), posinf=y.max()), y.min(), y.max())
+    return table
+
+
+_FITTERS = {
+    'linear': _linear_table,
+    'monotone': _monotone_table,
+    'polynomial': _polynomial_table,
+    'log-logistic': _log_logistic_table,
+}
+
+
+def _level_codes(bands, concentrations):
+    return np.array([LEVELS.index(classify_concentration(bands, c)) for c in concentrations], dtype=np.uint8)
+
+
+@lru_cache(maxsize=512)
+def _compile(model, points_key, bands_key):
+    points = [{'concentration': c, 'rgb_sum': r} for c, r in points_key]
+    bands = {band: {'min': lo, 'max': hi} for band, lo, hi in bands_key}
+    fitted = model
+    if not points:
+        table = np.zeros(RGB_SUM_MAX + 1, dtype=np.float64)
+    else:
+        try:
+            table = _FITTERS[model](points)
+        except (ValueError, np.linalg.LinAlgError):
+            fitted = 'linear'
+            table = _linear_table(points)
+    return CompiledCurve(model, fitted, table, _level_codes(bands, table))
+
+
+def compile_curve(points, bands=None, model=DEFAULT_CURVE_MODEL):
+    """
+    points: list of {'concentration', 'rgb_sum'} (in seq_index order); bands: {'low': {'min','max'}, ...}.
+    Results are cached on the curve's content, so editing points or bands yields a fresh table.
+    """
+    if model not in _FITTERS:
+        model = DEFAULT_CURVE_MODEL
+    points_key = tuple((float(p['concentration']), p['rgb_sum']) for p in points)
+    bands_key = tuple(sorted(
+        (band, b.get('min'), b.get('max')) for band, b in (bands or {}).items() if b
+    ))
+    return _compile(model, points_key, bands_key)
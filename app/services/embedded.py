@@ -0,0 +1,165 @@
+"""In-process analysis of raw frames for instrument controllers and camera drivers (no Flask/db, no files).
+
+    from app.services import FrameAnalyzer, compile_curve, load_profile_curves
+
+    keys, curves = load_profile_curves(exported_profile_json)   # or [compile_curve(points, bands, model), ...]
+    analyzer = FrameAnalyzer(curves, scheme='box-9x9', normalize=True, keys=keys)
+    result = analyzer.analyze(frame_buffer, width=1920, height=1080, channels='BGRA')
+    result.concentrations, result.level_codes                    # one entry per point
+
+A frame is an (H, W, C) uint8 array, any buffer of packed 8-bit pixels (memoryview, bytes,
+bytearray, mmap) with its width and height (and row stride, if rows are padded), or encoded
+JPEG/PNG bytes. Arrays and packed buffers are read through a NumPy view: dropping alpha and
+reordering BGR are slices, so a frame is never copied; only encoded bytes are decoded.
+Sampling goes through SamplingPlan, like every other analysis path, and reads only the band
+of the frame around the points. Results are arrays. They match AnalysisPipeline on the same
+pixels (flask --app main bench-embedded checks this), except that concentrations are not
+rounded to 2 decimals as stored runs are.
+"""
+import io
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from app.services.curves import CompiledCurve, compile_curve
+from app.services.sampling import DEFAULT_SCHEME, parse_sampling_scheme, rgb_pixels
+from app.services.sampling_plan import SamplingPlan
+
+CHANNEL_ORDERS = ('RGB', 'BGR', 'RGBA', 'BGRA', 'RGBX', 'BGRX')
+
+
+def frame_pixels(frame, width=None, height=None, channels='RGB', stride=None):
+    """
+    (H, W, 3) RGB view of a frame. Packed buffers need width and height; stride is the bytes
+    per row when rows are padded. A buffer without a shape is decoded as an encoded image.
+    Raises ValueError for a frame that does not match its description.
+    """
+    if channels not in CHANNEL_ORDERS:
+        raise ValueError(f"Unknown channel order {channels!r}; expected one of {', '.join(CHANNEL_ORDERS)}.")
+    if isinstance(frame, Image.Image):
+        return rgb_pixels(frame)
+    depth = len(channels)
+    if isinstance(frame, np.ndarray):
+        pixels = frame
+    else:
+        view = memoryview(frame)
+        if view.ndim == 3:
+            pixels = np.asarray(view)
+        elif width and height:
+            row = stride or width * depth
+            if row < width * depth or view.nbytes < row * (height - 1) + width * depth:
+                raise ValueError(f"A {width}x{height} {channels} frame needs {row * (height - 1) + width * depth} bytes "
+                                 f"with a {row}-byte stride; got {view.nbytes}.")
+            flat = np.frombuffer(view, dtype=np.uint8, count=min(view.nbytes, row * height))
+            pixels = np.lib.stride_tricks.as_strided(flat, (height, width, depth), (row, depth, 1), writeable=False)
+        else:
+            try:
+                with Image.open(io.BytesIO(view)) as im:
+                    return np.asarray(im.convert('RGB'))
+            except OSError as exc:
+                raise ValueError(f"Not a decodable image: {exc}") from exc
+    if pixels.dtype != np.uint8 or pixels.ndim != 3 or pixels.shape[2] != depth:
+        raise ValueError(f"Expected an (H, W, {depth}) uint8 {channels} frame; got {pixels.dtype} {pixels.shape}.")
+    return pixels[:, :, 2::-1] if channels.startswith('B') else pixels[:, :, :3]
+
+
+def load_profile_curves(export):
+    """
+    (keys, curves) of a profile export's active cases in analysis order (order_index), compiled
+    the way the web app compiles them. export is the JSON text, bytes or parsed dict of
+    /profiles/<id>/export. Raises ValueError for a malformed export.
+    """
+    try:
+        data = json.loads(export) if isinstance(export, (str, bytes, bytearray)) else export
+        cases = [p for p in data['profile']['pesticides'] if p.get('active', True)]
+        cases.sort(key=lambda p: int(p.get('order_index', 0)))
+        keys = tuple(p['key'] for p in cases)
+        curves = [compile_curve([{'concentration': float(pt['concentration']), 'rgb_sum': int(pt['rgb_sum'])} for pt in p.get('points', [])],
+                                p.get('thresholds'), p.get('curve_model') or 'linear') for p in cases]
+    except (KeyError, TypeError, ValueError, AttributeError) as exc:
+        raise ValueError(f"Not a profile export: {exc}") from exc
+    return keys, curves
+
+
+@dataclass
+class FrameResult:
+    """One analyzed frame; every array has one entry per point, in the analyzer's point order."""
+    width: int
+    height: int
+    xs: np.ndarray  # int64 pixel coordinates sampled
+    ys: np.ndarray
+    rgb_sums: np.ndarray  # int64, after normalization
+    means: np.ndarray  # raw per-channel means, shape (N, 3)
+    background: Optional[np.ndarray]  # raw background patch mean (r, g, b)
+    used_normalization: bool
+    concentrations: np.ndarray  # float64, not rounded
+    level_codes: np.ndarray  # uint8 indexes into LEVELS
+    keys: Optional[tuple] = None
+
+    def levels(self):
+        return CompiledCurve.level_names(self.level_codes)
+
+
+class FrameAnalyzer:
+    """
+    Read frames at fixed or auto-placed points, point i against curves[i] (or one curve for every
+    point). Built once and reused for every frame: the kernel, the curve groups and the placement
+    per frame size are resolved ahead; it keeps no per-frame state, so threads can share it.
+    points is an (N, 2) array of frame (x, y), kept in the given order and clamped to the frame;
+    without it, len(curves) points are auto-placed as the analysis form places them.
+    Raises ValueError for an unknown scheme or a points/curves count mismatch.
+    """
+
+    def __init__(self, curves, points=None, scheme=DEFAULT_SCHEME, normalize=False, keys=None):
+        curves = [curves] if isinstance(curves, CompiledCurve) else list(curves)
+        if points is not None:
+            points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            if len(curves) == 1:
+                curves = curves * len(points)
+            elif len(curves) != len(points):
+                raise ValueError(f"{len(points)} points need one curve each (or a single curve); got {len(curves)}.")
+        if not curves:
+            raise ValueError("At least one curve is needed.")
+        if keys is not None and len(keys) != len(curves):
+            raise ValueError(f"{len(curves)} points need one key each; got {len(keys)}.")
+        kernel = parse_sampling_scheme(scheme)
+        self.plan = SamplingPlan(kernel.scheme, bool(normalize), len(curves))
+        self.points = points
+        self.keys = tuple(keys) if keys is not None else None
+        groups = {}
+        for i, curve in enumerate(curves):
+            groups.setdefault(id(curve), (curve, []))[1].append(i)
+        self._groups = [(curve, np.array(idx, dtype=np.intp)) for curve, idx in groups.values()]
+        self._placed = {}
+
+    @property
+    def sampling_scheme(self):
+        return self.plan.scheme
+
+    def place(self, width, height):
+        """(xs, ys) int64 arrays of the points on a width×height frame."""
+        placed = self._placed.get((width, height))
+        if placed is None:
+            if self.points is None:
+                xs, ys = self.plan.place(width, height)
+            else:
+                xs = np.clip(self.points[:, 0].astype(np.int64), 0, width - 1)
+                ys = np.clip(self.points[:, 1].astype(np.int64), 0, height - 1)
+            placed = self._placed[(width, height)] = (np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64))
+        return placed
+
+    def analyze(self, frame, width=None, height=None, channels='RGB', stride=None):
+        """Sample and evaluate one frame (see frame_pixels for what a frame may be); returns a FrameResult."""
+        pixels = frame_pixels(frame, width, height, channels, stride)
+        height, width = pixels.shape[:2]
+        bg, offsets, used = self.plan.background(pixels)
+        xs, ys = self.place(width, height)
+        totals, means = self.plan.sample(pixels, xs, ys, offsets)
+        concentrations = np.empty(len(totals), dtype=np.float64)
+        codes = np.empty(len(totals), dtype=np.uint8)
+        for curve, idx in self._groups:
+            concentrations[idx], codes[idx] = curve.evaluate_many(totals[idx])
+        return FrameResult(width, height, xs, ys, totals, means, bg, used, concentrations, codes, self.keys)
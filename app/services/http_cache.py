@@ -0,0 +1,63 @@
+"""Strong ETags and If-None-Match handling for pages and exports that change only with a known version.
+
+The ETag is a hash of whatever the response depends on (run revision and name, profile
+fingerprint, ...). Rendered pages also include render_epoch(), a hash of the templates and
+the asset manifest, so a deploy that changes a page never revalidates a stale copy while
+every worker and restart of the same build agrees on the tag; JSON exports leave it out.
+Routes check `not_modified(tag)` before loading anything else and return its 304 when the
+client's copy is current; compress_response appends '-gzip' to the tag of gzipped bodies,
+so both variants are accepted here.
+"""
+import hashlib
+import json
+import os
+
+from flask import current_app, make_response, request, session
+
+from app.services.static_assets import load_manifest
+
+
+def render_epoch():
+    """Hash of every template and the asset manifest; computed once per app (every time in debug)."""
+    epoch = current_app.extensions.get('render_epoch')
+    if epoch is None or current_app.debug:
+        h = hashlib.sha1(json.dumps(load_manifest(current_app.config['PROJECT_ROOT']), sort_keys=True).encode())
+        root = os.path.join(current_app.root_path, current_app.template_folder)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for fname in sorted(filenames):
+                path = os.path.join(dirpath, fname)
+                h.update(os.path.relpath(path, root).encode())
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+        epoch = current_app.extensions['render_epoch'] = h.hexdigest()[:12]
+    return epoch
+
+
+def etag_for(*parts):
+    """Strong ETag value for the given version parts (add render_epoch() for rendered pages)."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+
+
+def not_modified(tag):
+    """
+    A 304 response if the request's If-None-Match matches tag (or its gzip variant), else None.
+    Pages with pending flash messages are always rendered so the message is not held back.
+    """
+    if not request.if_none_match or session.get('_flashes'):
+        return None
+    for candidate in (tag, tag + '-gzip'):
+        if request.if_none_match.contains(candidate):
+            response = make_response('', 304)
+            response.set_etag(candidate)
+            response.cache_control.no_cache = True
+            return response
+    return None
+
+
+def with_etag(response, tag):
+    """Attach tag to a full response; clients must revalidate (no-cache) before reusing it."""
+    response = make_response(response)
+    response.set_etag(tag)
+    response.cache_control.no_cache = True
+    return response
@@ -6,16 +6,36 @@ from PIL import Image
 import numpy as np
 
 
+_created_dirs = set()
+BLACK_THRESHOLD = 5  # background patch means at or below this on every channel count as black
+
+
+def makedirs_once(path):
+    """os.makedirs(path, exist_ok=True), skipped for directories already created by this process."""
+    key = os.path.abspath(path)  # upload paths are relative to the working directory, which benches change
+    if key not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(key)
+    return path
+
+
 def ensure_upload_dir():
     now = datetime.utcnow()
     subdir = now.strftime("%Y%m")
     full = os.path.join('static', 'uploads', subdir)
-    os.makedirs(full, exist_ok=True)
+    makedirs_once(full)
     return full, subdir
 
 
-def compute_background_offsets(image: Image.Image, point_xy=None, patch_size=9, black_threshold=5):
-    """Return per-channel mean of a corner patch; if 'black', return (0,0,0)."""
+def auto_points(width, height, n):
+    """(xs, y) of n auto-placed sample points: evenly spaced in one row, about 1/2.65 of the way down."""
+    y = height // 2.65  # preset points 1/4 from top (tuned up from center)
+    xs = [int(round((i + 1) * (width / (n + 1)))) for i in range(n)]
+    return xs, y
+
+
+def background_patch_mean(image: Image.Image, point_xy=None, patch_size=9):
+    """Per-channel mean (float32) of the background patch; top-left corner patch by default."""
     img = image.convert('RGB')
     width, height = img.size
     half = patch_size // 2
@@ -29,7 +49,12 @@ def compute_background_offsets(image: Image.Image, point_xy=None, patch_size=9,
     bottom = min(height, cy + half + 1)
     patch = img.crop((left, top, right, bottom))
     arr = np.asarray(patch, dtype=np.float32)
-    mean_vals = arr.reshape(-1, 3).mean(axis=0)
+    return arr.reshape(-1, 3).mean(axis=0)
+
+
+def compute_background_offsets(image: Image.Image, point_xy=None, patch_size=9, black_threshold=BLACK_THRESHOLD):
+    """Return per-channel mean of a corner patch; if 'black', return (0,0,0)."""
+    mean_vals = background_patch_mean(image, point_xy, patch_size)
     if (mean_vals <= black_threshold).all():
         return np.array([0.0, 0.0, 0.0], dtype=np.float32), False
     return mean_vals, True
@@ -0,0 +1,111 @@
+"""Plate and multi-row strip layouts: a rows x columns grid of sampling points per image.
+
+Origin (centre of well A1) and pitch are fractions of the image width/height, so one
+layout fits photos of any resolution. Wells are labelled row-major A1, A2, ... B1, ...
+and assigned to the profile's active cases by column or by row, cycling when there are
+more columns (rows) than cases.
+"""
+import re
+
+import numpy as np
+
+LAYOUT_PRESETS = {
+    '24-well plate': (4, 6),
+    '48-well plate': (6, 8),
+    '96-well plate': (8, 12),
+    '3-row strip holder': (3, 10),
+}
+ASSIGN_BY = ('column', 'row')
+MAX_WELLS = 384
+GRID_SPAN = 0.8  # default geometry spreads the wells over the middle 80% of the image
+_WELL_RE = re.compile(r'^([A-Z]+)(\d+)$')
+
+
+def row_label(row):
+    """0 -> 'A', 25 -> 'Z', 26 -> 'AA'."""
+    label = ''
+    row += 1
+    while row:
+        row, rem = divmod(row - 1, 26)
+        label = chr(ord('A') + rem) + label
+    return label
+
+
+def well_label(row, column):
+    return f'{row_label(row)}{column + 1}'
+
+
+def parse_well(label):
+    """'B12' -> (1, 11); None if label is not a well label."""
+    m = _WELL_RE.match(label or '')
+    if not m:
+        return None
+    row = 0
+    for ch in m.group(1):
+        row = row * 26 + (ord(ch) - ord('A') + 1)
+    return row - 1, int(m.group(2)) - 1
+
+
+def default_geometry(rows, columns):
+    """Origin/pitch fractions that spread rows x columns wells evenly over GRID_SPAN of the image."""
+    def axis(n):
+        if n <= 1:
+            return 0.5, 0.0
+        return (1.0 - GRID_SPAN) / 2, GRID_SPAN / (n - 1)
+    origin_x, pitch_x = axis(columns)
+    origin_y, pitch_y = axis(rows)
+    return {'origin_x': origin_x, 'origin_y': origin_y, 'pitch_x': pitch_x, 'pitch_y': pitch_y}
+
+
+def validate_layout(fields):
+    """
+    fields: dict with rows, columns (int), origin_x/origin_y/pitch_x/pitch_y (fractions), assign_by.
+    Enforce: at least one well, at most MAX_WELLS; every well centre inside the image.
+    """
+    rows, columns = fields['rows'], fields['columns']
+    if rows < 1 or columns < 1:
+        return False, "Rows and columns must be at least 1."
+    if rows * columns > MAX_WELLS:
+        return False, f"At most {MAX_WELLS} wells per layout."
+    if fields['assign_by'] not in ASSIGN_BY:
+        return False, "Assign cases by column or by row."
+    for origin, pitch, n in ((fields['origin_x'], fields['pitch_x'], columns), (fields['origin_y'], fields['pitch_y'], rows)):
+        last = origin + pitch * (n - 1)
+        if not (0.0 <= origin <= 1.0 and 0.0 <= last <= 1.0):
+            return False, "All wells must lie inside the image (origin and pitch are fractions of its size)."
+    return True, ""
+
+
+def layout_grid(layout, width, height):
+    """Well centres as (xs, ys) integer pixel arrays in row-major order, clipped to the image."""
+    row, col = np.divmod(np.arange(layout.rows * layout.columns), layout.columns)
+    xs = np.clip(np.rint((layout.origin_x + col * layout.pitch_x) * width), 0, width - 1).astype(np.int64)
+    ys = np.clip(np.rint((layout.origin_y + row * layout.pitch_y) * height), 0, height - 1).astype(np.int64)
+    return xs, ys
+
+
+def layout_wells(layout, pesticides):
+    """[(well label, pesticide or None)] in row-major order; None for every well when there are no cases."""
+    wells = []
+    for row in range(layout.rows):
+        for col in range(layout.columns):
+            index = col if layout.assign_by == 'column' else row
+            wells.append((well_label(row, col), pesticides[index % len(pesticides)] if pesticides else None))
+    return wells
+
+
+def plate_grid(results):
+    """
+    Results arranged as plate rows for display: (column count, [(row label, [result or None, ...])]).
+    results: dicts with a 'well' key; ones without a parsable well label are left out.
+    """
+    placed = {}
+    for r in results:
+        pos = parse_well(r.get('well'))
+        if pos:
+            placed[pos] = r
+    if not placed:
+        return 0, []
+    rows = max(p[0] for p in placed) + 1
+    columns = max(p[1] for p in placed) + 1
+    return columns, [(row_label(i), [placed.get((i, j)) for j in range(columns)]) for i in range(rows)]
@@ -0,0 +1,217 @@
+"""The analysis pipeline shared by the analysis form, the point editor, profile comparison and batch analysis.
+
+Stages, each timed:
+  decode     image file -> RGB image (any upload tier)
+  normalize  background patch mean (stored on the run) and, if asked, the per-channel offsets
+  place      sample points: auto-placed row, plate layout grid, or the operator's points
+  sample     one vectorized ImageSampler pass over every point
+  evaluate   compiled-curve lookup per case (interpolate + classify), or scientific colour data
+  persist    one Run and its RunResult rows through persist_run (one bulk insert)
+
+SamplingPlan (sampling_plan.py) holds the image-only stages (no Flask/db) and pickles, so
+worker processes and FrameAnalyzer can run them; AnalysisPipeline adds the profile's cases
+and curves, resolved once and reused for every image it analyzes. Timings accumulate in
+pipeline.timings (seconds per stage) and on_stage(stage, seconds) is called as each stage
+finishes.
+
+For a client-cropped upload (roi, a RoiGeometry) sampling happens in the uploaded image while
+auto and layout points are placed in, and stored pixels are mapped back to, the original frame.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from app.services.color_utils import scientific_color_columns, scientific_color_data
+from app.services.curves import LEVELS
+from app.services.layouts import layout_wells
+from app.services.profile_service import compiled_curve_for, get_active_pesticides
+from app.services.run_writer import persist_run
+from app.services.sampling import DEFAULT_SCHEME, SamplingKernel, parse_sampling_scheme
+from app.services.sampling_plan import Grid, Measurement, SamplingPlan, timed_stage  # noqa: F401 - re-exported
+from app.services.upload_lifecycle import open_upload_image
+from app.services.upload_store import is_upload_path
+
+STAGES = ('decode', 'normalize', 'place', 'sample', 'evaluate', 'persist')
+SCIENTIFIC_POINTS = 5
+MAX_AUTO_POINTS = 10
+
+
+def server_timing(timings):
+    """Server-Timing header value for stage timings (milliseconds)."""
+    return ', '.join(f"{name};dur={timings[name] * 1000:.1f}" for name in STAGES if name in timings)
+
+
+@dataclass
+class AnalysisResult:
+    """One analyzed image: the readings shown on the page and the RunResult rows stored for them."""
+    image_path: str
+    mode: str
+    sampling_scheme: str
+    layout_name: Optional[str]
+    measurement: Measurement
+    readings: list  # dicts rendered by analysis.html
+    rows: list  # RunResult column dicts (without run_id)
+    run_id: Optional[int] = None
+
+    @property
+    def width(self):
+        return self.measurement.width
+
+    @property
+    def height(self):
+        return self.measurement.height
+
+    def points(self, named=False):
+        """[{'x', 'y'}] of the evaluated points, with the reading's name when named."""
+        if named:
+            return [{"x": r["x"], "y": r["y"], "name": r["pesticide_name"]} for r in self.readings]
+        return [{"x": r["x"], "y": r["y"]} for r in self.readings]
+
+
+def decode_image(source):
+    """RGB image from an upload path (any tier), another file path or an open image; None if unreadable."""
+    if isinstance(source, Image.Image):
+        return source if source.mode == 'RGB' else source.convert('RGB')
+    if is_upload_path(source):
+        return open_upload_image(source)
+    try:
+        with Image.open(source) as im:
+            return im.convert('RGB')
+    except OSError:
+        return None
+
+
+class AnalysisPipeline:
+    """
+    Analyze images against a profile in one mode. Built once per request or batch: the active
+    cases, well assignment and compiled curves are looked up here, not per image.
+    Raises ValueError for a layout on a profile with no active cases (outside scientific mode).
+    """
+
+    def __init__(self, profile, mode, scheme=DEFAULT_SCHEME, normalize=False, layout=None, cases=None, on_stage=None):
+        self.profile = profile
+        self.mode = mode
+        self.scientific = (mode == 'scientific')
+        self.layout = layout
+        self.cases = [] if self.scientific else list(get_active_pesticides(profile.id) if cases is None else cases)
+        kernel = scheme if isinstance(scheme, SamplingKernel) else parse_sampling_scheme(scheme)
+        self.wells = None
+        grid = None
+        if layout is not None:
+            if not self.scientific and not self.cases:
+                raise ValueError("The profile has no active cases to read the wells against.")
+            self.wells = layout_wells(layout, self.cases)
+            self.labels = [(well, well, well, None) if self.scientific else (pest.key, f"{well} · {pest.display_name}", well, pest)
+                           for well, pest in self.wells]
+            n, max_points, grid = len(self.wells), None, Grid.from_layout(layout)
+        elif self.scientific:
+            self.labels = [(f"point_{i + 1}", f"Point {i + 1}", None, None) for i in range(SCIENTIFIC_POINTS)]
+            n = max_points = SCIENTIFIC_POINTS
+        else:
+            self.labels = [(pest.key, pest.display_name, None, pest) for pest in self.cases]
+            n, max_points = max(1, min(MAX_AUTO_POINTS, len(self.cases))), len(self.cases)
+        self.plan = SamplingPlan(kernel.scheme, bool(normalize) and not self.scientific, n, max_points, grid)
+        self.on_stage = on_stage
+        self.timings = {}
+        self._curves = {}
+
+    @property
+    def sampling_scheme(self):
+        return self.plan.scheme
+
+    def decode(self, source):
+        with timed_stage(self.timings, 'decode', self.on_stage):
+            return decode_image(source)
+
+    def measure(self, img, points=None, roi=None):
+        return self.plan.measure(img, points, self.timings, self.on_stage, roi)
+
+    def _curve(self, pest):
+        curve = self._curves.get(pest.id)
+        if curve is None:
+            curve = self._curves[pest.id] = compiled_curve_for(pest)
+        return curve
+
+    def evaluate(self, m):
+        """
+        (readings, rows) for a Measurement; points beyond the labelled ones are dropped.
+        Readings keep uploaded-image coordinates (drawn over it); rows store frame coordinates.
+        """
+        with timed_stage(self.timings, 'evaluate', self.on_stage):
+            labels = self.labels[:len(m.xs)]
+            frame = m.frame_points()
+            readings, rows = [], []
+            if self.scientific:
+                for (key, name, well, _pest), x, y, (fx, fy), mean in zip(labels, m.xs, m.ys, frame, m.means):
+                    r, g, b = (int(round(v)) for v in mean)
+                    readings.append({"pesticide_key": key, "pesticide_name": name, "x": x, "y": y, "rgb_sum": r + g + b,
+                                     "concentration": 0, "level": "—", "scientific_data": scientific_color_data(r, g, b)})
+                    rows.append(dict(pesticide_key=key, pixel_x=fx, pixel_y=fy, rgb_sum=r + g + b, concentration=0.0, level="—",
+                                     **scientific_color_columns(r, g, b)))
+            else:
+                totals = np.asarray(m.totals)[:len(labels)]
+                concentrations = np.zeros(len(labels))
+                codes = np.zeros(len(labels), dtype=np.int64)
+                groups = {}
+                for i, (_key, _name, _well, pest) in enumerate(labels):
+                    groups.setdefault(pest.id, (pest, []))[1].append(i)
+                for pest, idx in groups.values():
+                    concentrations[idx], codes[idx] = self._curve(pest).evaluate_many(totals[idx])
+                for (key, name, _well, _pest), x, y, (fx, fy), total, conc, code in zip(labels, m.xs, m.ys, frame, totals,
+                                                                                       concentrations, codes):
+                    concentration = round(float(conc), 2)
+                    readings.append({"pesticide_key": key, "pesticide_name": name, "x": x, "y": y, "rgb_sum": int(total),
+                                     "concentration": concentration, "level": LEVELS[code]})
+                    rows.append(dict(pesticide_key=key, pixel_x=fx, pixel_y=fy, rgb_sum=int(total), concentration=concentration,
+                                     level=LEVELS[code]))
+            for (_key, _name, well, _pest), reading, row, mean in zip(labels, readings, rows, m.means):
+                row.update(raw_r=float(mean[0]), raw_g=float(mean[1]), raw_b=float(mean[2]))
+                if well is not None:
+                    reading["well"] = well
+                    row["well"] = well
+            return readings, rows
+
+    def run_fields(self, result, name=None):
+        """Run column dict for a result (image size in frame space; the crop geometry, if any, in roi)."""
+        m = result.measurement
+        width, height = m.roi.frame if m.roi is not None else (m.width, m.height)
+        bg = m.background or (None, None, None)
+        return dict(
+            profile_id=self.profile.id,
+            mode=self.mode,
+            name=name or f"Run {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')}",
+            image_path=result.image_path,
+            used_normalization=m.used_normalization,
+            background_point_x=0,
+            background_point_y=0,
+            sampling_scheme=result.sampling_scheme,
+            image_width=width,
+            image_height=height,
+            bg_r=bg[0], bg_g=bg[1], bg_b=bg[2],
+            layout=result.layout_name,
+            roi=m.roi.to_json() if m.roi is not None else None,
+        )
+
+    def persist(self, result, name=None):
+        """Store the result as one run; sets and returns result.run_id."""
+        with timed_stage(self.timings, 'persist', self.on_stage):
+            result.run_id = persist_run(self.run_fields(result, name), result.rows)
+        return result.run_id
+
+    def result(self, image_path, measurement):
+        readings, rows = self.evaluate(measurement)
+        return AnalysisResult(image_path, self.mode, self.plan.scheme, self.layout.name if self.layout is not None else None,
+                              measurement, readings, rows)
+
+    def analyze(self, img, image_path, points=None, persist=True, name=None, roi=None):
+        """
+        Measure, evaluate and (unless persist is False) store one decoded image; returns an AnalysisResult.
+        Raises ValueError if roi does not cover a sample point.
+        """
+        result = self.result(image_path, self.measure(img, points, roi))
+        if persist:
+            self.persist(result, name)
+        return result
@@ -0,0 +1,48 @@
+"""Evaluate one set of readings against several calibration profiles side by side.
+
+The image is sampled once (or a stored run's totals are reused); each profile then
+costs one vectorized table lookup per case. Readings are matched to a profile's
+cases by pesticide key; a profile without an active case of that key gets no cell.
+"""
+import numpy as np
+
+from app.models import CalibrationProfile, Pesticide
+from app.services.curves import LEVELS
+from app.services.profile_service import compiled_curve_for
+
+
+def compare_profiles(readings, profile_ids):
+    """
+    readings: list of {'pesticide_key', 'name', 'rgb_sum'}.
+    Returns (profiles, rows): the existing profiles in the requested order, and one row per
+    reading with 'cells' (per profile: {'concentration', 'level'} or None), 'spread'
+    (max - min concentration over the profiles that have the case) and 'levels_agree'.
+    """
+    found = {p.id: p for p in CalibrationProfile.query.filter(CalibrationProfile.id.in_(profile_ids)).all()}
+    profiles = [found[pid] for pid in dict.fromkeys(profile_ids) if pid in found]
+    cases = {}
+    for pest in Pesticide.query.filter(Pesticide.profile_id.in_(list(found)), Pesticide.active.is_(True)).all():
+        cases.setdefault((pest.profile_id, pest.key), pest)
+    totals = np.array([r['rgb_sum'] for r in readings], dtype=np.int64)
+    keys = np.array([r['pesticide_key'] for r in readings], dtype=object)
+    cells = [[None] * len(profiles) for _ in readings]
+    for col, prof in enumerate(profiles):
+        for key in set(keys.tolist()):
+            pest = cases.get((prof.id, key))
+            if pest is None:
+                continue
+            idx = np.flatnonzero(keys == key)
+            conc, codes = compiled_curve_for(pest).evaluate_many(totals[idx])
+            for i, c, code in zip(idx, conc, codes):
+                cells[i][col] = {'concentration': round(float(c), 2), 'level': LEVELS[code]}
+    rows = []
+    for reading, row_cells in zip(readings, cells):
+        present = [c for c in row_cells if c]
+        concs = [c['concentration'] for c in present]
+        rows.append(dict(
+            reading,
+            cells=row_cells,
+            spread=round(max(concs) - min(concs), 2) if concs else None,
+            levels_agree=len({c['level'] for c in present}) <= 1,
+        ))
+    return profiles, rows
@@ -1,5 +1,11 @@
 """Active profile, pesticides, and calibration validation."""
-from app.models import CalibrationProfile, Pesticide
+import hashlib
+
+from sqlalchemy import exists, or_, update
+
+from app.extensions import db
+from app.models import CalibrationProfile, Pesticide, CalibrationPoint, ThresholdBand, PlateLayout
+from app.services.curves import compile_curve
 
 
 def get_active_profile():
@@ -9,6 +15,24 @@ def get_active_profile():
     return prof
 
 
+def activate_profile(profile_id):
+    """
+    Make profile_id the only active profile with one UPDATE, so a concurrent activation or
+    get_active_profile() never sees zero or two active profiles. Only the rows that change are
+    written, and nothing changes if the profile does not exist. Commits; returns True if it exists.
+    """
+    target = CalibrationProfile.__table__.alias('target')
+    result = db.session.execute(
+        update(CalibrationProfile)
+        .where(or_(CalibrationProfile.is_active.is_(True), CalibrationProfile.id == profile_id))
+        .where(exists().where(target.c.id == profile_id))
+        .values(is_active=(CalibrationProfile.id == profile_id))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount > 0
+
+
 def validate_calibration_points(points):
     """
     points: list of dicts with keys 'concentration' (float), 'rgb_sum' (int)
@@ -31,3 +55,35 @@ def validate_calibration_points(points):
 def get_active_pesticides(profile_id):
     q = Pesticide.query.filter_by(profile_id=profile_id, active=True).order_by(Pesticide.order_index.asc()).all()
     return q
+
+
+def compiled_curve_for(pesticide):
+    """CompiledCurve (concentration + level lookup tables) for a pesticide's saved points and bands."""
+    points = [{"concentration": cp.concentration, "rgb_sum": cp.rgb_sum} for cp in sorted(pesticide.calibration_points, key=lambda c: c.seq_index)]
+    bands = {b.band: {"min": b.min_value, "max": b.max_value} for b in pesticide.threshold_bands}
+    return compile_curve(points, bands, pesticide.curve_model or 'linear')
+
+
+def profile_version(profile_id):
+    """
+    Fingerprint of everything that affects a profile's results: its cases (order, active flag,
+    curve model), calibration points, threshold bands and plate layouts (geometry and how wells
+    are assigned to cases). Any edit yields a new version.
+    """
+    pests = db.session.query(
+        Pesticide.id, Pesticide.key, Pesticide.display_name, Pesticide.order_index, Pesticide.active, Pesticide.curve_model
+    ).filter(Pesticide.profile_id == profile_id).order_by(Pesticide.id).all()
+    points = db.session.query(
+        CalibrationPoint.pesticide_id, CalibrationPoint.seq_index, CalibrationPoint.concentration, CalibrationPoint.rgb_sum
+    ).join(Pesticide, Pesticide.id == CalibrationPoint.pesticide_id).filter(Pesticide.profile_id == profile_id).order_by(
+        CalibrationPoint.pesticide_id, CalibrationPoint.seq_index, CalibrationPoint.id).all()
+    bands = db.session.query(
+        ThresholdBand.pesticide_id, ThresholdBand.band, ThresholdBand.min_value, ThresholdBand.max_value
+    ).join(Pesticide, Pesticide.id == ThresholdBand.pesticide_id).filter(Pesticide.profile_id == profile_id).order_by(
+        ThresholdBand.pesticide_id, ThresholdBand.band).all()
+    layouts = db.session.query(
+        PlateLayout.id, PlateLayout.rows, PlateLayout.columns, PlateLayout.origin_x, PlateLayout.origin_y,
+        PlateLayout.pitch_x, PlateLayout.pitch_y, PlateLayout.assign_by
+    ).filter(PlateLayout.profile_id == profile_id).order_by(PlateLayout.id).all()
+    content = repr(([tuple(r) for r in pests], [tuple(r) for r in points], [tuple(r) for r in bands], [tuple(r) for r in layouts]))
+    return hashlib.sha1(content.encode()).hexdigest()[:16]
@@ -0,0 +1,154 @@
+"""Opt-in profiling of single requests: cProfile plus tracemalloc peak, saved under instance/profiles/.
+
+The middleware is only installed when PROFILER_TOKEN is set. A request is profiled when it
+carries that token in the X-Profile header (or, discouraged because URLs end up in logs and
+browser history, the `_profile` query argument); any other request costs one environ lookup.
+The capture pages accept the token the same way, keep it in the session after the first
+visit, and are never profiled themselves. Profiled requests run one at a time (cProfile and
+tracemalloc are process-wide), so work from other threads during that window can show up in
+the profile.
+
+Each capture is NAME.pstats (load with `python -m pstats` or snakeviz) plus NAME.json with the
+request, status, wall time, allocation peak and the top functions by cumulative time.
+"""
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_ARG = '_profile'
+CAPTURES_PATH = '/settings/profiler'  # the capture list and downloads (settings blueprint)
+TOP_FUNCTIONS = 25
+
+
+def _slug(path):
+    return re.sub(r'[^A-Za-z0-9]+', '-', path).strip('-')[:60] or 'root'
+
+
+def _top_functions(stats, limit=TOP_FUNCTIONS):
+    rows = []
+    for (filename, line, func), (_cc, ncalls, tottime, cumtime, _callers) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({func})", 'calls': ncalls,
+                     'tottime_ms': round(tottime * 1000, 2), 'cumtime_ms': round(cumtime * 1000, 2)})
+    rows.sort(key=lambda r: r['cumtime_ms'], reverse=True)
+    return rows[:limit]
+
+
+class RequestProfiler:
+    """WSGI middleware that profiles requests presenting the token; keeps the newest `keep` captures."""
+
+    def __init__(self, wsgi_app, token, out_dir, keep=50):
+        self.wsgi_app = wsgi_app
+        self.token = token
+        self.out_dir = out_dir
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def authorized(self, supplied):
+        return bool(supplied) and hmac.compare_digest(str(supplied), self.token)
+
+    @staticmethod
+    def supplied_token(environ):
+        """The token a request presents: the X-Profile header, else the `_profile` query argument."""
+        supplied = environ.get(PROFILE_HEADER)
+        if supplied is None and PROFILE_ARG + '=' in environ.get('QUERY_STRING', ''):
+            supplied = dict(parse_qsl(environ['QUERY_STRING'])).get(PROFILE_ARG)
+        return supplied
+
+    def _requested(self, environ):
+        if environ.get('PATH_INFO', '').startswith(CAPTURES_PATH):
+            return False
+        return self.authorized(self.supplied_token(environ))
+
+    def __call__(self, environ, start_response):
+        if not self._requested(environ):
+            return self.wsgi_app(environ, start_response)
+        with self._lock:
+            return self._profiled(environ, start_response)
+
+    def _profiled(self, environ, start_response):
+        path = environ.get('PATH_INFO', '/')
+        name = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}-{environ.get('REQUEST_METHOD', 'GET')}-{_slug(path)}"
+        status = []
+
+        def capture_start(status_line, headers, exc_info=None):
+            status.append(status_line)
+            return start_response(status_line, list(headers) + [('X-Profile-Id', name)], exc_info)
+
+        tracemalloc.start()
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            body = self.wsgi_app(environ, capture_start)
+            try:
+                chunks = [b''.join(body)]  # the response is produced here for streamed bodies
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+        finally:
+            profile.disable()
+            wall = time.perf_counter() - start
+            _current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            query = [(k, v) for k, v in parse_qsl(environ.get('QUERY_STRING', '')) if k != PROFILE_ARG]
+            self._save(name, profile, {
+                'name': name,
+                'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+                'method': environ.get('REQUEST_METHOD', 'GET'),
+                'path': path,
+                'query': urlencode(query),
+                'status': status[0] if status else None,
+                'wall_ms': round(wall * 1000, 1),
+                'peak_alloc_kib': round(peak / 1024, 1),
+            })
+        return chunks
+
+    def _save(self, name, profile, meta):
+        os.makedirs(self.out_dir, exist_ok=True)
+        stats = pstats.Stats(profile)
+        stats.dump_stats(os.path.join(self.out_dir, name + '.pstats'))
+        meta['top'] = _top_functions(stats)
+        with open(os.path.join(self.out_dir, name + '.json'), 'w', encoding='utf-8') as fh:
+            json.dump(meta, fh, indent=1)
+        for old in list_profiles(self.out_dir)[self.keep:]:
+            for ext in ('.pstats', '.json'):
+                try:
+                    os.remove(os.path.join(self.out_dir, old['name'] + ext))
+                except OSError:
+                    pass
+
+
+def list_profiles(out_dir):
+    """Metadata of saved captures, newest first."""
+    try:
+        names = sorted((f for f in os.listdir(out_dir) if f.endswith('.json')), reverse=True)
+    except OSError:
+        return []
+    captures = []
+    for fname in names:
+        try:
+            with open(os.path.join(out_dir, fname), encoding='utf-8') as fh:
+                captures.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    return captures
+
+
+def install_profiler(app):
+    """Wrap app.wsgi_app when PROFILER_TOKEN is configured; the profiler is kept in app.extensions."""
+    token = app.config.get('PROFILER_TOKEN')
+    if not token:
+        return None
+    profiler = RequestProfiler(app.wsgi_app, token, os.path.join(app.instance_path, 'profiles'), app.config['PROFILER_KEEP'])
+    app.wsgi_app = profiler
+    app.extensions['request_profiler'] = profiler
+    return profiler
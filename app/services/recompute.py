@@ -0,0 +1,159 @@
+"""Recompute stored RunResult concentrations/levels from their rgb_sum after calibration changes.
+
+Results are read in id order in fixed-size batches (keyset pagination), evaluated
+against the profile's current compiled curves as whole arrays, and only rows whose
+concentration or level changed are written back with one bulk UPDATE per batch.
+Progress is saved in the 'recompute_job' app setting in the same transaction as
+each batch, so an interrupted job resumes after the last committed batch.
+
+With normalize=True/False, rgb_sum itself is re-derived from the stored raw channel
+means (RunResult.raw_*) and the run's background patch mean (Run.bg_*), with or
+without background subtraction. Subtraction is applied to the point's mean, which
+matches analysis exactly for box/disk kernels; for per-pixel kernels it differs only
+where individual pixels were darker than the background. Results recorded before
+raw means were stored keep their rgb_sum.
+Changed rows move between trend buckets (app.services.trends) in the same transaction.
+"""
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import Pesticide, Run, RunResult
+from app.services.curves import LEVELS
+from app.services.profile_service import compiled_curve_for
+from app.services.image_utils import BLACK_THRESHOLD
+from app.services.settings_service import get_app_setting, set_app_setting
+from app.services.trends import apply_trend_deltas, recompute_trend_deltas
+
+JOB_KEY = 'recompute_job'
+DEFAULT_BATCH_SIZE = 5000
+
+
+def _rounded_tables(profile_id):
+    """{pesticide_key: (concentrations rounded to 2 dp as stored by analysis, level codes)}."""
+    tables = {}
+    for pest in Pesticide.query.filter_by(profile_id=profile_id).all():
+        curve = compiled_curve_for(pest)
+        rounded = np.array([round(float(c), 2) for c in curve.concentrations], dtype=np.float64)
+        tables[pest.key] = (rounded, curve.level_codes)
+    return tables
+
+
+def _job_params(profile_id, since, until, normalize):
+    return {
+        'profile_id': profile_id,
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat() if until else None,
+        'normalize': normalize,
+    }
+
+
+def _rederive_sums(raw, bg, normalize):
+    """
+    rgb_sum from raw channel means (N, 3), optionally minus the background means (N, 3).
+    Rows with no raw means (NaN) come back as -1; black or missing backgrounds are not subtracted.
+    Also returns the per-row used_normalization flag.
+    """
+    subtract = np.zeros(len(raw), dtype=bool)
+    if normalize:
+        subtract = ~np.isnan(bg).any(axis=1) & ~(bg <= BLACK_THRESHOLD).all(axis=1)
+    adjusted = np.where(subtract[:, None], np.maximum(0.0, raw - np.nan_to_num(bg)), raw)
+    sums = np.rint(adjusted.sum(axis=1))
+    return np.where(np.isnan(sums), -1, sums).astype(np.int64), subtract
+
+
+def get_recompute_job():
+    """The last saved job state (dict) or None."""
+    return get_app_setting(JOB_KEY)
+
+
+def recompute_results(profile_id, since=None, until=None, normalize=None, batch_size=DEFAULT_BATCH_SIZE, resume=True, progress=None):
+    """
+    Re-evaluate every non-scientific result of profile_id's runs (created in [since, until)).
+    normalize: None keeps the stored rgb_sum; True/False re-derives it from raw means with/without
+    background subtraction (and updates Run.used_normalization to match).
+    With resume, a previously interrupted job with the same parameters continues from its
+    last committed batch. progress(job_dict) is called after each batch. Returns the final job dict.
+    """
+    params = _job_params(profile_id, since, until, normalize)
+    job = get_recompute_job() if resume else None
+    if not job or job.get('status') != 'running' or {k: job.get(k) for k in params} != params:
+        job = dict(params, status='running', last_id=0, processed=0, updated=0, total=None,
+                   started_at=datetime.utcnow().isoformat(), finished_at=None)
+
+    columns = [RunResult.id, RunResult.pesticide_key, RunResult.rgb_sum, RunResult.concentration, RunResult.level, RunResult.run_id,
+               Run.created_at]
+    if normalize is not None:
+        columns += [RunResult.raw_r, RunResult.raw_g, RunResult.raw_b, Run.bg_r, Run.bg_g, Run.bg_b]
+    base = (
+        db.session.query(*columns)
+        .join(Run, Run.id == RunResult.run_id)
+        .filter(Run.profile_id == profile_id, Run.mode != 'scientific')
+    )
+    if since:
+        base = base.filter(Run.created_at >= since)
+    if until:
+        base = base.filter(Run.created_at < until)
+    if job['total'] is None:
+        job['total'] = base.order_by(None).count()
+    set_app_setting(JOB_KEY, job)
+
+    tables = _rounded_tables(profile_id)
+    levels = np.array(LEVELS, dtype=object)
+    while True:
+        rows = base.filter(RunResult.id > job['last_id']).order_by(RunResult.id.asc()).limit(batch_size).all()
+        if not rows:
+            break
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        keys = np.array([r[1] for r in rows], dtype=object)
+        old_sums = np.fromiter((r[2] for r in rows), dtype=np.int64, count=len(rows))
+        old_conc = np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows))
+        old_level = np.array([r[4] for r in rows], dtype=object)
+        run_ids = np.fromiter((r[5] for r in rows), dtype=np.int64, count=len(rows))
+        new_sums = old_sums
+        run_flags = {}
+        if normalize is not None:
+            extra = np.array([r[7:13] for r in rows], dtype=np.float64)  # None -> nan
+            derived, subtracted = _rederive_sums(extra[:, :3], extra[:, 3:], normalize)
+            has_raw = derived >= 0
+            new_sums = np.where(has_raw, derived, old_sums)
+            for run_id, flag in zip((r[5] for r, ok in zip(rows, has_raw) if ok), subtracted[has_raw]):
+                run_flags[run_id] = bool(flag)
+        sums = np.clip(new_sums, 0, 765)
+        changes = []
+        trend_deltas = {}
+        touched = set(run_flags)
+        for key in set(keys.tolist()):
+            if key not in tables:
+                continue  # case since removed from the profile: leave the stored result alone
+            conc_table, code_table = tables[key]
+            sel = np.flatnonzero(keys == key)
+            conc = conc_table[sums[sel]]
+            level = levels[code_table[sums[sel]]]
+            dirty = (conc != old_conc[sel]) | (level != old_level[sel]) | (new_sums[sel] != old_sums[sel])
+            changes.extend(
+                {'id': int(i), 'rgb_sum': int(t), 'concentration': float(c), 'level': lv}
+                for i, t, c, lv in zip(ids[sel][dirty], new_sums[sel][dirty], conc[dirty], level[dirty])
+            )
+            touched.update(run_ids[sel][dirty].tolist())
+            for i, c, lv in zip(sel[dirty], conc[dirty], level[dirty]):
+                recompute_trend_deltas(trend_deltas, profile_id, rows[i][6], key, (float(old_conc[i]), old_level[i]), (float(c), lv))
+        if changes:
+            db.session.execute(update(RunResult), changes)
+            apply_trend_deltas(trend_deltas)
+        if run_flags:
+            db.session.execute(update(Run), [{'id': rid, 'used_normalization': flag} for rid, flag in run_flags.items()])
+        if touched:
+            db.session.execute(update(Run).where(Run.id.in_(touched)).values(revision=Run.revision + 1))
+        job['last_id'] = int(ids[-1])
+        job['processed'] += len(rows)
+        job['updated'] += len(changes)
+        set_app_setting(JOB_KEY, job)  # commits the batch together with its progress
+        if progress:
+            progress(dict(job))
+    job['status'] = 'done'
+    job['finished_at'] = datetime.utcnow().isoformat()
+    set_app_setting(JOB_KEY, job)
+    return job
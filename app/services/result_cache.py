@@ -0,0 +1,109 @@
+"""Memoized analysis results, so re-submitting the same image and points reuses the saved run.
+
+Entries are keyed on the image content digest, app mode, sampling scheme, normalization
+flag, the normalized point list, and the profile's calibration version, so any calibration
+edit misses naturally. The cache is a per-process LRU of RESULT_CACHE_SIZE entries that
+expire after RESULT_CACHE_TTL seconds; a size of 0 turns it off. Hits are only served while
+the run they point at still exists.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from app.extensions import db
+from app.models import Run
+from app.services.profile_service import profile_version
+
+
+class ResultCache:
+    """Thread-safe LRU with a time-to-live and hit/miss/eviction counters."""
+
+    def __init__(self, max_entries=256, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def reject(self, key):
+        """Drop an entry get() just returned that turned out to be stale, counting the lookup as a miss."""
+        with self._lock:
+            self._entries.pop(key, None)
+            self.hits -= 1
+            self.misses += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def get_result_cache(app):
+    """The app's ResultCache, sized from RESULT_CACHE_SIZE / RESULT_CACHE_TTL."""
+    cache = app.extensions.get('result_cache')
+    if cache is None:
+        cache = app.extensions.setdefault(
+            'result_cache', ResultCache(app.config['RESULT_CACHE_SIZE'], app.config['RESULT_CACHE_TTL']))
+    return cache
+
+
+def result_key(digest, profile_id, mode, scheme, normalize, points, roi='', cache=None):
+    """
+    Cache key for one submission, or None when the image has no content digest (legacy path)
+    or cache is disabled (then the profile version is not even looked up). roi is the crop geometry field as sent.
+    """
+    if not digest or (cache is not None and cache.max_entries <= 0):
+        return None
+    normalized = tuple(sorted((int(p['x']), int(p['y']), p.get('well') or '') for p in points))
+    key = (digest, profile_id, profile_version(profile_id), mode, scheme, bool(normalize), normalized)
+    return key + (roi,) if roi else key
+
+
+def cached_result(cache, key):
+    """The cached entry for key if its run still exists, else None (stale entries are dropped)."""
+    if key is None or cache.max_entries <= 0:
+        return None
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    if db.session.get(Run, entry['run_id']) is None:
+        cache.reject(key)
+        return None
+    return entry
@@ -0,0 +1,132 @@
+"""Client-side ROI crops: the geometry sent with a cropped upload, validated and mapped to frame space (no Flask/db).
+
+The camera (capture) page can upload only what analysis reads (the band of rows around the
+auto-placed points, plus the top-left background corner), each drawn into one smaller image,
+instead of the whole frame; the file picker always uploads the full frame, without `roi`.
+The `roi` form field says how the crop was made:
+
+    {"v": 1, "frame": [W, H], "regions": [{"src": [x, y, w, h], "dst": [u, v, w2, h2]}, ...]}
+
+src is a rectangle of the original W×H frame and dst is where it was drawn in the uploaded
+image, shrunk (never enlarged) by w2/w and h2/h. Analysis samples the uploaded image. Stored
+pixel coordinates and image_width/height are in frame space, and the geometry is kept on the
+Run (run.roi, with the uploaded size added) so results can be drawn over the stored crop.
+"""
+import json
+from dataclasses import dataclass
+
+ROI_VERSION = 1
+MAX_REGIONS = 4
+MAX_FRAME_SIDE = 16384
+MIN_SCALE = 1 / 16
+SCALE_TOLERANCE = 0.02  # w2/w and h2/h may differ by this much (client-side rounding)
+BACKGROUND_PATCH = 9  # matches background_patch_mean's top-left corner patch
+
+
+def _ints(value, n, what):
+    if not isinstance(value, list) or len(value) != n or not all(isinstance(v, int) and not isinstance(v, bool) for v in value):
+        raise ValueError(f"{what} must be a list of {n} integers")
+    return tuple(value)
+
+
+def _inside(rect, width, height):
+    x, y, w, h = rect
+    return w >= 1 and h >= 1 and x >= 0 and y >= 0 and x + w <= width and y + h <= height
+
+
+def _overlap(a, b):
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+@dataclass(frozen=True)
+class RoiGeometry:
+    frame: tuple  # (W, H) of the original frame
+    upload: tuple  # (w, h) of the uploaded image
+    regions: tuple  # ((src x, y, w, h), (dst u, v, w, h)) pairs
+
+    @staticmethod
+    def _scale(region):
+        src, dst = region
+        return dst[2] / src[2]
+
+    def to_upload(self, x, y):
+        """Uploaded-image pixel for frame pixel (x, y), or None if no region covers it."""
+        best = None
+        for region in self.regions:
+            (sx, sy, sw, sh), _dst = region
+            if sx <= x < sx + sw and sy <= y < sy + sh and (best is None or self._scale(region) > self._scale(best)):
+                best = region
+        if best is None:
+            return None
+        (sx, sy, sw, sh), (u, v, dw, dh) = best
+        return (min(max(int(round(u + (x + 0.5 - sx) * dw / sw - 0.5)), u), u + dw - 1),
+                min(max(int(round(v + (y + 0.5 - sy) * dh / sh - 0.5)), v), v + dh - 1))
+
+    def to_frame(self, u, v):
+        """Frame pixel for uploaded-image pixel (u, v), or None if it lies outside every drawn region."""
+        for (sx, sy, sw, sh), (du, dv, dw, dh) in self.regions:
+            if du <= u < du + dw and dv <= v < dv + dh:
+                return (min(max(int(round(sx + (u + 0.5 - du) * sw / dw - 0.5)), sx), sx + sw - 1),
+                        min(max(int(round(sy + (v + 0.5 - dv) * sh / dh - 0.5)), sy), sy + sh - 1))
+        return None
+
+    def upload_box(self, x0, y0, x1, y1):
+        """Uploaded-image box (left, top, right, bottom) for frame box [x0, x1) × [y0, y1) within one region, or None."""
+        for (sx, sy, sw, sh), (du, dv, dw, dh) in sorted(self.regions, key=self._scale, reverse=True):
+            if sx <= x0 and sy <= y0 and x1 <= sx + sw and y1 <= sy + sh:
+                left, top = du + int((x0 - sx) * dw / sw), dv + int((y0 - sy) * dh / sh)
+                right = max(left + 1, du + -(-(x1 - sx) * dw // sw))
+                bottom = max(top + 1, dv + -(-(y1 - sy) * dh // sh))
+                return left, top, right, bottom
+        return None
+
+    def background_box(self):
+        """Uploaded-image box holding the frame's top-left background patch, or None if it was not sent."""
+        return self.upload_box(0, 0, min(BACKGROUND_PATCH, self.frame[0]), min(BACKGROUND_PATCH, self.frame[1]))
+
+    def to_json(self):
+        return json.dumps({"v": ROI_VERSION, "frame": list(self.frame), "upload": list(self.upload),
+                           "regions": [{"src": list(src), "dst": list(dst)} for src, dst in self.regions]}, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, text):
+        """Geometry stored on a Run (already validated when it was stored)."""
+        data = json.loads(text)
+        return cls(tuple(data['frame']), tuple(data['upload']), tuple((tuple(r['src']), tuple(r['dst'])) for r in data['regions']))
+
+
+def parse_roi(raw, upload_size):
+    """
+    Validate the client's `roi` field against the uploaded image's (width, height).
+    Returns a RoiGeometry; raises ValueError with a short reason.
+    """
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        raise ValueError("not valid JSON")
+    if not isinstance(data, dict) or data.get('v') != ROI_VERSION:
+        raise ValueError(f"unsupported version (expected {ROI_VERSION})")
+    frame = _ints(data.get('frame'), 2, "frame")
+    if not all(1 <= side <= MAX_FRAME_SIDE for side in frame):
+        raise ValueError(f"frame sides must be 1-{MAX_FRAME_SIDE} pixels")
+    regions = data.get('regions')
+    if not isinstance(regions, list) or not 1 <= len(regions) <= MAX_REGIONS:
+        raise ValueError(f"expected 1-{MAX_REGIONS} regions")
+    width, height = upload_size
+    pairs = []
+    for i, region in enumerate(regions, 1):
+        if not isinstance(region, dict):
+            raise ValueError(f"region {i} must be an object")
+        src = _ints(region.get('src'), 4, f"region {i} src")
+        dst = _ints(region.get('dst'), 4, f"region {i} dst")
+        if not _inside(src, *frame):
+            raise ValueError(f"region {i} src lies outside the {frame[0]}x{frame[1]} frame")
+        if not _inside(dst, width, height):
+            raise ValueError(f"region {i} dst lies outside the {width}x{height} upload")
+        sx, sy = dst[2] / src[2], dst[3] / src[3]
+        if not (MIN_SCALE <= sx <= 1 and MIN_SCALE <= sy <= 1) or abs(sx - sy) > SCALE_TOLERANCE * max(sx, sy) + 1 / min(src[2], src[3]):
+            raise ValueError(f"region {i} must be shrunk evenly by a factor between 1 and {MIN_SCALE:g}")
+        if any(_overlap(dst, other) for _src, other in pairs):
+            raise ValueError(f"region {i} overlaps another region in the upload")
+        pairs.append((src, dst))
+    return RoiGeometry(frame, (width, height), tuple(pairs))
@@ -0,0 +1,161 @@
+"""Persisting analysis runs, optionally through a single writer thread with group commit.
+
+persist_run() is the one way routes store a Run and its RunResult rows. By default it
+writes in the calling request's own transaction. With RUN_WRITER_ENABLED, payloads go
+on a queue instead: one thread drains up to RUN_WRITER_MAX_BATCH of them (waiting at
+most RUN_WRITER_MAX_WAIT seconds for stragglers), inserts every run and every result
+with two bulk INSERTs, commits once, and resolves each request's future with its run id.
+SQLite then sees one writer and one fsync per batch instead of one per request. The trend
+summary (app.services.trends) is updated in the same transaction. A request that gives up
+waiting cancels its payload if the writer has not picked it up yet (RunWriterBusy), so a
+run is never saved behind a request that reported failure.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models import Run, RunResult
+from app.services.trends import record_run_trends
+
+_start_lock = threading.Lock()
+
+
+class RunWriterBusy(RuntimeError):
+    """The writer did not pick up a run in time; the run was not saved."""
+
+
+def _uniform(rows):
+    """Give every row the same keys (missing -> None) so one executemany covers them all."""
+    keys = set().union(*rows)
+    return [row if len(row) == len(keys) else {k: row.get(k) for k in keys} for row in rows]
+
+
+def _insert_batch(payloads):
+    """Bulk-insert runs (ids back in payload order) and all their results, and update the trends; caller commits. Returns run ids."""
+    now = datetime.utcnow()
+    payloads = [(fields if fields.get('created_at') else dict(fields, created_at=now), results) for fields, results in payloads]
+    run_ids = db.session.scalars(
+        insert(Run).returning(Run.id, sort_by_parameter_order=True),
+        _uniform([run_fields for run_fields, _results in payloads]),
+    ).all()
+    rows = [dict(row, run_id=run_id) for run_id, (_fields, results) in zip(run_ids, payloads) for row in results]
+    if rows:
+        db.session.execute(insert(RunResult), _uniform(rows))
+    record_run_trends(payloads)
+    return run_ids
+
+
+class RunWriter:
+    """Owns the writer thread and its queue for one app."""
+
+    def __init__(self, app, max_batch=64, max_wait=0.002):
+        self.app = app
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.batches = 0  # commits issued, for benchmarks
+        self.thread = threading.Thread(target=self._loop, name='bioap-run-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, run_fields, results):
+        future = Future()
+        self.queue.put((run_fields, results, future))
+        return future
+
+    def _drain(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return [item for item in batch if item[2].set_running_or_notify_cancel()]  # drop payloads whose request gave up
+
+    def _loop(self):
+        while True:
+            batch = self._drain()
+            if not batch:
+                continue
+            try:
+                with self.app.app_context():
+                    self._write(batch)
+            except Exception as exc:  # never let the thread die: fail what is still pending and go on
+                for _fields, _results, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _write(self, batch):
+        try:
+            run_ids = _insert_batch([(fields, results) for fields, results, _f in batch])
+            db.session.commit()
+            self.batches += 1
+        except Exception as exc:
+            db.session.rollback()
+            if len(batch) > 1:
+                for item in batch:  # isolate the failing payload; the others still commit
+                    self._write([item])
+            elif not batch[0][2].done():
+                batch[0][2].set_exception(exc)
+            return
+        for (_fields, _results, future), run_id in zip(batch, run_ids):
+            if not future.done():
+                future.set_result(run_id)
+
+
+def get_run_writer(app):
+    """The app's RunWriter, started on first use (and restarted if its thread ever died)."""
+    writer = app.extensions.get('run_writer')
+    if writer is None or not writer.thread.is_alive():
+        with _start_lock:
+            writer = app.extensions.get('run_writer')
+            if writer is None or not writer.thread.is_alive():
+                stale = writer
+                writer = RunWriter(app, app.config['RUN_WRITER_MAX_BATCH'], app.config['RUN_WRITER_MAX_WAIT'])
+                while stale is not None:  # hand over what the dead thread left queued
+                    try:
+                        writer.queue.put(stale.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                app.extensions['run_writer'] = writer
+    return writer
+
+
+def persist_run(run_fields, results, timeout=30):
+    """
+    Store one Run (column dict) and its RunResult rows (column dicts without run_id).
+    Returns the new run id once it is committed. Through the writer, raises RunWriterBusy
+    when the run was not picked up within timeout seconds (it is then never written).
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('RUN_WRITER_ENABLED'):
+        run_ids = _insert_batch([(run_fields, results)])
+        db.session.commit()
+        return run_ids[0]
+    future = get_run_writer(app).submit(run_fields, results)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        if future.cancel():
+            raise RunWriterBusy("The database is busy; the run was not saved. Please try again.") from None
+        return future.result()  # already being written: its outcome is the run's outcome
+
+
+def persist_runs(payloads):
+    """
+    Store many (run_fields, results) payloads with two bulk INSERTs and one commit, in the
+    caller's transaction (offline batch jobs; the writer queue is for concurrent requests).
+    Returns the run ids in payload order.
+    """
+    if not payloads:
+        return []
+    run_ids = _insert_batch(payloads)
+    db.session.commit()
+    return run_ids
@@ -0,0 +1,206 @@
+"""Sampling kernels over an RGB image (no Flask/db).
+
+Schemes are stored verbatim in Run.sampling_scheme:
+  '5-pixel'      center + 4-neighbors (the original scheme)
+  'box-NxN'      mean of an N×N window            (summed-area table, O(1) per point)
+  'disk-rR'      mean of a disk of radius R       (summed-area table, a few rectangles per point)
+  'median-NxN'   per-channel median of an N×N window
+  'trimmed-NxN'  per-channel mean of an N×N window after dropping the lowest/highest 20%
+Windows are clipped at the image border, like the 5-pixel neighbors.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_SCHEME = '5-pixel'
+TRIM_FRACTION = 0.2
+MAX_WINDOW = 101
+# Choices offered in the UI; any scheme parse_sampling_scheme accepts is valid.
+SAMPLING_SCHEMES = (
+    '5-pixel', 'box-3x3', 'box-5x5', 'box-9x9', 'box-15x15',
+    'disk-r3', 'disk-r5', 'disk-r9', 'median-5x5', 'trimmed-5x5', 'trimmed-9x9',
+)
+_FIVE_OFFSETS = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+@dataclass(frozen=True)
+class SamplingKernel:
+    kind: str  # 'five' | 'box' | 'disk' | 'median' | 'trimmed'
+    size: int  # window side, or radius for 'disk'
+
+    @property
+    def scheme(self):
+        if self.kind == 'five':
+            return DEFAULT_SCHEME
+        if self.kind == 'disk':
+            return f"disk-r{self.size}"
+        return f"{self.kind}-{self.size}x{self.size}"
+
+    @property
+    def reach(self):
+        """Farthest pixel (in x or y) a window reads from its center."""
+        if self.kind == 'five':
+            return 1
+        return self.size if self.kind == 'disk' else self.size // 2
+
+
+def parse_sampling_scheme(scheme):
+    """'box-5x5' -> SamplingKernel('box', 5). Raises ValueError for unknown schemes."""
+    scheme = (scheme or DEFAULT_SCHEME).strip().lower()
+    if scheme == DEFAULT_SCHEME:
+        return SamplingKernel('five', 1)
+    kind, _, spec = scheme.partition('-')
+    try:
+        if kind == 'disk' and spec.startswith('r'):
+            size = int(spec[1:])
+            if 1 <= size <= MAX_WINDOW // 2:
+                return SamplingKernel('disk', size)
+        elif kind in ('box', 'median', 'trimmed'):
+            a, _, b = spec.partition('x')
+            size = int(a)
+            if size == int(b) and size % 2 == 1 and 1 <= size <= MAX_WINDOW:
+                return SamplingKernel(kind, size)
+    except ValueError:
+        pass
+    raise ValueError(f"Unknown sampling scheme: {scheme!r}")
+
+
+@lru_cache(maxsize=64)
+def disk_rectangles(radius):
+    """Decompose a disk into row bands of equal half-width: ((dy0, dy1, half_width), ...), dy inclusive."""
+    rects = []
+    for dy in range(-radius, radius + 1):
+        hw = int(np.floor(np.sqrt(radius * radius - dy * dy)))
+        if rects and rects[-1][2] == hw and rects[-1][1] == dy - 1:
+            rects[-1] = (rects[-1][0], dy, hw)
+        else:
+            rects.append((dy, dy, hw))
+    return tuple(rects)
+
+
+def rgb_pixels(image):
+    """(H, W, 3) array of an image: a PIL image is converted once, an array is returned as is (views stay views)."""
+    if isinstance(image, Image.Image):
+        return np.asarray(image if image.mode == 'RGB' else image.convert('RGB'))
+    return image
+
+
+class ImageSampler:
+    """Wraps one decoded image (PIL or an (H, W, 3) array); the summed-area table is built on first use and reused for every point."""
+
+    def __init__(self, image):
+        image = rgb_pixels(image)
+        self.pixels = image
+        self.height, self.width = image.shape[:2]
+        self._sat = None
+
+    @property
+    def sat(self):
+        """(H+1, W+1, 3) float64 summed-area table with a zero first row/column."""
+        if self._sat is None:
+            sat = np.zeros((self.height + 1, self.width + 1, 3), dtype=np.float64)
+            np.cumsum(self.pixels, axis=0, dtype=np.float64, out=sat[1:, 1:])
+            np.cumsum(sat[1:, 1:], axis=1, out=sat[1:, 1:])
+            self._sat = sat
+        return self._sat
+
+    def _rect_sums(self, x0, y0, x1, y1):
+        """Per-channel sums and pixel counts of [x0, x1) × [y0, y1), clipped to the image."""
+        x0 = np.clip(x0, 0, self.width)
+        x1 = np.clip(x1, 0, self.width)
+        y0 = np.clip(y0, 0, self.height)
+        y1 = np.clip(y1, 0, self.height)
+        x1 = np.maximum(x1, x0)
+        y1 = np.maximum(y1, y0)
+        sat = self.sat
+        sums = sat[y1, x1] - sat[y0, x1] - sat[y1, x0] + sat[y0, x0]
+        return sums, (x1 - x0) * (y1 - y0)
+
+    def mean_rgb(self, xs, ys, kernel):
+        """Raw per-channel means, shape (N, 3), for points (xs[i], ys[i])."""
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        if kernel.kind == 'five':
+            vals, mask = self._five_pixels(xs, ys)
+            return self._five_mean(vals, mask)
+        if kernel.kind == 'box':
+            half = kernel.size // 2
+            sums, counts = self._rect_sums(xs - half, ys - half, xs + half + 1, ys + half + 1)
+        elif kernel.kind == 'disk':
+            sums = np.zeros((len(xs), 3), dtype=np.float64)
+            counts = np.zeros(len(xs), dtype=np.int64)
+            for dy0, dy1, hw in disk_rectangles(kernel.size):
+                s, c = self._rect_sums(xs - hw, ys + dy0, xs + hw + 1, ys + dy1 + 1)
+                sums += s
+                counts += c
+        else:
+            return np.array([self._window_stat(x, y, kernel) for x, y in zip(xs, ys)], dtype=np.float64).reshape(-1, 3)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts[:, None]
+        return np.where(counts[:, None] > 0, means, 0.0)
+
+    def totals(self, xs, ys, kernel, bg_offsets=None):
+        """
+        Return (rgb_sum ints (N,), raw per-channel means (N, 3)).
+        With bg_offsets the 5-pixel and window-statistic kernels subtract per pixel and clamp at 0;
+        box/disk subtract from the window mean (their sums never see individual pixels).
+        """
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        if kernel.kind == 'five':
+            vals, mask = self._five_pixels(xs, ys)
+            raw = self._five_mean(vals, mask)
+            if bg_offsets is not None:
+                bg = np.asarray(bg_offsets, dtype=np.float64)
+                vals = np.maximum(0.0, vals - bg)
+            means = self._five_mean(vals, mask).astype(np.float32)
+            total = means[:, 0] + means[:, 1] + means[:, 2]
+            return np.array([int(round(float(t))) for t in total], dtype=np.int64), raw
+        raw = self.mean_rgb(xs, ys, kernel)
+        if bg_offsets is None:
+            adjusted = raw
+        elif kernel.kind in ('median', 'trimmed'):
+            adjusted = np.array([self._window_stat(x, y, kernel, bg_offsets) for x, y in zip(xs, ys)], dtype=np.float64).reshape(-1, 3)
+        else:
+            adjusted = np.maximum(0.0, raw - np.asarray(bg_offsets, dtype=np.float64))
+        return np.rint(adjusted.sum(axis=1)).astype(np.int64), raw
+
+    def _five_pixels(self, xs, ys):
+        """(N, 5, 3) float64 pixel values and (N, 5) in-bounds mask for the 5-pixel neighborhood."""
+        n = len(xs)
+        vals = np.zeros((n, 5, 3), dtype=np.float64)
+        mask = np.zeros((n, 5), dtype=bool)
+        for k, (dx, dy) in enumerate(_FIVE_OFFSETS):
+            px, py = xs + dx, ys + dy
+            ok = (px >= 0) & (px < self.width) & (py >= 0) & (py < self.height)
+            mask[:, k] = ok
+            vals[ok, k] = self.pixels[py[ok], px[ok]]
+        return vals, mask
+
+    @staticmethod
+    def _five_mean(vals, mask):
+        # float32 accumulation, matching sample_five_pixel_total's np.float32 mean
+        v = np.where(mask[:, :, None], vals, 0.0).astype(np.float32)
+        counts = mask.sum(axis=1).astype(np.float32)
+        sums = v[:, 0] + v[:, 1] + v[:, 2] + v[:, 3] + v[:, 4]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts[:, None]
+        return np.where(counts[:, None] > 0, means, 0.0).astype(np.float64)
+
+    def _window_stat(self, x, y, kernel, bg_offsets=None):
+        half = kernel.size // 2
+        window = self.pixels[max(0, y - half):max(0, y + half + 1), max(0, x - half):max(0, x + half + 1)]
+        window = window.reshape(-1, 3).astype(np.float64)
+        if window.size == 0:
+            return (0.0, 0.0, 0.0)
+        if bg_offsets is not None:
+            window = np.maximum(0.0, window - np.asarray(bg_offsets, dtype=np.float64))
+        if kernel.kind == 'median':
+            return np.median(window, axis=0)
+        window = np.sort(window, axis=0)
+        cut = int(len(window) * TRIM_FRACTION)
+        if cut and len(window) > 2 * cut:
+            window = window[cut:len(window) - cut]
+        return window.mean(axis=0)
@@ -0,0 +1,161 @@
+"""The image-only analysis stages: normalize, place and sample (no Flask/db).
+
+SamplingPlan is shared by AnalysisPipeline, batch worker processes and FrameAnalyzer, so it
+and what it needs (Grid, Measurement, timed_stage) import nothing beyond NumPy and Pillow;
+app.services.pipeline re-exports them.
+"""
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from app.services.image_utils import BLACK_THRESHOLD, auto_points
+from app.services.layouts import layout_grid
+from app.services.roi import BACKGROUND_PATCH, RoiGeometry
+from app.services.sampling import DEFAULT_SCHEME, ImageSampler, parse_sampling_scheme, rgb_pixels
+
+
+@contextmanager
+def timed_stage(timings, name, on_stage=None):
+    """Add the block's wall time to timings[name] and report it to on_stage(name, seconds)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + seconds
+        if on_stage:
+            on_stage(name, seconds)
+
+
+@dataclass(frozen=True)
+class Grid:
+    """Plate layout geometry without the ORM row, for layout_grid in worker processes."""
+    rows: int
+    columns: int
+    origin_x: float
+    origin_y: float
+    pitch_x: float
+    pitch_y: float
+
+    @classmethod
+    def from_layout(cls, layout):
+        return cls(layout.rows, layout.columns, layout.origin_x, layout.origin_y, layout.pitch_x, layout.pitch_y)
+
+
+@dataclass
+class Measurement:
+    """What the image-only stages produce for one image."""
+    width: int
+    height: int
+    xs: list
+    ys: list
+    totals: np.ndarray  # rgb_sum per point, after normalization
+    means: np.ndarray  # raw per-channel means, shape (N, 3)
+    background: Optional[tuple]  # raw background patch mean (r, g, b); None if a crop left out the corner
+    used_normalization: bool
+    roi: Optional[RoiGeometry] = None
+
+    def frame_points(self):
+        """(x, y) of each point in the original frame (the uploaded image unless it was cropped)."""
+        if self.roi is None:
+            return list(zip(self.xs, self.ys))
+        return [self.roi.to_frame(x, y) for x, y in zip(self.xs, self.ys)]
+
+
+@dataclass(frozen=True)
+class SamplingPlan:
+    """
+    The image-only stages. Without a grid, n points are auto-placed; supplied points are used
+    in x order, at most max_points of them. With a grid, there is one point per well in
+    row-major order, and supplied points arrive in that order.
+    """
+    scheme: str = DEFAULT_SCHEME
+    normalize: bool = False
+    n: int = 1
+    max_points: Optional[int] = None
+    grid: Optional[Grid] = None
+
+    @property
+    def kernel(self):
+        return parse_sampling_scheme(self.scheme)
+
+    def background(self, pixels, roi=None):
+        """
+        (raw patch mean, offsets or None, normalization used) for an (H, W, 3) pixel array: the
+        top-left corner patch, as background_patch_mean reads it. A black or missing patch means nothing to subtract.
+        """
+        box = (0, 0, BACKGROUND_PATCH, BACKGROUND_PATCH) if roi is None else roi.background_box()
+        if box is None:
+            return None, None, False
+        x0, y0, x1, y1 = box
+        bg = np.asarray(pixels[y0:y1, x0:x1], dtype=np.float32).reshape(-1, 3).mean(axis=0)
+        if not self.normalize or (bg <= BLACK_THRESHOLD).all():
+            return bg, None, False
+        return bg, bg, True
+
+    def place(self, width, height, points=None, roi=None):
+        """
+        (xs, ys) integer pixel coordinates. Supplied layout points are clamped to the image;
+        other supplied points are kept as given, so one dragged past the edge reads only the
+        pixels of its window that are inside (none: 0), as the 5-pixel sampler always has.
+        With a roi, auto and layout points are placed on the original frame and mapped into the
+        crop; raises ValueError for a point the crop does not cover.
+        """
+        if roi is not None:
+            if points is None:
+                xs, ys = self.place(*roi.frame)
+                mapped = [roi.to_upload(x, y) for x, y in zip(xs, ys)]
+            else:
+                xs, ys = self.place(width, height, points)
+                mapped = [(x, y) if roi.to_frame(x, y) else None for x, y in zip(xs, ys)]
+            missing = [f"({x}, {y})" for x, y, uv in zip(xs, ys, mapped) if uv is None]
+            if missing:
+                raise ValueError(f"Sample point {missing[0]} is outside the cropped regions.")
+            return [u for u, _v in mapped], [v for _u, v in mapped]
+        if points is None:
+            if self.grid is not None:
+                xs, ys = layout_grid(self.grid, width, height)
+                return [int(x) for x in xs], [int(y) for y in ys]
+            xs, y = auto_points(width, height, self.n)
+            return xs, [int(y)] * len(xs)
+        if self.grid is None:
+            points = sorted(points[:self.max_points], key=lambda p: p.get('x', 0))
+            return [int(p.get('x', 0)) for p in points], [int(p.get('y', 0)) for p in points]
+        xs = [min(max(int(p.get('x', 0)), 0), width - 1) for p in points]
+        ys = [min(max(int(p.get('y', 0)), 0), height - 1) for p in points]
+        return xs, ys
+
+    def sample(self, pixels, xs, ys, offsets=None):
+        """
+        (totals, means) of the points, read through a view of just the rows and columns the
+        kernel reaches (windows still clip at the image border), so a summed-area table never
+        covers more of the image than the points need.
+        """
+        kernel = self.kernel
+        if not len(xs):
+            return ImageSampler(pixels).totals(xs, ys, kernel, offsets)
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        x0, y0 = max(0, int(xs.min()) - kernel.reach), max(0, int(ys.min()) - kernel.reach)
+        x1, y1 = int(xs.max()) + kernel.reach + 1, int(ys.max()) + kernel.reach + 1
+        return ImageSampler(pixels[y0:y1, x0:x1]).totals(xs - x0, ys - y0, kernel, offsets)
+
+    def measure(self, img, points=None, timings=None, on_stage=None, roi=None):
+        """
+        Run normalize, place and sample on a decoded RGB image or (H, W, 3) array (the cropped
+        upload when roi is given). An array is read in place, never copied.
+        """
+        pixels = rgb_pixels(img)
+        height, width = pixels.shape[:2]
+        with timed_stage(timings, 'normalize', on_stage):
+            bg, offsets, used = self.background(pixels, roi)
+        with timed_stage(timings, 'place', on_stage):
+            xs, ys = self.place(width, height, points, roi)
+        with timed_stage(timings, 'sample', on_stage):
+            totals, means = self.sample(pixels, xs, ys, offsets)
+        background = tuple(float(v) for v in bg[:3]) if bg is not None else None
+        return Measurement(width, height, xs, ys, totals, means, background, used, roi)
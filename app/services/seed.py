@@ -1,6 +1,9 @@
 """Seed default calibration profile and pesticides."""
+import json
+
 from app.extensions import db
-from app.models import CalibrationProfile, Pesticide, CalibrationPoint, ThresholdBand
+from app.models import CalibrationProfile, Pesticide, CalibrationPoint, ThresholdBand, Run, RunResult
+from app.services.color_utils import scientific_color_columns
 
 
 def seed_defaults():
@@ -102,3 +105,81 @@ def ensure_scientific_data_column():
         db.session.commit()
     except Exception:
         db.session.rollback()
+
+
+# (table, column, DDL) for columns added after the first release; created tables already have them.
+ADDED_COLUMNS = [
+    ('run_result', 'scientific_data', 'TEXT'),
+    ('pesticide', 'curve_model', "VARCHAR(20) NOT NULL DEFAULT 'linear'"),
+    ('run', 'bg_r', 'FLOAT'),
+    ('run', 'bg_g', 'FLOAT'),
+    ('run', 'bg_b', 'FLOAT'),
+    ('run_result', 'raw_r', 'FLOAT'),
+    ('run_result', 'raw_g', 'FLOAT'),
+    ('run_result', 'raw_b', 'FLOAT'),
+    ('run', 'image_width', 'INTEGER'),
+    ('run', 'image_height', 'INTEGER'),
+    ('run_result', 'rgb_r', 'INTEGER'),
+    ('run_result', 'rgb_g', 'INTEGER'),
+    ('run_result', 'rgb_b', 'INTEGER'),
+    ('run_result', 'hsv_h', 'FLOAT'),
+    ('run_result', 'hsv_s', 'FLOAT'),
+    ('run_result', 'hsv_v', 'FLOAT'),
+    ('run_result', 'hsl_h', 'FLOAT'),
+    ('run_result', 'hsl_s', 'FLOAT'),
+    ('run_result', 'hsl_l', 'FLOAT'),
+    ('run', 'layout', 'VARCHAR(100)'),
+    ('run_result', 'well', 'VARCHAR(8)'),
+    ('run', 'revision', 'INTEGER NOT NULL DEFAULT 0'),
+    ('run', 'roi', 'TEXT'),
+]
+
+
+def ensure_schema_columns():
+    """Add any ADDED_COLUMNS missing from an existing database."""
+    from sqlalchemy import inspect, text
+    inspector = inspect(db.engine)
+    for table, column, ddl in ADDED_COLUMNS:
+        if column not in {c['name'] for c in inspector.get_columns(table)}:
+            db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    db.session.commit()
+
+
+def ensure_indexes():
+    """Create any model index missing from an existing database (create_all skips tables that already exist)."""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def backfill_typed_columns():
+    """
+    One-time fill of columns added after rows were written: scientific colors from the legacy
+    JSON, and image dimensions read from the stored files (0 when the file is gone, so it is
+    not retried). Only rows still NULL are touched.
+    """
+    from PIL import Image
+    from sqlalchemy import update
+    colors = []
+    q = db.session.query(RunResult.id, RunResult.scientific_data).filter(
+        RunResult.scientific_data.isnot(None), RunResult.rgb_r.is_(None))
+    for rid, raw in q:
+        try:
+            r, g, b = (int(v) for v in json.loads(raw)["rgb"])
+        except (ValueError, KeyError, TypeError):
+            continue
+        colors.append(dict(scientific_color_columns(r, g, b), id=rid))
+    if colors:
+        db.session.execute(update(RunResult), colors)
+    sizes = []
+    for run_id, image_path in db.session.query(Run.id, Run.image_path).filter(Run.image_width.is_(None)):
+        width = height = 0
+        try:
+            with Image.open(image_path) as im:
+                width, height = im.size
+        except (OSError, ValueError):
+            pass
+        sizes.append({"id": run_id, "image_width": width, "image_height": height})
+    if sizes:
+        db.session.execute(update(Run), sizes)
+    db.session.commit()
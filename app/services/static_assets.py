@@ -0,0 +1,77 @@
+"""Build-time fingerprinting and gzip precompression of static assets (no Flask)."""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+# Source folders (relative to project root) whose files are fingerprinted.
+ASSET_SOURCE_DIRS = ('static/css', 'static/js', 'public')
+DIST_DIR = os.path.join('static', 'dist')
+MANIFEST_NAME = 'manifest.json'
+# Only text-like assets benefit from gzip; images are already compressed.
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.html', '.txt', '.map')
+HASH_LENGTH = 12
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            h.update(chunk)
+    return h.hexdigest()[:HASH_LENGTH]
+
+
+def fingerprinted_name(logical_name, digest):
+    """'static/css/theme.css' + digest -> 'static/css/theme.<digest>.css'."""
+    stem, ext = os.path.splitext(logical_name)
+    return f"{stem}.{digest}{ext}"
+
+
+def build_assets(project_root, source_dirs=ASSET_SOURCE_DIRS, compresslevel=9):
+    """
+    Copy every asset under source_dirs into static/dist/ with a content hash in its name,
+    write a .gz sibling for compressible types, and write manifest.json mapping
+    logical name (e.g. 'static/css/theme.css') -> fingerprinted name.
+    Returns the manifest dict.
+    """
+    dist_root = os.path.join(project_root, DIST_DIR)
+    if os.path.isdir(dist_root):
+        shutil.rmtree(dist_root)
+    os.makedirs(dist_root, exist_ok=True)
+    manifest = {}
+    for src_dir in source_dirs:
+        abs_dir = os.path.join(project_root, src_dir)
+        if not os.path.isdir(abs_dir):
+            continue
+        for dirpath, _dirnames, filenames in os.walk(abs_dir):
+            for fname in sorted(filenames):
+                if fname.startswith('.'):
+                    continue
+                src_path = os.path.join(dirpath, fname)
+                logical = os.path.relpath(src_path, project_root).replace(os.sep, '/')
+                hashed = fingerprinted_name(logical, _file_digest(src_path))
+                out_path = os.path.join(dist_root, hashed)
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                shutil.copyfile(src_path, out_path)
+                if os.path.splitext(fname)[1].lower() in PRECOMPRESS_EXTENSIONS:
+                    with open(src_path, 'rb') as f:
+                        raw = f.read()
+                    packed = gzip.compress(raw, compresslevel=compresslevel, mtime=0)
+                    if len(packed) < len(raw):
+                        with open(out_path + '.gz', 'wb') as f:
+                            f.write(packed)
+                manifest[logical] = hashed
+    with open(os.path.join(dist_root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(project_root):
+    """Return the asset manifest, or {} if assets have not been built."""
+    path = os.path.join(project_root, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
@@ -0,0 +1,168 @@
+"""Daily and weekly per-pesticide trends, kept as running totals in trend_bucket.
+
+Every write path of run_result adjusts the summary in its own transaction:
+  persist_run / persist_runs  record_run_trends: + each new non-scientific result
+  run delete                  forget_run_trends: - the run's results (before the delete)
+  clear all runs              clear_trends
+  profile delete              clear_trends(profile_id)
+  recompute_results           - the old (concentration, level), + the new one, for changed rows
+Deltas are summed per (profile, period, bucket, case) first and applied with one SQLite
+upsert, so a write costs one statement however many results it carries. Reads touch only
+the buckets in the requested window, never run_result, so they do not slow down as history
+grows. rebuild_trends() recomputes the table from run_result (backfills, or after a restore).
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, func, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.extensions import db
+from app.models import Pesticide, Run, RunResult, TrendBucket
+from app.services.curves import LEVELS
+
+PERIODS = ('day', 'week')
+LEVEL_COLUMNS = dict(zip(LEVELS, ('n_low', 'n_medium', 'n_high', 'n_out_of_range')))
+COUNTERS = ('n', 'concentration_sum') + tuple(LEVEL_COLUMNS.values())
+DEFAULT_BUCKETS = {'day': 30, 'week': 26}
+MAX_BUCKETS = {'day': 366, 'week': 104}
+
+
+def bucket_start(day, period):
+    """First day of the bucket holding day: the day itself, or the Monday of its week."""
+    return day - timedelta(days=day.weekday()) if period == 'week' else day
+
+
+def _add(deltas, profile_id, day, key, level, count, concentration_sum):
+    """Fold count results (with this concentration total) into the day and week buckets of deltas."""
+    for period in PERIODS:
+        d = deltas.setdefault((profile_id, period, bucket_start(day, period), key), dict.fromkeys(COUNTERS, 0))
+        d['n'] += count
+        d['concentration_sum'] += concentration_sum
+        column = LEVEL_COLUMNS.get(level)
+        if column:
+            d[column] += count
+
+
+def apply_trend_deltas(deltas):
+    """Upsert {(profile_id, period, bucket, key): counter deltas} into trend_bucket; caller commits."""
+    if not deltas:
+        return
+    rows = [dict(profile_id=p, period=period, bucket=bucket, pesticide_key=key, **d)
+            for (p, period, bucket, key), d in deltas.items()]
+    stmt = sqlite_insert(TrendBucket)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['profile_id', 'period', 'bucket', 'pesticide_key'],
+        set_={c: getattr(TrendBucket, c) + getattr(stmt.excluded, c) for c in COUNTERS},
+    )
+    db.session.execute(stmt, rows)
+    emptied = [k for k, d in deltas.items() if d['n'] < 0]
+    if emptied:
+        db.session.execute(delete(TrendBucket).where(
+            tuple_(TrendBucket.profile_id, TrendBucket.period, TrendBucket.bucket, TrendBucket.pesticide_key).in_(emptied),
+            TrendBucket.n <= 0))
+
+
+def record_run_trends(payloads):
+    """Add new runs' results: payloads are (run_fields, results) as stored (run_fields must carry created_at)."""
+    deltas = {}
+    for fields, results in payloads:
+        if fields.get('mode') == 'scientific':
+            continue
+        day = fields['created_at'].date()
+        for row in results:
+            _add(deltas, fields['profile_id'], day, row['pesticide_key'], row['level'], 1, row['concentration'])
+    apply_trend_deltas(deltas)
+
+
+def forget_run_trends(run_ids):
+    """Subtract the results of runs about to be deleted; caller deletes and commits."""
+    if not run_ids:
+        return
+    deltas = {}
+    rows = (
+        db.session.query(Run.profile_id, Run.created_at, RunResult.pesticide_key, RunResult.level, RunResult.concentration)
+        .join(Run, Run.id == RunResult.run_id)
+        .filter(Run.id.in_(list(run_ids)), Run.mode != 'scientific')
+    )
+    for profile_id, created_at, key, level, concentration in rows:
+        _add(deltas, profile_id, created_at.date(), key, level, -1, -concentration)
+    apply_trend_deltas(deltas)
+
+
+def recompute_trend_deltas(deltas, profile_id, created_at, key, old, new):
+    """Move one recomputed result from its old (concentration, level) to the new one in deltas."""
+    day = created_at.date()
+    _add(deltas, profile_id, day, key, old[1], -1, -old[0])
+    _add(deltas, profile_id, day, key, new[1], 1, new[0])
+
+
+def clear_trends(profile_id=None):
+    """Drop every bucket (all runs are being deleted), or only one profile's; caller commits."""
+    stmt = delete(TrendBucket)
+    if profile_id is not None:
+        stmt = stmt.where(TrendBucket.profile_id == profile_id)
+    db.session.execute(stmt)
+
+
+def rebuild_trends():
+    """Recompute trend_bucket from run_result in one grouped scan and commit; returns (results, buckets)."""
+    clear_trends()
+    day = func.date(Run.created_at)
+    grouped = (
+        db.session.query(Run.profile_id, day, RunResult.pesticide_key, RunResult.level,
+                         func.count(RunResult.id), func.sum(RunResult.concentration))
+        .join(Run, Run.id == RunResult.run_id)
+        .filter(Run.mode != 'scientific')
+        .group_by(Run.profile_id, day, RunResult.pesticide_key, RunResult.level)
+    )
+    deltas = {}
+    total = 0
+    for profile_id, day_text, key, level, count, concentration_sum in grouped:
+        _add(deltas, profile_id, date.fromisoformat(day_text), key, level, count, concentration_sum or 0.0)
+        total += count
+    apply_trend_deltas(deltas)
+    db.session.commit()
+    return total, len(deltas)
+
+
+def trend_window(period, buckets=None, end=None):
+    """[start, ..., end] bucket starts of a window of `buckets` periods ending with the one holding end (default today, UTC)."""
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period {period!r}; expected one of {', '.join(PERIODS)}.")
+    count = min(max(1, buckets or DEFAULT_BUCKETS[period]), MAX_BUCKETS[period])
+    last = bucket_start(end or datetime.utcnow().date(), period)
+    step = timedelta(days=7 if period == 'week' else 1)
+    return [last - step * i for i in range(count - 1, -1, -1)]
+
+
+def trend_series(profile_id, period='day', buckets=None, end=None):
+    """
+    Trends of profile_id's cases over a window of buckets, from trend_bucket only.
+    Returns {'period', 'buckets': [iso dates], 'series': [{'pesticide_key', 'name',
+    'points': [{'bucket', 'n', 'mean_concentration', 'levels': {level: count}}]}]};
+    each series has one point per bucket (n=0 and mean None where nothing was analyzed).
+    Raises ValueError for an unknown period.
+    """
+    window = trend_window(period, buckets, end)
+    stored = {}
+    for b in TrendBucket.query.filter(TrendBucket.profile_id == profile_id, TrendBucket.period == period,
+                                      TrendBucket.bucket >= window[0], TrendBucket.bucket <= window[-1]):
+        stored[(b.pesticide_key, b.bucket)] = b
+    pests = Pesticide.query.filter_by(profile_id=profile_id).order_by(Pesticide.order_index.asc()).all()
+    names = {p.key: p.display_name for p in pests}
+    keys = [p.key for p in pests if any((p.key, day) in stored for day in window)]
+    keys += sorted({key for key, _day in stored} - set(keys))  # cases since removed from the profile
+    series = []
+    for key in keys:
+        points = []
+        for day in window:
+            b = stored.get((key, day))
+            n = b.n if b else 0
+            points.append({
+                "bucket": day.isoformat(),
+                "n": n,
+                "mean_concentration": round(b.concentration_sum / n, 4) if n else None,
+                "levels": {level: getattr(b, column) if b else 0 for level, column in LEVEL_COLUMNS.items()},
+            })
+        series.append({"pesticide_key": key, "name": names.get(key, key), "points": points})
+    return {"period": period, "buckets": [day.isoformat() for day in window], "series": series}
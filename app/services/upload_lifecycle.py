@@ -0,0 +1,313 @@
+"""Storage lifecycle for uploads: hot -> warm (transcoded) -> cold (monthly bundle).
+
+hot   the original file in the content-addressed store.
+warm  after UPLOAD_WARM_AFTER_DAYS: re-encoded as lossless WebP (kept only if smaller),
+      optionally cropped to the band of rows that were sampled.
+cold  after UPLOAD_COLD_AFTER_DAYS: the warm file moved into a monthly zip bundle.
+
+Ages count from the newest run that uses the image. Run.image_path never changes;
+ArchivedUpload records where the bytes went, read_upload() fetches them on demand,
+and a small thumbnail is kept hot for every archived image. An image uploaded again
+after it was archived is hot again: its archive record is dropped.
+
+A pass holds a cross-process lock, so worker processes and the archive-uploads
+command never archive at the same time. Bundles are rebuilt in a temporary file and
+swapped in with os.replace, and archived copies are removed only after the commit
+that stops referring to them.
+"""
+import io
+import mimetypes
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+
+from PIL import Image
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import ArchivedUpload, Run, RunResult
+from app.services.image_utils import makedirs_once
+from app.services.upload_store import ARCHIVE_ROOT, THUMB_ROOT, digest_from_path, is_upload_path, upload_lock
+
+THUMB_SIZE = 320
+ROI_MARGIN = 64  # rows kept above/below the sampled points (covers the largest sampling window)
+
+
+def _key(image_path):
+    """Stable file stem for derived files: the content digest, or the path for legacy uploads."""
+    return digest_from_path(image_path) or os.path.splitext(os.path.normpath(image_path))[0].replace(os.sep, '_')
+
+
+def thumbnail_path(image_path):
+    return os.path.join(THUMB_ROOT, _key(image_path) + '.webp')
+
+
+def _media_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def _write_thumbnail(image, image_path):
+    thumb = image.copy()
+    thumb.thumbnail((THUMB_SIZE, THUMB_SIZE))
+    path = thumbnail_path(image_path)
+    makedirs_once(os.path.dirname(path))
+    thumb.save(path, 'WEBP', quality=80)
+    return path
+
+
+def ensure_thumbnail(image_path):
+    """Path of the image's thumbnail, creating it from the original or the archive if needed; None if unreadable."""
+    path = thumbnail_path(image_path)
+    if os.path.exists(path):
+        return path
+    image = open_upload_image(image_path)
+    if image is None:
+        return None
+    return _write_thumbnail(image, image_path)
+
+
+def read_upload(image_path):
+    """(bytes, media_type) for an upload in any tier, or None. Cropped images come back full-size as PNG."""
+    if not is_upload_path(image_path):
+        return None
+    if os.path.exists(image_path):
+        with open(image_path, 'rb') as fh:
+            return fh.read(), _media_type(image_path)
+    rec = ArchivedUpload.query.filter_by(image_path=image_path).first()
+    if not rec:
+        return None
+    try:
+        if rec.tier == 'cold':
+            with zipfile.ZipFile(rec.stored_path) as bundle:
+                data = bundle.read(rec.member)
+        else:
+            with open(rec.stored_path, 'rb') as fh:
+                data = fh.read()
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+    if rec.crop_top == 0 and rec.crop_bottom == rec.height:
+        return data, rec.media_type
+    # Paste the kept band back at its original offset so pixel coordinates stay valid.
+    canvas = Image.new('RGB', (rec.width, rec.height))
+    with Image.open(io.BytesIO(data)) as band:
+        canvas.paste(band.convert('RGB'), (0, rec.crop_top))
+    buf = io.BytesIO()
+    canvas.save(buf, 'PNG', compress_level=1)
+    return buf.getvalue(), 'image/png'
+
+
+def open_upload_image(image_path):
+    """Decoded RGB image for an upload in any tier, or None."""
+    found = read_upload(image_path)
+    if found is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(found[0])) as im:
+            return im.convert('RGB')
+    except OSError:
+        return None
+
+
+def drop_archived(image_path):
+    """Forget an upload's archive copy and thumbnail (its last run was deleted). Bundle members stay until the bundle is rebuilt."""
+    rec = ArchivedUpload.query.filter_by(image_path=image_path).first()
+    if rec:
+        if rec.tier == 'warm':
+            try:
+                os.remove(rec.stored_path)
+            except OSError:
+                pass
+        db.session.delete(rec)
+        db.session.commit()
+    try:
+        os.remove(thumbnail_path(image_path))
+    except OSError:
+        pass
+
+
+def _roi_band(image_path, height):
+    """
+    (top, bottom) rows covering every sampled point of every run using the image, plus ROI_MARGIN.
+    Uploads the client already cropped (run.roi) are kept whole: their rows are not frame rows.
+    """
+    lo, hi, cropped = (
+        db.session.query(func.min(RunResult.pixel_y), func.max(RunResult.pixel_y), func.count(Run.roi))
+        .join(Run, Run.id == RunResult.run_id).filter(Run.image_path == image_path).one()
+    )
+    if lo is None or cropped:
+        return 0, height
+    return max(0, int(lo) - ROI_MARGIN), min(height, int(hi) + ROI_MARGIN + 1)
+
+
+def _to_warm(image_path, crop_to_roi):
+    """Transcode one hot upload; returns the new ArchivedUpload (not yet committed)."""
+    original_bytes = os.path.getsize(image_path)
+    with Image.open(image_path) as im:
+        image = im.convert('RGB')
+    width, height = image.size
+    top, bottom = _roi_band(image_path, height) if crop_to_roi else (0, height)
+    buf = io.BytesIO()
+    image.crop((0, top, width, bottom)).save(buf, 'WEBP', lossless=True, quality=80, method=4)
+    data, ext, media_type = buf.getvalue(), '.webp', 'image/webp'
+    if len(data) >= original_bytes and (top, bottom) == (0, height):
+        # Lossless WebP would not save anything (typical for JPEG originals): keep the original bytes.
+        with open(image_path, 'rb') as fh:
+            data = fh.read()
+        ext, media_type = os.path.splitext(image_path)[1], _media_type(image_path)
+    stored_path = os.path.join(ARCHIVE_ROOT, 'warm', _key(image_path)[:2], _key(image_path) + ext)
+    makedirs_once(os.path.dirname(stored_path))
+    with open(stored_path, 'wb') as fh:
+        fh.write(data)
+    _write_thumbnail(image, image_path)
+    rec = ArchivedUpload(
+        image_path=image_path, tier='warm', stored_path=stored_path, media_type=media_type,
+        width=width, height=height, crop_top=top, crop_bottom=bottom,
+        original_bytes=original_bytes, warm_bytes=len(data), stored_bytes=len(data),
+    )
+    db.session.add(rec)
+    return rec
+
+
+def _to_cold(recs, month):
+    """
+    Add warm files to the monthly bundle archive/<YYYY-MM>.zip and point their records at it
+    (not committed). The bundle is copied, appended to and swapped in whole, so a crash never
+    leaves it with a half-written central directory. Returns the warm paths to remove after the commit.
+    """
+    bundle_path = os.path.join(ARCHIVE_ROOT, f'{month}.zip')
+    makedirs_once(ARCHIVE_ROOT)
+    fd, tmp_path = tempfile.mkstemp(dir=ARCHIVE_ROOT, suffix='.part')
+    os.close(fd)
+    try:
+        exists = os.path.exists(bundle_path)
+        if exists:
+            shutil.copyfile(bundle_path, tmp_path)
+        with zipfile.ZipFile(tmp_path, 'a' if exists else 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=9) as bundle:
+            names = set(bundle.namelist())
+            for rec in recs:
+                member = os.path.basename(rec.stored_path)
+                if member not in names:
+                    bundle.write(rec.stored_path, member)
+                    names.add(member)
+            sizes = {member: bundle.getinfo(member).compress_size for member in names}
+        os.replace(tmp_path, bundle_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    warm_paths = []
+    for rec in recs:
+        member = os.path.basename(rec.stored_path)
+        warm_paths.append(rec.stored_path)
+        rec.tier, rec.stored_path, rec.member, rec.stored_bytes = 'cold', bundle_path, member, sizes[member]
+    return warm_paths
+
+
+def _rehydrated(rec):
+    """Drop the archive record of an image whose hot file is back (uploaded again); caller commits."""
+    if rec.tier == 'warm':
+        try:
+            os.remove(rec.stored_path)
+        except OSError:
+            pass
+    db.session.delete(rec)
+
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _tier_report():
+    return {'files': 0, 'before_bytes': 0, 'after_bytes': 0, 'saved_bytes': 0}
+
+
+def run_lifecycle(warm_after_days, cold_after_days, crop_to_roi=False, now=None):
+    """
+    Move uploads whose newest run is older than the tier ages; returns
+    {'warm': {...}, 'cold': {...}, 'errors': n} with files and bytes before/after/saved per tier.
+    A non-positive age disables that tier.
+    """
+    now = now or datetime.utcnow()
+    report = {'warm': _tier_report(), 'cold': _tier_report(), 'errors': 0}
+    with upload_lock('lifecycle'):
+        _remove_files(os.path.join(ARCHIVE_ROOT, f) for f in (os.listdir(ARCHIVE_ROOT) if os.path.isdir(ARCHIVE_ROOT) else ())
+                      if f.endswith('.part'))  # left by an interrupted bundle rebuild
+        newest = dict(db.session.query(Run.image_path, func.max(Run.created_at)).group_by(Run.image_path))
+        archived = {rec.image_path: rec for rec in ArchivedUpload.query.all()}
+        back = [rec for image_path, rec in archived.items() if os.path.exists(image_path)]
+        if back:
+            for rec in back:
+                _rehydrated(rec)
+                del archived[rec.image_path]
+            db.session.commit()
+        if warm_after_days and warm_after_days > 0:
+            cutoff = now - timedelta(days=warm_after_days)
+            for image_path, last_used in newest.items():
+                if last_used >= cutoff or image_path in archived or not is_upload_path(image_path) or not os.path.exists(image_path):
+                    continue
+                try:
+                    rec = _to_warm(image_path, crop_to_roi)
+                    db.session.commit()
+                except (OSError, ValueError):
+                    db.session.rollback()
+                    report['errors'] += 1
+                    continue
+                _remove_files([image_path])
+                archived[image_path] = rec
+                _count(report['warm'], rec.original_bytes, rec.warm_bytes)
+        if cold_after_days and cold_after_days > 0:
+            cutoff = now - timedelta(days=cold_after_days)
+            months = {}
+            for image_path, rec in archived.items():
+                last_used = newest.get(image_path)
+                if rec.tier == 'warm' and last_used is not None and last_used < cutoff:
+                    months.setdefault(last_used.strftime('%Y-%m'), []).append(rec)
+            for month, recs in sorted(months.items()):
+                try:
+                    warm_paths = _to_cold(recs, month)
+                    db.session.commit()
+                except (OSError, zipfile.BadZipFile):
+                    db.session.rollback()
+                    report['errors'] += len(recs)
+                    continue
+                _remove_files(warm_paths)
+                for rec in recs:
+                    _count(report['cold'], rec.warm_bytes, rec.stored_bytes)
+    return report
+
+
+def run_configured_lifecycle(config):
+    """run_lifecycle() with the UPLOAD_WARM_AFTER_DAYS / UPLOAD_COLD_AFTER_DAYS / UPLOAD_ARCHIVE_CROP_TO_ROI settings."""
+    return run_lifecycle(
+        config['UPLOAD_WARM_AFTER_DAYS'],
+        config['UPLOAD_COLD_AFTER_DAYS'],
+        crop_to_roi=config['UPLOAD_ARCHIVE_CROP_TO_ROI'],
+    )
+
+
+def _count(tier, before, after):
+    tier['files'] += 1
+    tier['before_bytes'] += before
+    tier['after_bytes'] += after
+    tier['saved_bytes'] += before - after
+
+
+def lifecycle_summary():
+    """Totals per tier over all archived uploads: files, original bytes, stored bytes, bytes saved."""
+    rows = db.session.query(
+        ArchivedUpload.tier, func.count(ArchivedUpload.id),
+        func.sum(ArchivedUpload.original_bytes), func.sum(ArchivedUpload.stored_bytes),
+    ).group_by(ArchivedUpload.tier)
+    summary = {}
+    for tier, files, original, stored in rows:
+        summary[tier] = {'files': files, 'original_bytes': original or 0, 'stored_bytes': stored or 0,
+                         'saved_bytes': (original or 0) - (stored or 0)}
+    return summary
@@ -0,0 +1,258 @@
+"""Content-addressed upload store: hash while streaming, sharded paths, shared files.
+
+New uploads are first written to a staging area and only promoted into the
+store when a run that uses them is saved; stale staged files and files no run
+references are removed by sweep_uploads().
+
+Placing a file in the store and releasing it hold the same cross-process lock
+(upload_lock, per digest shard), and placing touches the file. release_upload()
+only deletes a file nobody touched within RELEASE_GRACE, so a run that reuses
+the file but has not committed yet never loses its image; the sweeper deletes it later.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from app.extensions import db
+from app.models import Run
+from app.services.image_utils import makedirs_once
+
+UPLOAD_ROOT = os.path.join('static', 'uploads')
+CAS_ROOT = os.path.join(UPLOAD_ROOT, 'cas')
+STAGING_ROOT = os.path.join(UPLOAD_ROOT, 'staging')
+ARCHIVE_ROOT = os.path.join(UPLOAD_ROOT, 'archive')  # warm/cold tiers, see upload_lifecycle
+THUMB_ROOT = os.path.join(UPLOAD_ROOT, 'thumbs')
+LOCK_ROOT = os.path.join(UPLOAD_ROOT, 'locks')
+CHUNK_SIZE = 64 * 1024
+RELEASE_GRACE = 300  # seconds since a file was last placed during which release_upload leaves it alone
+
+
+@contextmanager
+def upload_lock(name):
+    """Exclusive lock shared by threads and processes, held on static/uploads/locks/<name>.lock."""
+    makedirs_once(LOCK_ROOT)
+    with open(os.path.join(LOCK_ROOT, name + '.lock'), 'a+b') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _digest_lock(image_path):
+    """upload_lock for the digest shard of a stored or staged path (one lock for all legacy paths)."""
+    digest = digest_from_path(image_path)
+    return upload_lock('cas-' + (digest[:2] if digest else 'legacy'))
+
+
+def sniff_image_ext(head: bytes, fallback='.jpg'):
+    """Pick the extension from the file signature; fall back to the client's extension."""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    return fallback
+
+
+def cas_path(digest: str, ext: str):
+    """'static/uploads/cas/ab/cd/abcd....png' for a sha256 hex digest."""
+    return os.path.join(CAS_ROOT, digest[:2], digest[2:4], digest + ext)
+
+
+def digest_from_path(image_path):
+    """Return the sha256 digest encoded in a stored or staged path, or None for legacy paths."""
+    name = os.path.splitext(os.path.basename(image_path or ''))[0]
+    norm = os.path.normpath(image_path or '')
+    if len(name) == 64 and (norm.startswith(CAS_ROOT + os.sep) or norm.startswith(STAGING_ROOT + os.sep)):
+        return name
+    return None
+
+
+def _write_hashed(stream, tmp_dir):
+    """Stream into a temp file in tmp_dir while hashing; return (tmp_path, digest, head bytes)."""
+    makedirs_once(tmp_dir)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix='.part')
+    h = hashlib.sha256()
+    head = b''
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                if len(head) < 16:
+                    head += chunk[:16]
+                h.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, h.hexdigest(), head
+
+
+def _place(tmp_path, final_path):
+    """Move tmp_path to final_path unless that content already exists there (then touch it)."""
+    with _digest_lock(final_path):
+        if os.path.exists(final_path):
+            os.remove(tmp_path)
+            os.utime(final_path)
+            return False
+        makedirs_once(os.path.dirname(final_path))
+        os.replace(tmp_path, final_path)
+        return True
+
+
+def store_upload(stream, fallback_ext='.jpg'):
+    """
+    Copy a binary stream straight into the store, hashing it on the way.
+    Identical bytes collapse to one file. Returns (image_path, digest, created).
+    """
+    tmp_path, digest, head = _write_hashed(stream, os.path.join(CAS_ROOT, 'tmp'))
+    image_path = cas_path(digest, sniff_image_ext(head, fallback_ext))
+    return image_path, digest, _place(tmp_path, image_path)
+
+
+def stage_upload(stream, fallback_ext='.jpg'):
+    """Write an upload to the staging area (expires after UPLOAD_STAGING_TTL). Returns (staged_path, digest)."""
+    tmp_path, digest, head = _write_hashed(stream, STAGING_ROOT)
+    staged_path = os.path.join(STAGING_ROOT, digest + sniff_image_ext(head, fallback_ext))
+    _place(tmp_path, staged_path)
+    return staged_path, digest
+
+
+def is_staged_path(image_path):
+    return bool(image_path) and os.path.normpath(image_path).startswith(STAGING_ROOT + os.sep)
+
+
+def discard_staged(staged_path):
+    """Drop a staged file (e.g. it failed to decode)."""
+    if is_staged_path(staged_path):
+        try:
+            os.remove(staged_path)
+        except OSError:
+            pass
+
+
+def promote_upload(staged_path):
+    """
+    Move a staged file into the content-addressed store; call right before committing its Run.
+    Returns the store path, or None if the staged file has expired.
+    """
+    digest = digest_from_path(staged_path)
+    if not digest or not is_staged_path(staged_path):
+        return None
+    image_path = cas_path(digest, os.path.splitext(staged_path)[1])
+    with _digest_lock(image_path):
+        if os.path.exists(image_path):
+            os.utime(image_path)
+            discard_staged(staged_path)
+            return image_path
+        if not os.path.exists(staged_path):
+            return None
+        makedirs_once(os.path.dirname(image_path))
+        os.replace(staged_path, image_path)
+        os.utime(image_path)
+    return image_path
+
+
+def is_upload_path(image_path):
+    """True if image_path points inside static/uploads (never delete anything else)."""
+    if not image_path or os.path.isabs(image_path):
+        return False
+    return os.path.normpath(image_path).startswith(UPLOAD_ROOT + os.sep)
+
+
+def upload_ref_count(image_path):
+    """Number of runs that reference image_path; runs are the reference count."""
+    return Run.query.filter_by(image_path=image_path).count()
+
+
+def release_upload(image_path, grace=RELEASE_GRACE):
+    """
+    Delete an uploaded file (and its archive copy) once no run references it. Call after the
+    run delete is committed. A file placed within grace seconds may belong to a run about to
+    be committed, so it is left for sweep_uploads(). Returns True if the file was deleted.
+    """
+    if not is_upload_path(image_path):
+        return False
+    from app.services.upload_lifecycle import drop_archived
+    with _digest_lock(image_path):
+        if upload_ref_count(image_path) > 0:
+            return False
+        try:
+            if time.time() - os.path.getmtime(image_path) < grace:
+                return False
+        except OSError:
+            pass  # archived (no hot copy) or already gone
+        drop_archived(image_path)
+        try:
+            os.remove(image_path)
+        except OSError:
+            return False
+    return True
+
+
+def _remove_counted(path, report, kind):
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except OSError:
+        return
+    report[f'{kind}_files'] += 1
+    report[f'{kind}_bytes'] += size
+
+
+def sweep_uploads(staging_ttl, orphan_grace=None, now=None):
+    """
+    Delete staged files older than staging_ttl seconds, and stored/legacy uploads that
+    no Run.image_path references and that are older than orphan_grace (defaults to
+    staging_ttl, so files promoted moments ago are never raced). Archive tiers and
+    thumbnails are managed by upload_lifecycle and skipped here, as are lock files.
+    Returns a report dict.
+    """
+    now = time.time() if now is None else now
+    orphan_grace = staging_ttl if orphan_grace is None else orphan_grace
+    report = {'staged_files': 0, 'staged_bytes': 0, 'orphan_files': 0, 'orphan_bytes': 0}
+    if not os.path.isdir(UPLOAD_ROOT):
+        report['reclaimed_bytes'] = 0
+        return report
+    referenced = {os.path.normpath(p) for (p,) in db.session.query(Run.image_path).distinct()}
+    scratch_dirs = (STAGING_ROOT, os.path.join(CAS_ROOT, 'tmp'))
+    for dirpath, dirnames, filenames in os.walk(UPLOAD_ROOT):
+        if os.path.normpath(dirpath) == UPLOAD_ROOT:
+            dirnames[:] = [d for d in dirnames if os.path.join(UPLOAD_ROOT, d) not in (ARCHIVE_ROOT, THUMB_ROOT, LOCK_ROOT)]
+        in_staging = os.path.normpath(dirpath) in scratch_dirs
+        for fname in filenames:
+            if fname.startswith('.'):
+                continue
+            path = os.path.join(dirpath, fname)
+            try:
+                age = now - os.path.getmtime(path)
+            except OSError:
+                continue
+            if in_staging or fname.endswith('.part'):
+                if age > staging_ttl:
+                    _remove_counted(path, report, 'staged')
+            elif age > orphan_grace and os.path.normpath(path) not in referenced:
+                with _digest_lock(path):  # re-check: a promote may have just reused (touched) it
+                    try:
+                        untouched = now - os.path.getmtime(path) > orphan_grace
+                    except OSError:
+                        continue
+                    if untouched:
+                        _remove_counted(path, report, 'orphan')
+    report['reclaimed_bytes'] = report['staged_bytes'] + report['orphan_bytes']
+    return report
@@ -0,0 +1,8 @@
+"""Every analysis path must reproduce app/bench/golden_analysis.json exactly (see app/bench/golden.py)."""
+from app.bench.golden import check_golden
+
+
+def test_analysis_matches_golden_outputs():
+    checked, mismatches = check_golden()
+    assert checked, "the golden file has no cases"
+    assert not mismatches, '\n'.join(f"{name}: {message}" for name, message in mismatches)
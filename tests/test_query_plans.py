@@ -0,0 +1,9 @@
+"""Every hot query on run, run_result and trend_bucket must use an index (see app/bench/query_plans.py)."""
+from app.bench.query_plans import check_fresh_schema
+
+
+def test_hot_queries_use_an_index():
+    report = check_fresh_schema()
+    assert report, "no hot queries were checked"
+    offenders = {row['name']: row['violations'] for row in report if row['violations']}
+    assert not offenders, f"full table scans: {offenders}"
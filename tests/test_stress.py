@@ -0,0 +1,12 @@
+"""Parallel activation, calibration, analysis and clears must keep every invariant (see app/bench/stress.py)."""
+from app.bench.stress import run_stress
+
+MIN_THROUGHPUT = 1.0  # operations/s, the stress-test command's default --min-throughput
+
+
+def test_concurrent_operations_keep_invariants():
+    report = run_stress(threads=8, seconds=5)
+    assert report['violations'] == [], report['messages']
+    errors = {op: row['errors'] for op, row in report['ops'].items() if row['errors']}
+    assert not errors, f"failed requests: {errors} {report['messages']}"
+    assert report['per_sec'] >= MIN_THROUGHPUT, f"throughput {report['per_sec']:.1f}/s"